@@ -1,5 +1,41 @@
 from rest_framework.authentication import TokenAuthentication as TokenAuthentication_
 
+from accounts import cache as token_cache
+
 
 class TokenAuthentication(TokenAuthentication_):
+    """Bearer token authentication, authenticated tokens are served from token cache"""
     keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get_token(key)
+        if token is not None:
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set_token(token)
+        return user, token
+
+
+async def aauthenticate(request):
+    """
+    Authentication of ASGI-native views, same as DEFAULT_AUTHENTICATION_CLASSES:
+    session user first, then `Authorization: Bearer <key>` token. Returns None for anonymous requests.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0] != TokenAuthentication.keyword:
+        return None
+    token = await token_cache.aget_token(auth[1])
+    if token is not None:
+        return token.user
+    model = TokenAuthentication().get_model()
+    try:
+        token = await model.objects.select_related('user').aget(key=auth[1])
+    except model.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    await token_cache.aset_token(token)
+    return token.user
@@ -0,0 +1,159 @@
+"""
+Cache of authenticated tokens, so token authentication does not query the database on every request.
+
+The cache is off unless TOKEN_AUTH_CACHE_SIZE is set. Field values of tokens and their users are kept
+in a bounded in-process LRU for TOKEN_AUTH_CACHE_TTL seconds and, when TOKEN_AUTH_CACHE names a Django
+cache, in that shared cache as well. Every request
+gets token and user instances of its own built from them, so concurrent requests share no mutable state.
+Any save of the user and deletion of the token (logout, rotation) drop entries from the shared cache
+and the LRU of the current process, LRU entries of other processes expire with TTL, which bounds
+how long a revoked token or a withdrawn permission keeps working there.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import BaseCache, caches
+from rest_framework.authtoken.models import Token
+
+TOKEN_KEY = 'accounts:token:{}'
+
+
+class LRUCache:
+    """Thread-safe mapping limited by size with expiring entries"""
+
+    def __init__(self):
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, maxsize: int, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+local_tokens = LRUCache()
+
+
+def enabled() -> bool:
+    return getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 0) > 0
+
+
+def get_shared_cache() -> BaseCache | None:
+    alias = getattr(settings, 'TOKEN_AUTH_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _ttl() -> int:
+    return getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60)
+
+
+def _shared_key(key: str) -> str:
+    # raw token keys are credentials, they are not written to the shared cache
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def _entry(token: Token) -> tuple:
+    """Cached values of token and its user"""
+    user = token.user
+    fields = [field.attname for field in user._meta.concrete_fields]
+    return token.created, user._state.db, fields, [getattr(user, field) for field in fields]
+
+
+def _token(key: str, entry: tuple) -> Token:
+    """Token and user instances of one request"""
+    created, db, fields, values = entry
+    user = get_user_model().from_db(db, fields, values)
+    token = Token(key=key, user=user, created=created)
+    token._state.adding, token._state.db = False, db
+    return token
+
+
+def get_token(key: str) -> Token | None:
+    """Cached token with its user or None"""
+    if not enabled():
+        return None
+    entry = local_tokens.get(key)
+    shared = get_shared_cache()
+    if entry is None and shared is not None:
+        entry = shared.get(_shared_key(key))
+        if entry is not None:
+            local_tokens.set(key, entry, settings.TOKEN_AUTH_CACHE_SIZE, _ttl())
+    return None if entry is None else _token(key, entry)
+
+
+def set_token(token: Token) -> None:
+    if not enabled():
+        return
+    entry = _entry(token)
+    local_tokens.set(token.key, entry, settings.TOKEN_AUTH_CACHE_SIZE, _ttl())
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.set(_shared_key(token.key), entry, timeout=_ttl())
+
+
+async def aget_token(key: str) -> Token | None:
+    if not enabled():
+        return None
+    entry = local_tokens.get(key)
+    shared = get_shared_cache()
+    if entry is None and shared is not None:
+        entry = await shared.aget(_shared_key(key))
+        if entry is not None:
+            local_tokens.set(key, entry, settings.TOKEN_AUTH_CACHE_SIZE, _ttl())
+    return None if entry is None else _token(key, entry)
+
+
+async def aset_token(token: Token) -> None:
+    if not enabled():
+        return
+    entry = _entry(token)
+    local_tokens.set(token.key, entry, settings.TOKEN_AUTH_CACHE_SIZE, _ttl())
+    shared = get_shared_cache()
+    if shared is not None:
+        await shared.aset(_shared_key(token.key), entry, timeout=_ttl())
+
+
+def invalidate(keys: list[str]) -> None:
+    if not enabled():
+        return
+    for key in keys:
+        local_tokens.delete(key)
+    shared = get_shared_cache()
+    if shared is not None and keys:
+        shared.delete_many([_shared_key(key) for key in keys])
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drops cached tokens of the user"""
+    if not enabled():
+        return
+    invalidate(list(Token.objects.filter(user_id=user_id).values_list('key', flat=True)))
@@ -1,8 +1,10 @@
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework import serializers
 
+from common.instrumentation import InstrumentedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ('username', 'email', 'password')
@@ -14,7 +16,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserLoginSerializer(serializers.Serializer):
+class UserLoginSerializer(InstrumentedSerializerMixin, serializers.Serializer):
     username = serializers.CharField(required=True)
     password = serializers.CharField(required=True)
 
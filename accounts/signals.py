@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from accounts import cache as token_cache
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance: Token, **kwargs) -> None:
+    """Deleted and rotated tokens, rotation replaces token with a new one"""
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created: bool, raw: bool = False, **kwargs) -> None:
+    """Cached users of tokens are stale after any change, e.g. of is_active or is_staff"""
+    if not raw and not created:
+        token_cache.invalidate_user(instance.pk)
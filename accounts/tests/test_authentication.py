@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from accounts import cache as token_cache
+from common.instrumentation import track_queries
+
+
+class LRUCacheTestCase(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = token_cache.LRUCache()
+        lru.set('a', 1, maxsize=2, ttl=60)
+        lru.set('b', 2, maxsize=2, ttl=60)
+        lru.get('a')
+        lru.set('c', 3, maxsize=2, ttl=60)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertEqual(len(lru), 2)
+
+    def test_expired_entry_is_not_returned(self):
+        lru = token_cache.LRUCache()
+        with mock.patch('accounts.cache.time.monotonic', return_value=100):
+            lru.set('a', 1, maxsize=2, ttl=60)
+        with mock.patch('accounts.cache.time.monotonic', return_value=159):
+            self.assertEqual(lru.get('a'), 1)
+        with mock.patch('accounts.cache.time.monotonic', return_value=160):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
+
+
+@override_settings(TOKEN_AUTH_CACHE_SIZE=100, TOKEN_AUTH_CACHE='')
+class TokenAuthenticationCacheTestCase(TestCase):
+
+    def setUp(self):
+        token_cache.local_tokens.clear()
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'headers': {'Authorization': f'Bearer {self.token.key}'}}
+
+    def get_bookings(self):
+        return self.client.get(reverse('booking-my'), **self.auth)
+
+    def test_token_is_not_queried_after_first_request(self):
+        self.assertEqual(self.get_bookings().status_code, 200)
+        with track_queries() as metrics:
+            self.assertEqual(self.get_bookings().status_code, 200)
+        self.assertEqual(metrics.queries, 1)
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=0)
+    def test_disabled_cache_queries_token_every_request(self):
+        self.get_bookings()
+        with track_queries() as metrics:
+            self.get_bookings()
+        self.assertEqual(metrics.queries, 2)
+
+    def test_deleted_token_is_rejected(self):
+        self.get_bookings()
+        self.token.delete()
+        self.assertEqual(self.get_bookings().status_code, 403)
+
+    def test_rotated_token_is_rejected(self):
+        self.get_bookings()
+        self.token.delete()
+        new_token = Token.objects.create(user=self.user)
+        self.assertEqual(self.get_bookings().status_code, 403)
+        response = self.client.get(reverse('booking-my'), headers={'Authorization': f'Bearer {new_token.key}'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_bookings()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_bookings().status_code, 403)
+
+    def test_demoted_staff_user_is_not_served_from_cache(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.get_bookings()
+        self.assertTrue(token_cache.get_token(self.token.key).user.is_staff)
+        self.user.is_staff = False
+        self.user.save(update_fields=['is_staff'])
+        self.assertIsNone(token_cache.get_token(self.token.key))
+
+    def test_requests_get_instances_of_their_own(self):
+        self.get_bookings()
+        first, second = token_cache.get_token(self.token.key), token_cache.get_token(self.token.key)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.user, second.user)
+        self.assertEqual((first.user, first.user.username, first.user_id), (self.user, 'user', self.user.pk))
+        first.user.first_name = 'changed'
+        self.assertEqual(token_cache.get_token(self.token.key).user.first_name, '')
+
+    def test_logout_deletes_token(self):
+        self.get_bookings()
+        self.client.login(username='user', password='pass')
+        self.client.post(reverse('logout'))
+        self.client.logout()
+        self.assertIsNone(token_cache.get_token(self.token.key))
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.get_bookings().status_code, 403)
+
+    @override_settings(TOKEN_AUTH_CACHE='default')
+    def test_token_is_served_from_shared_cache(self):
+        self.get_bookings()
+        token_cache.local_tokens.clear()
+        with track_queries() as metrics:
+            self.assertEqual(self.get_bookings().status_code, 200)
+        self.assertEqual(metrics.queries, 1)
+        self.token.delete()
+        token_cache.local_tokens.clear()
+        self.assertEqual(self.get_bookings().status_code, 403)
+
+    async def test_async_view_uses_token_cache(self):
+        await self.async_client.get(reverse('booking-my-async'), **self.auth)
+        self.assertIsNotNone(await token_cache.aget_token(self.token.key))
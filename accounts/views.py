@@ -1,11 +1,11 @@
 from django.contrib.auth import login, logout
-from django.http import JsonResponse
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.permissions import IsNotAuthenticated
@@ -22,15 +22,15 @@ class LoginAPIView(GenericAPIView):
         responses={403: 'cant login because user already logged in ',
                    400: 'invalid credentials or not credentials provided', }
     )
-    def post(self, request) -> JsonResponse:
+    def post(self, request) -> Response:
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         if user:
             login(request, user)
             token, created = Token.objects.get_or_create(user=user)
-            return JsonResponse({'msg': 'successfully logged in', 'token': token.key}, status=status.HTTP_200_OK)
-        return JsonResponse({'detail': 'invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'msg': 'successfully logged in', 'token': token.key}, status=status.HTTP_200_OK)
+        return Response({'detail': 'invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class SignUpAPIView(GenericAPIView):
@@ -43,13 +43,13 @@ class SignUpAPIView(GenericAPIView):
         responses={403: 'cant signup because user already logged in',
                    400: 'invalid credentials or username and email are taken'}
     )
-    def post(self, request) -> JsonResponse:
+    def post(self, request) -> Response:
         self.check_permissions(request)
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return JsonResponse({'message': 'user created successfully'}, status=status.HTTP_201_CREATED)
-        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'message': 'user created successfully'}, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class LogoutAPIView(APIView):
@@ -58,9 +58,11 @@ class LogoutAPIView(APIView):
 
     @swagger_auto_schema(
         operation_summary='Logout',
-        operation_description='Sign out from account',
+        operation_description='Sign out from account, auth token of the user is deleted',
         responses={403: 'cant logout because user is not logged in'}
     )
-    def post(self, request) -> JsonResponse:
+    def post(self, request) -> Response:
+        # deletion drops the token from token cache as well
+        Token.objects.filter(user=request.user).delete()
         logout(request)
-        return JsonResponse({'message': 'successfully logged out'}, status=200)
+        return Response({'message': 'successfully logged out'}, status=status.HTTP_200_OK)
@@ -0,0 +1,99 @@
+"""
+Benchmark suite for booking API hot paths.
+
+Seeds rooms, users and bookings into a throwaway database, then measures
+latency percentiles and queries per request for every scenario and writes
+results to a JSON file, which can be compared with a previous run.
+
+Run against docker-compose-test_db Postgres from the project root:
+
+    docker-compose -f docker-compose-test_db.yml up -d test_db
+    env $(grep -v POSTGRES_HOST test.env | xargs) POSTGRES_HOST=localhost \\
+        python -m benchmarks --rooms 1000 --bookings 50000 --users 500 --output bench.json
+    python -m benchmarks ... --output bench-new.json --compare bench.json
+"""
+import argparse
+import datetime
+import json
+import random
+import subprocess
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f'{"scenario":<26}{"p50 ms":>12}{"change":>10}{"p90 ms":>12}{"change":>10}{"queries":>10}')
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        row = f'{name:<26}'
+        for percentile in ('p50_ms', 'p90_ms'):
+            value = current['latency'][percentile]
+            change = ''
+            if previous:
+                change = f'{(value / previous["latency"][percentile] - 1) * 100:+.1f}%'
+            row += f'{value:>12}{change:>10}'
+        print(row + f'{current["queries"]["mean"]:>10}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', nargs='+', default=None, help='Scenarios to run, all by default')
+    parser.add_argument('--search-cache', action='store_true', help='Keep room search cache enabled')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', default=None, help='Previous results file to compare with')
+    parser.add_argument('--keepdb', action='store_true', help='Keep throwaway database between runs')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+
+    from benchmarks import api
+    from benchmarks.seed import seed
+
+    scenarios = args.scenarios or list(api.SCENARIOS)
+    unknown = set(scenarios) - set(api.SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'rooms': args.rooms, 'bookings': args.bookings, 'users': args.users,
+            'requests': args.requests, 'warmup': args.warmup, 'search_cache': args.search_cache,
+        },
+        'results': {},
+    }
+    settings_override = {} if args.search_cache else {'ROOMS_SEARCH_CACHE': ''}
+    with benchmark_database(keepdb=args.keepdb), override_settings(**settings_override):
+        seeded = seed(args.rooms, args.bookings, args.users, args.seed)
+        ctx = api.prepare_context(seeded, args.requests + args.warmup, random.Random(args.seed))
+        for name in scenarios:
+            results['results'][name] = api.run_scenario(name, ctx, args.requests, args.warmup)
+            print(f'{name}: {json.dumps(results["results"][name])}')
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
+
+
+if __name__ == '__main__':
+    main()
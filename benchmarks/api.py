@@ -0,0 +1,131 @@
+"""Request scenarios for booking API hot paths, measured through the full middleware stack"""
+import datetime
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from benchmarks.common import latency_summary
+from benchmarks.seed import BENCH_PASSWORD
+
+
+@dataclass
+class Context:
+    start: datetime.date
+    horizon: datetime.date
+    room_ids: list[int]
+    users: list
+    rnd: random.Random
+    client: object = None
+    anonymous: object = None
+    patch_bookings: list[int] = field(default_factory=list)
+    conflicts: list[tuple] = field(default_factory=list)
+    counter: int = 0
+
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def rooms_list(ctx: Context):
+    return ctx.anonymous.get('/api/rooms/')
+
+
+def rooms_list_dates(ctx: Context):
+    checkin = ctx.start + datetime.timedelta(days=ctx.rnd.randrange((ctx.horizon - ctx.start).days))
+    checkout = checkin + datetime.timedelta(days=ctx.rnd.randint(1, 7))
+    return ctx.anonymous.get(f'/api/rooms/?checkin={checkin}&checkout={checkout}')
+
+
+def booking_create(ctx: Context):
+    # every request books its own 2 nights after seeded bookings, so it never conflicts
+    checkin = ctx.horizon + datetime.timedelta(days=3 * ctx.next_number())
+    return ctx.client.post('/api/bookings/', data={'room': ctx.rnd.choice(ctx.room_ids), 'checkin': checkin,
+                                                   'checkout': checkin + datetime.timedelta(days=2)})
+
+
+def booking_create_conflict(ctx: Context):
+    room_id, checkin, checkout = ctx.rnd.choice(ctx.conflicts)
+    return ctx.client.post('/api/bookings/', data={'room': room_id, 'checkin': checkin, 'checkout': checkout})
+
+
+def booking_patch(ctx: Context):
+    booking_id = ctx.patch_bookings[ctx.next_number() % len(ctx.patch_bookings)]
+    return ctx.client.patch(f'/api/bookings/{booking_id}', data={'active': False}, content_type='application/json')
+
+
+def login(ctx: Context):
+    from django.test import Client
+
+    user = ctx.rnd.choice(ctx.users)
+    return Client().post('/api/accounts/login/', data={'username': user.username, 'password': BENCH_PASSWORD})
+
+
+def signup(ctx: Context):
+    from django.test import Client
+
+    number = ctx.next_number()
+    return Client().post('/api/accounts/signup/', data={'username': f'signup{number}', 'password': BENCH_PASSWORD,
+                                                        'email': f'signup{number}@email.com'})
+
+
+SCENARIOS: dict[str, tuple[Callable, int]] = {
+    'rooms_list': (rooms_list, 200),
+    'rooms_list_dates': (rooms_list_dates, 200),
+    'booking_create': (booking_create, 201),
+    'booking_create_conflict': (booking_create_conflict, 409),
+    'booking_patch': (booking_patch, 200),
+    'login': (login, 200),
+    'signup': (signup, 201),
+}
+
+
+def prepare_context(seeded: dict, requests: int, rnd: random.Random) -> Context:
+    from django.test import Client
+
+    from booking.models import Booking
+
+    ctx = Context(start=seeded['start'], horizon=seeded['horizon'], room_ids=seeded['room_ids'],
+                  users=seeded['users'], rnd=rnd)
+    user = ctx.users[0]
+    ctx.client = Client()
+    ctx.client.force_login(user)
+    ctx.anonymous = Client()
+
+    sample = Booking.objects.filter(active=True).order_by('?').values_list('room_id', 'checkin', 'checkout')[:1000]
+    ctx.conflicts = list(sample)
+
+    # bookings for PATCH live in their own date region, after the ones created by booking_create
+    patch_start = ctx.horizon + datetime.timedelta(days=3 * (requests * len(SCENARIOS) + 10))
+    patch_bookings = Booking.objects.bulk_create(
+        Booking(room_id=rnd.choice(ctx.room_ids), user=user,
+                checkin=patch_start + datetime.timedelta(days=3 * n),
+                checkout=patch_start + datetime.timedelta(days=3 * n + 2))
+        for n in range(requests + 1)
+    )
+    ctx.patch_bookings = [booking.id for booking in patch_bookings]
+    return ctx
+
+
+def run_scenario(name: str, ctx: Context, requests: int, warmup: int) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    func, expected_status = SCENARIOS[name]
+    for _ in range(warmup):
+        func(ctx)
+
+    latencies, queries, errors = [], [], 0
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = func(ctx)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        errors += response.status_code != expected_status
+
+    return {
+        'latency': latency_summary(latencies),
+        'queries': {'mean': round(sum(queries) / len(queries), 2), 'max': max(queries)},
+        'errors': errors,
+    }
@@ -0,0 +1,170 @@
+"""
+Concurrency of room search and bookings list served through WSGI and ASGI entry points.
+
+Seeds a throwaway database, starts both servers against it and measures throughput
+and latency of the sync DRF views under WSGI and ASGI and of the async views under ASGI
+at every concurrency level:
+
+    python -m benchmarks.asgi_wsgi --concurrency 1 8 32 64 --requests 500
+
+Servers are started with --wsgi-command and --asgi-command, `{port}` is replaced with a free port.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import time
+
+from benchmarks.common import benchmark_database, latency_summary, setup_django
+
+HOST = '127.0.0.1'
+WSGI_COMMAND = 'python manage.py runserver --noreload 127.0.0.1:{port}'
+ASGI_COMMAND = 'python -m uvicorn config.asgi:application --host 127.0.0.1 --port {port} --log-level warning'
+
+# (name, server, path of the view)
+TARGETS = [
+    ('rooms_wsgi_sync', 'wsgi', '/api/rooms/'),
+    ('rooms_asgi_sync', 'asgi', '/api/rooms/'),
+    ('rooms_asgi_async', 'asgi', '/api/rooms/async/'),
+    ('bookings_wsgi_sync', 'wsgi', '/api/bookings/'),
+    ('bookings_asgi_sync', 'asgi', '/api/bookings/'),
+    ('bookings_asgi_async', 'asgi', '/api/bookings/async/'),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        with socket.socket() as sock:
+            if sock.connect_ex((HOST, port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f'server did not start on port {port}')
+
+
+def start_server(command: str, port: int, database: str) -> subprocess.Popen:
+    env = {**os.environ, 'POSTGRES_DB': database, 'DJANGO_ALLOWED_HOSTS': HOST, 'ROOMS_SEARCH_CACHE': '',
+           'REQUEST_METRICS_SAMPLE_RATE': '0'}
+    process = subprocess.Popen(shlex.split(command.format(port=port)), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process
+
+
+async def fetch(port: int, path: str, headers: dict) -> tuple[int, float]:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    lines = [f'GET {path} HTTP/1.1', f'Host: {HOST}', 'Connection: close',
+             *(f'{name}: {value}' for name, value in headers.items())]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), time.perf_counter() - started
+
+
+async def load(port: int, paths: list[str], headers: dict, concurrency: int) -> dict:
+    """Sends all paths with `concurrency` clients, each client sends its next request after a response"""
+    queue = list(reversed(paths))
+    latencies: list[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        while queue:
+            status, elapsed = await fetch(port, queue.pop(), headers)
+            latencies.append(elapsed)
+            errors += status != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests_per_s': round(len(paths) / elapsed, 1),
+        'errors': errors,
+        'latency': latency_summary(latencies),
+    }
+
+
+def room_queries(seeded: dict, count: int, rnd: random.Random) -> list[str]:
+    queries = []
+    for _ in range(count):
+        checkin = seeded['start'] + datetime.timedelta(days=rnd.randrange((seeded['horizon'] - seeded['start']).days))
+        checkout = checkin + datetime.timedelta(days=rnd.randint(1, 7))
+        queries.append(f'?checkin={checkin}&checkout={checkout}&order_by=price')
+    return queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per target and concurrency')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--targets', nargs='+', default=None, help='Targets to run, all by default')
+    parser.add_argument('--wsgi-command', default=WSGI_COMMAND)
+    parser.add_argument('--asgi-command', default=ASGI_COMMAND)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='File to write JSON results to')
+    args = parser.parse_args()
+
+    targets = [target for target in TARGETS if not args.targets or target[0] in args.targets]
+    setup_django()
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+
+    from benchmarks.seed import seed
+
+    results: dict = {}
+    with benchmark_database():
+        seeded = seed(args.rooms, args.bookings, args.users, args.seed)
+        token = Token.objects.create(user=seeded['users'][0])
+        database = connection.settings_dict['NAME']
+        # servers connect to the throwaway database themselves
+        connection.close()
+
+        ports = {'wsgi': free_port(), 'asgi': free_port()}
+        servers = {'wsgi': start_server(args.wsgi_command, ports['wsgi'], database),
+                   'asgi': start_server(args.asgi_command, ports['asgi'], database)}
+        try:
+            for name, server, path in targets:
+                rnd = random.Random(args.seed)
+                if path.startswith('/api/rooms/'):
+                    paths, headers = [path + query for query in room_queries(seeded, args.requests, rnd)], {}
+                else:
+                    paths, headers = [path] * args.requests, {'Authorization': f'Bearer {token.key}'}
+                results[name] = []
+                for concurrency in args.concurrency:
+                    result = asyncio.run(load(ports[server], paths, headers, concurrency))
+                    results[name].append(result)
+                    print(f'{name}: {json.dumps(result)}')
+        finally:
+            for process in servers.values():
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
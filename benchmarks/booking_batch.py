@@ -0,0 +1,69 @@
+"""
+Booking creation throughput: N single POST /api/bookings/ against one
+POST /api/bookings/batch/ with N items.
+
+    python -m benchmarks.booking_batch --bookings 500 --rooms 50
+"""
+import argparse
+import datetime
+import json
+import time
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def payloads(room_ids: list[int], count: int, start_day: datetime.date) -> list[dict]:
+    items = []
+    for index in range(count):
+        checkin = start_day + datetime.timedelta(days=2 * (index // len(room_ids)))
+        items.append({'room': room_ids[index % len(room_ids)], 'checkin': checkin.isoformat(),
+                      'checkout': (checkin + datetime.timedelta(days=2)).isoformat()})
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--rooms', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from booking.models import Booking
+    from rooms.models import Room
+
+    with benchmark_database():
+        user = get_user_model().objects.create_user(username='bench', email='bench@email.com')
+        room_ids = [room.id for room in Room.objects.bulk_create(
+            Room(room_type=1, price=1000, spots=1) for _ in range(args.rooms))]
+        client = APIClient()
+        client.force_authenticate(user)
+        items = payloads(room_ids, args.bookings, datetime.date.today())
+
+        started = time.perf_counter()
+        for item in items:
+            response = client.post(reverse('booking-create'), data=item, format='json')
+            assert response.status_code == 201, response.content
+        single_elapsed = time.perf_counter() - started
+
+        Booking.objects.all().delete()
+        started = time.perf_counter()
+        response = client.post(reverse('booking-batch'), data=items, format='json')
+        assert response.status_code == 201, response.content
+        batch_elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'bookings': args.bookings,
+        'single_posts': {'elapsed_s': round(single_elapsed, 3),
+                         'bookings_per_s': round(args.bookings / single_elapsed, 1)},
+        'batch': {'elapsed_s': round(batch_elapsed, 3),
+                  'bookings_per_s': round(args.bookings / batch_elapsed, 1)},
+        'speedup': round(single_elapsed / batch_elapsed, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Conflict-heavy concurrent booking inserts: Booking.clean() read-then-write path
+against the exclusion constraint engine.
+
+    python -m benchmarks.booking_engine --threads 8 --attempts 200 --rooms 3
+
+Exclusion engine requires btree_gist extension in the database.
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+
+from benchmarks.common import benchmark_database, latency_summary, setup_django
+
+DOUBLE_BOOKINGS_SQL = '''
+    SELECT count(*) FROM booking_booking a JOIN booking_booking b
+      ON a.room_id = b.room_id AND a.id < b.id
+     AND a.checkin < b.checkout AND b.checkin < a.checkout
+     WHERE a.active AND b.active
+'''
+
+
+def run_workload(engine: str, threads: int, attempts: int, rooms: list, window: int) -> dict:
+    from django.core.exceptions import ValidationError
+    from django.db import IntegrityError, connection, connections
+    from django.test import override_settings
+
+    from booking.models import Booking, is_overlap_error
+
+    Booking.objects.all().delete()
+    start_day = datetime.date.today()
+    latencies: list[float] = []
+    counters = {'created': 0, 'conflicts': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(seed: int) -> None:
+        rnd = random.Random(seed)
+        local_latencies, created, conflicts = [], 0, 0
+        barrier.wait()
+        for _ in range(attempts):
+            checkin = start_day + datetime.timedelta(days=rnd.randrange(window))
+            booking = Booking(room=rnd.choice(rooms), checkin=checkin,
+                              checkout=checkin + datetime.timedelta(days=rnd.randint(1, 3)))
+            started = time.perf_counter()
+            try:
+                booking.save()
+                created += 1
+            except ValidationError:
+                conflicts += 1
+            except IntegrityError as exc:
+                if not is_overlap_error(exc):
+                    raise
+                conflicts += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            counters['created'] += created
+            counters['conflicts'] += conflicts
+        connections.close_all()
+
+    with override_settings(BOOKING_ENGINE=engine):
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    with connection.cursor() as cursor:
+        cursor.execute(DOUBLE_BOOKINGS_SQL)
+        double_bookings = cursor.fetchone()[0]
+
+    return {
+        'engine': engine,
+        'elapsed_s': round(elapsed, 3),
+        'attempts_per_s': round(threads * attempts / elapsed, 1),
+        'double_bookings': double_bookings,
+        **counters,
+        'latency': latency_summary(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=200, help='Booking attempts per thread')
+    parser.add_argument('--rooms', type=int, default=3)
+    parser.add_argument('--window', type=int, default=30, help='Days to spread checkin dates over')
+    args = parser.parse_args()
+
+    setup_django()
+    from booking.models import Booking
+    from rooms.models import Room
+
+    with benchmark_database():
+        rooms = [Room.objects.create(room_type=1, price=1000, spots=1) for _ in range(args.rooms)]
+        results = [run_workload('default', args.threads, args.attempts, rooms, args.window)]
+
+        # both engines start with an empty table, the constraint is created by migrations
+        Booking.objects.all().delete()
+        results.append(run_workload('exclusion', args.threads, args.attempts, rooms, args.window))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Booking throughput with the room row lock of Booking.save() as the number of threads grows:
+every thread books its own room (writes do not wait for each other) against all threads
+booking one room (writes run one at a time), and the same with a lock of the whole
+bookings table instead of the room row for comparison.
+
+    python -m benchmarks.booking_locks --threads 1 2 4 8 --attempts 200
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+from unittest import mock
+
+from benchmarks.booking_engine import DOUBLE_BOOKINGS_SQL
+from benchmarks.common import benchmark_database, latency_summary, setup_django
+
+
+def lock_table(self, using: str) -> None:
+    from django.db import connections
+
+    with connections[using].cursor() as cursor:
+        cursor.execute('LOCK TABLE booking_booking IN SHARE ROW EXCLUSIVE MODE')
+
+
+def run_workload(threads: int, attempts: int, rooms: list, lock: str) -> dict:
+    from django.core.exceptions import ValidationError
+    from django.db import connection, connections
+
+    from booking.models import Booking
+
+    Booking.objects.all().delete()
+    start_day = datetime.date.today()
+    latencies: list[float] = []
+    counters = {'created': 0, 'conflicts': 0}
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(number: int) -> None:
+        room = rooms[number % len(rooms)]
+        local_latencies, created, conflicts = [], 0, 0
+        barrier.wait()
+        for attempt in range(attempts):
+            # threads of one room ask for the same nights, so every night is booked once
+            checkin = start_day + datetime.timedelta(days=attempt)
+            booking = Booking(room=room, checkin=checkin, checkout=checkin + datetime.timedelta(days=1))
+            started = time.perf_counter()
+            try:
+                booking.save()
+                created += 1
+            except ValidationError:
+                conflicts += 1
+            local_latencies.append(time.perf_counter() - started)
+        with results_lock:
+            latencies.extend(local_latencies)
+            counters['created'] += created
+            counters['conflicts'] += conflicts
+        connections.close_all()
+
+    lock_method = lock_table if lock == 'table' else Booking.lock_room
+    with mock.patch.object(Booking, 'lock_room', lock_method):
+        workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    with connection.cursor() as cursor:
+        cursor.execute(DOUBLE_BOOKINGS_SQL)
+        double_bookings = cursor.fetchone()[0]
+
+    return {
+        'threads': threads,
+        'rooms': len(rooms),
+        'lock': lock,
+        'elapsed_s': round(elapsed, 3),
+        'attempts_per_s': round(threads * attempts / elapsed, 1),
+        'double_bookings': double_bookings,
+        **counters,
+        'latency': latency_summary(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--attempts', type=int, default=200, help='Booking attempts per thread')
+    args = parser.parse_args()
+
+    setup_django()
+    from rooms.models import Room
+
+    results = []
+    with benchmark_database():
+        rooms = [Room.objects.create(room_type=1, price=1000, spots=1) for _ in range(max(args.threads))]
+        for lock in ('room', 'table'):
+            single = None
+            for threads in args.threads:
+                for booked_rooms in dict.fromkeys((threads, 1)):
+                    result = run_workload(threads, args.attempts, rooms[:booked_rooms], lock)
+                    if single is None:
+                        single = result['attempts_per_s']
+                    result['speedup'] = round(result['attempts_per_s'] / single, 2)
+                    results.append(result)
+                    print(json.dumps({key: value for key, value in result.items() if key != 'latency'}))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
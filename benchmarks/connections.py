@@ -0,0 +1,123 @@
+"""
+Request latency with and without persistent database connections.
+
+Seeds a throwaway database, then for every connection setup starts a single-threaded
+WSGI server (like one sync worker of gunicorn) and measures sequential requests to
+room search and bookings list:
+
+    python -m benchmarks.connections --requests 500
+
+Setups:
+    no_persistent      CONN_MAX_AGE=0, a new connection for every request
+    persistent         CONN_MAX_AGE=60
+    persistent_checks  CONN_MAX_AGE=60 with CONN_HEALTH_CHECKS
+    pgbouncer          persistent_checks through pgbouncer, only with --pgbouncer host:port
+
+Connection cost grows with network distance and authentication method, pass
+--postgres-host to go through TCP instead of a local socket.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+
+from benchmarks.asgi_wsgi import free_port, load, room_queries, wait_for_port
+from benchmarks.common import benchmark_database, setup_django
+
+SETUPS = {
+    'no_persistent': {'POSTGRES_CONN_MAX_AGE': '0', 'POSTGRES_CONN_HEALTH_CHECKS': 'False'},
+    'persistent': {'POSTGRES_CONN_MAX_AGE': '60', 'POSTGRES_CONN_HEALTH_CHECKS': 'False'},
+    'persistent_checks': {'POSTGRES_CONN_MAX_AGE': '60', 'POSTGRES_CONN_HEALTH_CHECKS': 'True'},
+}
+
+
+def serve(port: int) -> None:
+    """Serves the project on one thread, connections are kept between requests as in a sync worker"""
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+    from config.wsgi import application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+    make_server('127.0.0.1', port, application, handler_class=QuietHandler).serve_forever()
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.connections', '--serve', str(port)],
+                               env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--bookings', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per setup and view')
+    parser.add_argument('--postgres-host', default=None, help='Host the servers connect to, POSTGRES_HOST by default')
+    parser.add_argument('--pgbouncer', default=None, help='host:port of pgbouncer in transaction pooling mode')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='File to write JSON results to')
+    parser.add_argument('--serve', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    setup_django()
+    if args.serve:
+        serve(args.serve)
+        return
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+
+    from benchmarks.seed import seed
+
+    setups = {name: dict(env) for name, env in SETUPS.items()}
+    if args.postgres_host:
+        for env in setups.values():
+            env['POSTGRES_HOST'] = args.postgres_host
+    if args.pgbouncer:
+        host, _, port = args.pgbouncer.partition(':')
+        setups['pgbouncer'] = {**SETUPS['persistent_checks'], 'POSTGRES_HOST': host, 'POSTGRES_PORT': port,
+                               'POSTGRES_PGBOUNCER': 'True'}
+
+    results: dict = {}
+    with benchmark_database():
+        seeded = seed(args.rooms, args.bookings, args.users, args.seed)
+        token = Token.objects.create(user=seeded['users'][0])
+        database = connection.settings_dict['NAME']
+        connection.close()
+
+        rnd = random.Random(args.seed)
+        rooms = [f'/api/rooms/{query}' for query in room_queries(seeded, args.requests, rnd)]
+        views = {'rooms': (rooms, {}),
+                 'bookings': (['/api/bookings/'] * args.requests, {'Authorization': f'Bearer {token.key}'})}
+        for name, env in setups.items():
+            port = free_port()
+            server = start_server(port, {'POSTGRES_DB': database, 'DJANGO_ALLOWED_HOSTS': '127.0.0.1',
+                                         'ROOMS_SEARCH_CACHE': '', 'TOKEN_AUTH_CACHE_SIZE': '0',
+                                         'REQUEST_METRICS_SAMPLE_RATE': '0', **env})
+            try:
+                results[name] = {}
+                for view, (paths, headers) in views.items():
+                    # warm up, so persistent setups start with an open connection
+                    asyncio.run(load(port, paths[:10], headers, 1))
+                    result = asyncio.run(load(port, paths, headers, 1))
+                    results[name][view] = result
+                    print(f'{name} / {view}: {json.dumps(result["latency"])}')
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
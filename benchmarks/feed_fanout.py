@@ -0,0 +1,94 @@
+"""
+Fan-out of the availability feed broker: idle subscriptions of one event loop with
+different date windows and price filters, booking changes dispatched from another thread.
+Measures time the writer spends in dispatch, time from dispatch to the last queued message
+and memory per subscription.
+
+    python -m benchmarks.feed_fanout --subscribers 1000 5000 10000 --changes 100
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, latency_summary, setup_django
+
+
+async def run_fanout(subscribers: int, changes: int, rooms: list, seed: int) -> dict:
+    from django.db import connections
+
+    from rooms import feed
+
+    rnd = random.Random(seed)
+    start_day = datetime.date.today()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = []
+    for _ in range(subscribers):
+        checkin = start_day + datetime.timedelta(days=rnd.randrange(60))
+        subscriptions.append(feed.broker.subscribe(
+            checkin=checkin, checkout=checkin + datetime.timedelta(days=rnd.randint(1, 14)),
+            price_lte=Decimal(rnd.choice([1000, 2000, 5000]))))
+    per_subscription = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    writer_latencies, latencies, queued = [], [], 0
+    loop = asyncio.get_running_loop()
+    # changes are dispatched by writers in other threads
+    writer = ThreadPoolExecutor(max_workers=1)
+    try:
+        for _ in range(changes):
+            checkin = start_day + datetime.timedelta(days=rnd.randrange(60))
+            change = feed.Change(feed.BOOKED, rnd.choice(rooms), checkin, checkin + datetime.timedelta(days=2))
+            started = time.perf_counter()
+            await loop.run_in_executor(writer, feed.broker.dispatch, [change])
+            writer_latencies.append(time.perf_counter() - started)
+            await feed.broker.wait_delivered()
+            latencies.append(time.perf_counter() - started)
+            for subscription in subscriptions:
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                    queued += 1
+    finally:
+        for subscription in subscriptions:
+            feed.broker.unsubscribe(subscription)
+        await loop.run_in_executor(writer, connections.close_all)
+        writer.shutdown()
+
+    return {
+        'subscribers': subscribers,
+        'changes': changes,
+        'queued_messages': queued,
+        'bytes_per_subscription': round(per_subscription),
+        'writer_latency': latency_summary(writer_latencies),
+        'latency': latency_summary(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--changes', type=int, default=100, help='Changes dispatched for every number of subscribers')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from rooms.models import Room
+
+    results = []
+    with benchmark_database():
+        rooms = [Room.objects.create(room_type=1, price=price, spots=1).id for price in (800, 1500, 3000, 6000)]
+        for subscribers in args.subscribers:
+            results.append(asyncio.run(run_fanout(subscribers, args.changes, rooms, args.seed)))
+            print(json.dumps(results[-1]))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
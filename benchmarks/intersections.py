@@ -0,0 +1,154 @@
+"""
+Intersection query plans and latency under booking index schemes.
+
+Seeds bookings with generate_series (10M by default), then for every index scheme
+prints EXPLAIN (ANALYZE, BUFFERS) of intersection queries and measures their latency:
+
+    python -m benchmarks.intersections --bookings 10000000 --rooms 10000
+
+Schemes:
+    single_column       separate checkin and checkout indexes, the previous scheme
+    partial_composite   indexes declared in Booking.Meta
+
+Queries use the current overlap predicate and the previous three-way OR predicate.
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks.common import benchmark_database, latency_summary, setup_django
+
+SEED_SQL = '''
+    INSERT INTO {booking} (room_id, checkin, checkout, active)
+    SELECT r.id, %(start)s::date + (k * 4 + r.id %% 3)::integer,
+           %(start)s::date + (k * 4 + r.id %% 3 + 1 + (k + r.id) %% 3)::integer,
+           random() > 0.05
+      FROM {room} r CROSS JOIN generate_series(0, %(per_room)s - 1) k
+'''
+
+
+def schemes() -> dict:
+    from django.db import models
+
+    from booking.models import Booking
+
+    return {
+        'single_column': [models.Index(fields=['checkin'], name='booking_bench_checkin'),
+                          models.Index(fields=['checkout'], name='booking_bench_checkout')],
+        'partial_composite': list(Booking._meta.indexes),
+    }
+
+
+def seed(rooms: int, bookings: int, start: datetime.date) -> None:
+    from django.db import connection
+
+    from booking.models import Booking
+    from rooms.models import Room
+
+    Room.objects.bulk_create(Room(room_type=1, spots=2, price=1000) for _ in range(rooms))
+    with connection.cursor() as cursor:
+        cursor.execute(SEED_SQL.format(booking=Booking._meta.db_table, room=Room._meta.db_table),
+                       {'start': start, 'per_room': bookings // rooms})
+
+
+def use_scheme(name: str) -> None:
+    from django.db import connection
+
+    from booking.models import Booking
+
+    all_indexes = [index for indexes in schemes().values() for index in indexes]
+    with connection.schema_editor() as editor:
+        for index in all_indexes:
+            editor.execute(f'DROP INDEX IF EXISTS {editor.quote_name(index.name)}')
+        for index in schemes()[name]:
+            editor.add_index(Booking, index)
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM ANALYZE {Booking._meta.db_table}')
+
+
+def previous_predicate(checkin: datetime.date, checkout: datetime.date):
+    from django.db.models import Q
+
+    return (Q(checkin__lt=checkout) & Q(checkout__gt=checkin)) | (
+        Q(checkin=checkin) & Q(checkout__gt=checkin)) | (
+        Q(checkin__lt=checkout) & Q(checkout=checkout))
+
+
+def queries(room_ids: list[int]) -> dict:
+    from booking.models import Booking
+    from rooms.models import Room
+
+    active = Booking.objects.filter(active=True)
+    return {
+        # Booking.clean() of a new booking
+        'room_intersections': lambda ci, co, rnd: active.get_intersections(ci, co, rnd.choice(room_ids)),
+        'room_intersections_previous': lambda ci, co, rnd: active.filter(
+            previous_predicate(ci, co), room_id=rnd.choice(room_ids)),
+        # RoomFilter.get_available_rooms() first page
+        'available_rooms': lambda ci, co, rnd: Room.objects.exclude(
+            id__in=Booking.objects.get_intersections(ci, co).values('room')).order_by('id')[:20],
+        'available_rooms_previous': lambda ci, co, rnd: Room.objects.exclude(
+            id__in=active.filter(previous_predicate(ci, co)).values('room')).order_by('id')[:20],
+    }
+
+
+def run_query(build, stays: list[tuple], rnd: random.Random) -> list[float]:
+    latencies = []
+    for checkin, checkout in stays:
+        qs = build(checkin, checkout, rnd)
+        started = time.perf_counter()
+        list(qs)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=10_000_000)
+    parser.add_argument('--rooms', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=50, help='Measured queries per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quiet', action='store_true', help='Do not print EXPLAIN output')
+    parser.add_argument('--output', default=None, help='File to write JSON results to')
+    args = parser.parse_args()
+
+    setup_django()
+    from rooms.models import Room
+
+    # stays are 4 days apart, seeded bookings end around today
+    start = datetime.date.today() - datetime.timedelta(days=4 * (args.bookings // args.rooms))
+    results: dict = {'meta': {'bookings': args.bookings, 'rooms': args.rooms, 'requests': args.requests},
+                     'results': {}}
+    with benchmark_database():
+        seeded = time.perf_counter()
+        seed(args.rooms, args.bookings, start)
+        print(f'Seeded {args.bookings} bookings in {time.perf_counter() - seeded:.1f}s')
+        room_ids = list(Room.objects.values_list('id', flat=True))
+
+        for scheme in schemes():
+            use_scheme(scheme)
+            results['results'][scheme] = {}
+            for name, build in queries(room_ids).items():
+                rnd = random.Random(args.seed)
+                # recent dates, where availability is searched and bookings are created
+                stays = []
+                for _ in range(args.requests):
+                    checkin = datetime.date.today() - datetime.timedelta(days=rnd.randrange(60))
+                    stays.append((checkin, checkin + datetime.timedelta(days=rnd.randint(1, 7))))
+                plan = build(*stays[0], random.Random(args.seed)).explain(analyze=True, buffers=True)
+                if not args.quiet:
+                    print(f'--- {scheme} / {name}\n{plan}\n')
+                latency = latency_summary(run_query(build, stays, rnd))
+                results['results'][scheme][name] = {'latency': latency, 'plan': plan}
+                print(f'{scheme} / {name}: {json.dumps(latency)}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Seeds rooms, users and non-overlapping bookings with bulk inserts"""
+import datetime
+import random
+from collections.abc import Iterator
+
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def _batched(rows: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_rooms(count: int, rnd: random.Random) -> list[int]:
+    from rooms.models import Room
+
+    rooms = (Room(room_type=rnd.randint(1, 4), spots=rnd.randint(1, 6), price=rnd.randrange(1000, 20000, 50))
+             for _ in range(count))
+    ids = []
+    for batch in _batched(rooms, 5000):
+        ids += [room.id for room in Room.objects.bulk_create(batch)]
+    return ids
+
+
+def seed_users(count: int) -> list:
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    password = make_password(BENCH_PASSWORD)
+    users = (get_user_model()(username=f'bench{n}', email=f'bench{n}@email.com', password=password)
+             for n in range(count))
+    created = []
+    for batch in _batched(users, 5000):
+        created += get_user_model().objects.bulk_create(batch)
+    return created
+
+
+def seed_bookings(count: int, room_ids: list[int], users: list, rnd: random.Random,
+                  start: datetime.date) -> datetime.date:
+    """
+    Spreads bookings over rooms as back-to-back stays with random gaps starting from `start`.
+    Returns the first date after the last seeded checkout.
+    """
+    from booking.models import Booking
+
+    next_checkin = {room_id: start + datetime.timedelta(days=rnd.randrange(7)) for room_id in room_ids}
+    horizon = start
+
+    def bookings() -> Iterator[Booking]:
+        nonlocal horizon
+        for _ in range(count):
+            room_id = rnd.choice(room_ids)
+            checkin = next_checkin[room_id]
+            checkout = checkin + datetime.timedelta(days=rnd.randint(1, 7))
+            next_checkin[room_id] = checkout + datetime.timedelta(days=rnd.randrange(4))
+            horizon = max(horizon, checkout)
+            yield Booking(room_id=room_id, user=rnd.choice(users) if users else None,
+                          checkin=checkin, checkout=checkout, active=rnd.random() > 0.05)
+
+    for batch in _batched(bookings(), 5000):
+        Booking.objects.bulk_create(batch)
+    return horizon + datetime.timedelta(days=1)
+
+
+def seed(rooms: int, bookings: int, users: int, seed_value: int = 0) -> dict:
+    from booking.availability import index_enabled, rebuild_index
+
+    rnd = random.Random(seed_value)
+    start = datetime.date.today() - datetime.timedelta(days=180)
+    room_ids = seed_rooms(rooms, rnd)
+    created_users = seed_users(users)
+    horizon = seed_bookings(bookings, room_ids, created_users, rnd, start)
+    if index_enabled():
+        rebuild_index()
+    return {'room_ids': room_ids, 'users': created_users, 'horizon': horizon, 'start': start}
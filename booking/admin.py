@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from booking.models import Booking
+from booking.models import ArchivedBooking, Booking, Hold
 
 
 @admin.register(Booking)
@@ -17,3 +17,39 @@ class BookingAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('room', )
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'checkin', 'checkout', 'active', 'room',)
+    list_filter = ('active',)
+    date_hierarchy = 'checkout'
+    search_fields = ('=id', '=room__id', 'user__username')
+    raw_id_fields = ('room', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('room', 'user')
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'checkin', 'checkout', 'expires_at', 'room',)
+    raw_id_fields = ('room', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('room', 'user')
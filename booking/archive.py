@@ -0,0 +1,92 @@
+"""
+Archival of past bookings.
+
+Bookings which ended before a cutoff date are moved from the bookings table to the
+archive table in batches, each batch is one DELETE ... RETURNING feeding an INSERT,
+so a booking is never in both tables or in none of them. Batches walk the primary key,
+the whole run reads the bookings table once.
+
+Availability checks only read the bookings table, booking_history view (created by
+migrations) shows both.
+"""
+import datetime
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from booking import availability, intervals
+from booking.models import ArchivedBooking, Booking
+from rooms import cache as search_cache
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'room_id', 'checkin', 'checkout', 'active')
+
+
+@dataclass
+class ArchiveResult:
+    archived: int = 0
+    batches: int = 0
+    first_checkin: datetime.date | None = None
+
+
+def archive_cutoff(days: int | None = None, today: datetime.date | None = None) -> datetime.date:
+    """Bookings with checkout before this date are archived"""
+    if days is None:
+        days = settings.BOOKING_ARCHIVE_AFTER_DAYS
+    return (today or datetime.date.today()) - datetime.timedelta(days=days)
+
+
+def _archive_batch_sql() -> str:
+    fields = ', '.join(ARCHIVE_FIELDS)
+    # archived bookings leave the interval engine as inactive
+    changes = f', changes AS ({intervals.changes_sql("moved", active="false")})' if intervals.engine_enabled() else ''
+    return f'''
+        WITH moved AS (
+            DELETE FROM {Booking._meta.db_table} WHERE id IN (
+                SELECT id FROM {Booking._meta.db_table}
+                 WHERE id > %(after)s AND checkout < %(before)s
+                 ORDER BY id LIMIT %(limit)s
+                   FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {fields}
+        ), archived AS (
+            INSERT INTO {ArchivedBooking._meta.db_table} ({fields})
+            SELECT {fields} FROM moved
+            RETURNING id, checkin
+        ){changes}
+        SELECT count(*), max(id), min(checkin) FROM archived
+    '''
+
+
+def _refresh_derived_data(first_checkin: datetime.date, before: datetime.date) -> None:
+    """Archived stays end before cutoff, only days before it can change"""
+    if availability.index_enabled():
+        availability.rebuild_index(since=first_checkin)
+    search_cache.bump_stay_versions([(first_checkin, before)])
+
+
+def archive_bookings(before: datetime.date, batch_size: int = 10000, dry_run: bool = False) -> ArchiveResult:
+    """Moves bookings with checkout before `before` date to the archive, batch by batch"""
+    result = ArchiveResult()
+    if dry_run:
+        stays = Booking.objects.filter(checkout__lt=before)
+        result.archived = stays.count()
+        result.first_checkin = stays.order_by('checkin').values_list('checkin', flat=True).first()
+        return result
+
+    sql, after = _archive_batch_sql(), 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, {'after': after, 'before': before, 'limit': batch_size})
+            moved, last_id, first_checkin = cursor.fetchone()
+        if not moved:
+            break
+        result.archived += moved
+        result.batches += 1
+        after = last_id
+        if result.first_checkin is None or first_checkin < result.first_checkin:
+            result.first_checkin = first_checkin
+
+    if result.first_checkin is not None:
+        _refresh_derived_data(result.first_checkin, before)
+    return result
@@ -0,0 +1,96 @@
+import datetime
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Case, F, Value, When
+
+from booking.models import Booking, RoomOccupancy
+
+
+def index_enabled() -> bool:
+    return getattr(settings, 'BOOKING_AVAILABILITY_INDEX', False)
+
+
+def stay_days(checkin: datetime.date, checkout: datetime.date) -> list[datetime.date]:
+    """Nights of a stay: checkin is occupied, checkout is not"""
+    return [checkin + datetime.timedelta(days=n) for n in range((checkout - checkin).days)]
+
+
+def month_nights(days: Iterable[datetime.date]) -> dict[datetime.date, int]:
+    """Bitmaps of nights by first day of their month, bit N is the night of day N + 1"""
+    nights: dict[datetime.date, int] = defaultdict(int)
+    for day in days:
+        nights[day.replace(day=1)] |= 1 << (day.day - 1)
+    return nights
+
+
+def booked_room_ids(checkin: datetime.date, checkout: datetime.date) -> list[int]:
+    """Ids of rooms occupied at least one night between checkin and checkout"""
+    stay = month_nights(stay_days(checkin, checkout))
+    if not stay:
+        return []
+    stay_nights = Case(*[When(month=month, then=Value(nights)) for month, nights in stay.items()], default=Value(0))
+    return list(
+        RoomOccupancy.objects.filter(month__in=list(stay)).alias(booked=F('nights').bitand(stay_nights))
+        .filter(booked__gt=0).order_by('room_id').values_list('room_id', flat=True).distinct()
+    )
+
+
+def refresh_room_days(room_id: int, days: Iterable[datetime.date], using: str | None = None) -> None:
+    """
+    Recalculates nights of the room for the given days from active bookings in `using` database.
+    Rows of the room are locked in month order, so concurrent refreshes do not deadlock, and bookings
+    are read after the lock, so a refresh waiting for another one sees the bookings it committed.
+    Rows belong to one room, so refreshes of different rooms do not wait for each other.
+    """
+    refreshed = month_nights(days)
+    if not refreshed:
+        return
+    using = using or router.db_for_write(RoomOccupancy)
+    months = sorted(refreshed)
+    # bookings of the whole months, only nights of the given days are updated
+    checkout = (months[-1] + datetime.timedelta(days=32)).replace(day=1)
+
+    with transaction.atomic(using=using):
+        occupancies = RoomOccupancy.objects.using(using)
+        occupancies.bulk_create([RoomOccupancy(room_id=room_id, month=month) for month in months],
+                                ignore_conflicts=True)
+        rows = list(occupancies.select_for_update().filter(room_id=room_id, month__in=months).order_by('month'))
+        # bound manager always queries the database, not the interval engine
+        bookings = Booking.objects.db_manager(using).get_intersections(
+            months[0], checkout, room_id).values_list('checkin', 'checkout')
+        booked = month_nights(day for stay in bookings for day in stay_days(*stay))
+        changed = []
+        for row in rows:
+            nights = (row.nights & ~refreshed[row.month]) | (booked[row.month] & refreshed[row.month])
+            if nights != row.nights:
+                row.nights = nights
+                changed.append(row)
+        occupancies.bulk_update(changed, ['nights'])
+
+
+def rebuild_index(since: datetime.date | None = None, batch_size: int = 1000) -> int:
+    """Rebuilds index from active bookings starting from the month of since, returns number of stored rows"""
+    since = since and since.replace(day=1)
+    bookings = Booking.objects.filter(active=True, room__isnull=False)
+    if since:
+        bookings = bookings.filter(checkout__gt=since)
+
+    rooms_nights: dict[tuple[int, datetime.date], int] = defaultdict(int)
+    for room_id, checkin, checkout in bookings.values_list('room_id', 'checkin', 'checkout').iterator():
+        for month, nights in month_nights(stay_days(max(checkin, since) if since else checkin, checkout)).items():
+            rooms_nights[room_id, month] |= nights
+
+    with transaction.atomic():
+        stale = RoomOccupancy.objects.all()
+        if since:
+            stale = stale.filter(month__gte=since)
+        stale.delete()
+        RoomOccupancy.objects.bulk_create(
+            [RoomOccupancy(room_id=room_id, month=month, nights=nights)
+             for (room_id, month), nights in rooms_nights.items()],
+            batch_size=batch_size
+        )
+    return len(rooms_nights)
@@ -0,0 +1,60 @@
+from django.db import transaction
+from rest_framework import status
+
+from booking.models import Booking
+from booking.occupancy import OccupancyMap
+from booking.serializers import BookingBatchItemSerializer, BookingSerializer
+from booking.signals import bookings_bulk_created
+from rooms.models import Room
+
+
+def _room_ids(items: list) -> set[int]:
+    ids = set()
+    for item in items:
+        try:
+            ids.add(int(item.get('room')))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return ids
+
+
+def create_bookings(user, items: list) -> list[dict]:
+    """
+    Creates bookings from list of payloads, returns result for every item in payload order.
+    Rooms are loaded with one query and locked for the duration of the check,
+    conflicts with existing bookings are found with one query and conflicts inside
+    the batch are resolved in favour of the earlier item.
+    """
+    results: list[dict] = [{'index': index} for index in range(len(items))]
+    with transaction.atomic():
+        rooms = Room.objects.select_for_update().order_by('id').in_bulk(_room_ids(items))
+
+        valid = []
+        for index, item in enumerate(items):
+            serializer = BookingBatchItemSerializer(data=item, context={'rooms': rooms})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index].update(status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+        if not valid:
+            return results
+
+        occupancy = OccupancyMap.load(
+            {data['room'].id for _, data in valid},
+            min(data['checkin'] for _, data in valid),
+            max(data['checkout'] for _, data in valid),
+        )
+        accepted = []
+        for index, data in valid:
+            if occupancy.is_free(data['room'].id, data['checkin'], data['checkout']):
+                occupancy.add(data['room'].id, data['checkin'], data['checkout'])
+                accepted.append((index, Booking(user=user, **data)))
+            else:
+                results[index].update(status=status.HTTP_409_CONFLICT, detail='dates are already taken')
+
+        Booking.objects.bulk_create([booking for _, booking in accepted])
+        bookings_bulk_created.send(sender=Booking, bookings=[booking for _, booking in accepted])
+
+    for index, booking in accepted:
+        results[index].update(status=status.HTTP_201_CREATED, booking=BookingSerializer(booking).data)
+    return results
@@ -0,0 +1,113 @@
+"""
+Streaming export of bookings in CSV or NDJSON.
+
+Rows are read with a server-side cursor as values_list tuples and written
+straight to text, so memory stays flat whatever the number of bookings.
+Under ASGI the response gets an async iterator, Django would collect a sync one
+into a list before sending it.
+"""
+import csv
+import datetime
+import json
+from collections.abc import AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import QuerySet
+
+from booking.models import BookingHistory
+
+EXPORT_FIELDS = ('id', 'room_id', 'user_id', 'checkin', 'checkout', 'active')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# rows joined into one chunk of output
+ROWS_PER_CHUNK = 1000
+
+
+def export_queryset(start: datetime.date | None = None, end: datetime.date | None = None,
+                    active: bool | None = None) -> QuerySet:
+    """Bookings and archived bookings with stays overlapping [start, end), both bounds are optional"""
+    qs = BookingHistory.objects.all()
+    if start is not None:
+        qs = qs.filter(checkout__gt=start)
+    if end is not None:
+        qs = qs.filter(checkin__lt=end)
+    if active is not None:
+        qs = qs.filter(active=active)
+    return qs.order_by('id')
+
+
+def iter_rows(qs: QuerySet, chunk_size: int = 5000) -> Iterator[tuple]:
+    if connections[qs.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        return _iter_rows_by_id(qs, chunk_size)
+    return qs.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _iter_rows_by_id(qs: QuerySet, chunk_size: int) -> Iterator[tuple]:
+    """
+    Without server-side cursors (pgbouncer in transaction pooling mode) the whole result would be
+    fetched at once, rows are read in pages of `chunk_size` after the last id instead
+    """
+    rows = qs.values_list(*EXPORT_FIELDS).order_by('id')
+    page = list(rows[:chunk_size])
+    while page:
+        yield from page
+        if len(page) < chunk_size:
+            return
+        page = list(rows.filter(id__gt=page[-1][0])[:chunk_size])
+
+
+class _Echo:
+    """File-like object which returns written line instead of storing it"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[str]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _chunked(writer.writerow(row) for row in rows)
+
+
+def _json_default(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def ndjson_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    dumps = json.JSONEncoder(separators=(',', ':'), default=_json_default).encode
+    yield from _chunked(dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+
+
+def export_lines(qs: QuerySet, file_format: str, chunk_size: int = 5000) -> Iterator[str]:
+    rows = iter_rows(qs, chunk_size)
+    return csv_lines(rows) if file_format == 'csv' else ndjson_lines(rows)
+
+
+async def aexport_lines(qs: QuerySet, file_format: str, chunk_size: int = 5000) -> AsyncIterator[str]:
+    """
+    export_lines of ASGI responses: chunks are made one at a time in the thread of the request,
+    which keeps the connection of its server-side cursor
+    """
+    lines = export_lines(qs, file_format, chunk_size)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(lines, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(lines.close, thread_sensitive=True)()
@@ -0,0 +1,93 @@
+"""
+Holds: tentative reservations of rooms for the time of checkout flow.
+
+A live hold takes its room as an active booking does. Promotion turns it into a booking
+with one statement, DELETE ... RETURNING of the hold feeding the INSERT of the booking,
+so the stay is never held and booked at once or free in between, and a hold which has
+already expired or was promoted by a concurrent request is not promoted.
+
+Expired holds are deleted by sweep_holds command in batches walking the expiry index,
+every batch deletes at most `batch_size` oldest expired holds and skips rows locked by
+a concurrent promotion.
+"""
+import datetime
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from booking import intervals
+from booking.models import Booking, Hold
+from booking.signals import stays_changed
+from rooms import feed
+
+PROMOTED_FIELDS = ('user_id', 'room_id', 'checkin', 'checkout')
+
+
+@dataclass
+class SweepResult:
+    deleted: int = 0
+    batches: int = 0
+
+
+def _promote_sql() -> str:
+    fields = ', '.join(PROMOTED_FIELDS)
+    changes = f', changes AS ({intervals.changes_sql("promoted")})' if intervals.engine_enabled() else ''
+    return f'''
+        WITH hold AS (
+            DELETE FROM {Hold._meta.db_table} WHERE id = %(hold)s AND expires_at > now()
+            RETURNING {fields}
+        ), promoted AS (
+            INSERT INTO {Booking._meta.db_table} ({fields}, active)
+            SELECT {fields}, true FROM hold
+            RETURNING id, {fields}, active
+        ){changes}
+        SELECT id, {fields} FROM promoted
+    '''
+
+
+def promote_hold(hold_id: int) -> Booking | None:
+    """Booking made of the live hold, None when the hold has expired or is gone"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_promote_sql(), {'hold': hold_id})
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        booking = Booking(**dict(zip(('id', *PROMOTED_FIELDS), row)), active=True)
+        booking._state.adding = False
+        booking._state.db = connection.alias
+        # the stay was held, search results do not change, availability index starts counting the booking
+        stays_changed([(booking.room_id, booking.checkin, booking.checkout)])
+    return booking
+
+
+def _sweep_batch_sql() -> str:
+    return f'''
+        DELETE FROM {Hold._meta.db_table} WHERE id IN (
+            SELECT id FROM {Hold._meta.db_table}
+             WHERE expires_at <= %(now)s
+             ORDER BY expires_at, id LIMIT %(limit)s
+               FOR UPDATE SKIP LOCKED
+        )
+        RETURNING room_id, checkin, checkout
+    '''
+
+
+def sweep_holds(now: datetime.datetime | None = None, batch_size: int = 1000) -> SweepResult:
+    """Deletes holds expired by `now`, the current time of the database by default, batch by batch"""
+    result = SweepResult()
+    sql = _sweep_batch_sql()
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if now is None:
+                cursor.execute('SELECT now()')
+                now = cursor.fetchone()[0]
+            cursor.execute(sql, {'now': now, 'limit': batch_size})
+            stays = cursor.fetchall()
+        if stays:
+            result.deleted += len(stays)
+            result.batches += 1
+            # expired holds were not taking rooms any more, cached searches and feed subscribers may still miss them
+            stays_changed([(None, checkin, checkout) for _, checkin, checkout in stays])
+            feed.publish([feed.Change(feed.FREED, *stay) for stay in stays])
+        if len(stays) < batch_size:
+            return result
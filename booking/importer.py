@@ -0,0 +1,279 @@
+"""
+Bulk import of bookings from CSV or NDJSON files.
+
+Rows are parsed as a stream and loaded into a temporary staging table with COPY.
+Rejected rows are found with one set-based query: missing rooms and users, overlaps
+with existing active bookings and live holds and overlaps with rows of the same file starting earlier.
+Clean rows are inserted with one INSERT ... SELECT.
+
+Columns are the ones of the export (id is ignored): room_id, user_id, checkin, checkout, active.
+user_id and active are optional, active defaults to true.
+"""
+import csv
+import datetime
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from booking import availability, intervals
+from booking.models import Booking, Hold
+from rooms import cache as search_cache
+from rooms import feed
+from rooms.models import Room
+
+IMPORT_FIELDS = ('room_id', 'user_id', 'checkin', 'checkout', 'active')
+REPORT_FIELDS = ('line', *IMPORT_FIELDS, 'reason')
+COPY_BUFFER_SIZE = 1 << 16
+TRUE_VALUES = {'true', 't', '1', 'yes'}
+FALSE_VALUES = {'false', 'f', '0', 'no'}
+
+STAGING_TABLE = 'booking_import'
+REJECTS_TABLE = 'booking_import_rejects'
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+
+
+def _parse_id(value) -> int | None:
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _parse_active(value) -> bool:
+    if value is True or value is None or value == '':
+        return True
+    if value is False:
+        return False
+    value = str(value).lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'invalid active value {value!r}')
+
+
+def parse_record(record: dict) -> tuple:
+    """(room_id, user_id, checkin, checkout, active) of a record, raises ValueError with the reason"""
+    try:
+        room_id = _parse_id(record.get('room_id', record.get('room')))
+        user_id = _parse_id(record.get('user_id', record.get('user')))
+    except (TypeError, ValueError):
+        raise ValueError('room_id and user_id must be integers')
+    if room_id is None:
+        raise ValueError('room_id is required')
+    try:
+        checkin = datetime.date.fromisoformat(record['checkin'])
+        checkout = datetime.date.fromisoformat(record['checkout'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('checkin and checkout must be dates in YYYY-MM-DD format')
+    if checkout <= checkin:
+        raise ValueError('checkout date must be later than checkin date')
+    return room_id, user_id, checkin, checkout, _parse_active(record.get('active'))
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    for row in reader:
+        if row:
+            yield reader.line_num, dict(zip(header, row))
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+class _TextStream:
+    """Readable file object over an iterator of text chunks, consumed by COPY FROM STDIN"""
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self._rest = ''
+
+    def read(self, size: int = -1) -> str:
+        parts, length = [self._rest], len(self._rest)
+        for chunk in self._chunks:
+            parts.append(chunk)
+            length += len(chunk)
+            if 0 <= size <= length:
+                break
+        data = ''.join(parts)
+        if size < 0:
+            size = len(data)
+        self._rest = data[size:]
+        return data[:size]
+
+
+def _copy_line(line_number: int, row: tuple) -> str:
+    room_id, user_id, checkin, checkout, active = row
+    user = '\\N' if user_id is None else user_id
+    return f'{line_number}\t{room_id}\t{user}\t{checkin}\t{checkout}\t{"t" if active else "f"}\n'
+
+
+def _copy_from(cursor, sql: str, chunks: Iterator[str]) -> None:
+    stream = _TextStream(chunks)
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):  # psycopg2
+        raw_cursor.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+        return
+    with raw_cursor.copy(sql) as copy:  # psycopg 3
+        while data := stream.read(COPY_BUFFER_SIZE):
+            copy.write(data)
+
+
+def _staging_rows(records: Iterable[tuple[int, dict | None]], result: ImportResult, report) -> Iterator[str]:
+    """COPY lines of valid records, invalid ones are written to report"""
+    for line_number, record in records:
+        result.rows += 1
+        try:
+            if record is None:
+                raise ValueError('invalid record')
+            row = parse_record(record)
+        except ValueError as exc:
+            result.rejected += 1
+            report.writerow([line_number, *[(record or {}).get(field) for field in IMPORT_FIELDS], str(exc)])
+            continue
+        yield _copy_line(line_number, row)
+
+
+def _find_rejects_sql() -> str:
+    """
+    Active bookings of a room never overlap, so only the first one ending after checkin
+    of a row can overlap it. Live holds take rooms as active bookings do, expired ones may
+    overlap them, so any live hold overlapping the row rejects it. Rows passing these checks
+    are then checked against the latest checkout among such active rows of the same room
+    which start earlier, so a row rejected for another reason does not reject the ones after it.
+    Every check costs one index probe or sort.
+    """
+    return f'''
+        CREATE TEMPORARY TABLE {REJECTS_TABLE} ON COMMIT DROP AS
+        WITH checked AS (
+            SELECT s.*, CASE
+                   WHEN r.id IS NULL THEN 'room does not exist'
+                   WHEN s.user_id IS NOT NULL AND u.id IS NULL THEN 'user does not exist'
+                   WHEN taken.checkin < s.checkout THEN 'dates are already taken'
+                   WHEN held.id IS NOT NULL THEN 'dates are held'
+               END AS reason
+              FROM {STAGING_TABLE} s
+              LEFT JOIN {Room._meta.db_table} r ON r.id = s.room_id
+              LEFT JOIN {get_user_model()._meta.db_table} u ON u.id = s.user_id
+              LEFT JOIN LATERAL (
+                  SELECT b.checkin FROM {Booking._meta.db_table} b
+                   WHERE s.active AND b.room_id = s.room_id AND b.active AND b.checkout > s.checkin
+                   ORDER BY b.checkout LIMIT 1
+              ) taken ON true
+              LEFT JOIN LATERAL (
+                  SELECT h.id FROM {Hold._meta.db_table} h
+                   WHERE s.active AND h.room_id = s.room_id AND h.checkout > s.checkin AND h.checkin < s.checkout
+                     AND h.expires_at > now()
+                   LIMIT 1
+              ) held ON true
+        )
+        SELECT line, room_id, user_id, checkin, checkout, active,
+               coalesce(reason, 'dates overlap another row') AS reason
+          FROM (
+              SELECT *, max(checkout) FILTER (WHERE active AND reason IS NULL) OVER (
+                         PARTITION BY room_id ORDER BY checkin, line
+                         ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                     ) AS previous_checkout
+                FROM checked
+          ) windowed
+         WHERE reason IS NOT NULL OR (active AND previous_checkout > checkin)
+    '''
+
+
+def _insert_sql() -> str:
+    insert = f'''
+        INSERT INTO {Booking._meta.db_table} (room_id, user_id, checkin, checkout, active)
+        SELECT s.room_id, s.user_id, s.checkin, s.checkout, s.active
+          FROM {STAGING_TABLE} s
+         WHERE NOT EXISTS (SELECT 1 FROM {REJECTS_TABLE} j WHERE j.line = s.line)
+         ORDER BY s.line
+    '''
+    if not intervals.engine_enabled():
+        return insert
+    # feed rows of imported bookings, one per inserted row, so rowcount stays the number of imported bookings
+    return f'''
+        WITH imported AS ({insert} RETURNING id, room_id, checkin, checkout, active)
+        {intervals.changes_sql('imported')}
+    '''
+
+
+def _refresh_derived_data(cursor) -> None:
+    """
+    Availability index, search cache and availability feed of the dates covered by imported bookings,
+    set-based counterpart of bookings_bulk_created handlers (interval engine is fed by the insert itself)
+    """
+    imported = f'''
+        FROM {STAGING_TABLE} s
+        WHERE s.active AND NOT EXISTS (SELECT 1 FROM {REJECTS_TABLE} j WHERE j.line = s.line)
+    '''
+    cursor.execute(f'SELECT min(s.checkin), max(s.checkout) {imported}')
+    start, end = cursor.fetchone()
+    if start is None:
+        return
+    if availability.index_enabled():
+        availability.rebuild_index(since=start)
+    search_cache.bump_stay_versions([(start, end)])
+    if feed.feed_enabled():
+        cursor.execute(f'SELECT s.room_id, s.checkin, s.checkout {imported} ORDER BY s.line')
+        while stays := cursor.fetchmany(10000):
+            feed.publish([feed.Change(feed.BOOKED, *stay) for stay in stays])
+
+
+def import_bookings(lines: Iterable[str], file_format: str, report, dry_run: bool = False) -> ImportResult:
+    """
+    Imports bookings from lines of CSV or NDJSON text, rejected rows are written
+    with the reason to `report` csv writer. Bookings table is locked against
+    concurrent writes between conflicts check and insert.
+    """
+    result = ImportResult()
+    records = READERS[file_format](lines)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'''
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                line integer NOT NULL, room_id bigint NOT NULL, user_id bigint,
+                checkin date NOT NULL, checkout date NOT NULL, active boolean NOT NULL
+            ) ON COMMIT DROP
+        ''')
+        _copy_from(cursor, f'COPY {STAGING_TABLE} (line, {", ".join(IMPORT_FIELDS)}) FROM STDIN',
+                   _staging_rows(records, result, report))
+        cursor.execute(f'ANALYZE {STAGING_TABLE}')
+
+        cursor.execute(f'LOCK TABLE {Booking._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(_find_rejects_sql())
+        cursor.execute(f'SELECT {", ".join(REPORT_FIELDS)} FROM {REJECTS_TABLE} ORDER BY line')
+        while rows := cursor.fetchmany(10000):
+            result.rejected += len(rows)
+            report.writerows(rows)
+
+        if dry_run:
+            transaction.set_rollback(True)
+            return result
+        cursor.execute(_insert_sql())
+        result.imported = cursor.rowcount
+        _refresh_derived_data(cursor)
+        # ON COMMIT DROP does not fire when the import runs inside an outer transaction
+        cursor.execute(f'DROP TABLE {STAGING_TABLE}, {REJECTS_TABLE}')
+    return result
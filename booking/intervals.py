@@ -0,0 +1,322 @@
+"""
+In-memory interval engine of active bookings.
+
+Every worker keeps active bookings ending after the snapshot date as sorted interval arrays:
+one per room and one of all rooms, ordered by checkin. Stays overlapping [checkin, checkout)
+start in [checkin - longest stay + 1, checkout), so overlap queries are a binary search and
+a scan of that slice, without SQL.
+
+State is loaded from a binary snapshot file written by `snapshot_bookings` command, which
+workers memory-map on first use, and then follows BookingChange feed. Feed rows carry the
+state of a booking after a change and are read by transaction id: rows of transactions below
+xmin of the current database snapshot can not be in progress any more, so nothing committed
+out of order is skipped. Snapshot remembers xmin it was taken at, changes it already contains
+are applied again, which is harmless.
+
+Only reads of replica_reads() scope (safe search and listing requests, which tolerate replica
+lag as well) are answered by the engine, conflict checks of writes always use SQL. Reads fall back
+to SQL while there is no snapshot or it is older than the feed retention, while the feed is
+behind for more than BOOKING_INTERVAL_MAX_LAG_SECONDS and for stays starting before the snapshot date.
+"""
+import datetime
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+
+from booking.models import Booking, BookingChange
+from common import routers
+
+logger = logging.getLogger('booking.intervals')
+
+# magic, format version, feed position (xmin), created (unix time), since (date ordinal), number of records
+HEADER = struct.Struct('<4sHqdiI')
+# booking id, room id, checkin and checkout ordinals
+RECORD = struct.Struct('<qqii')
+MAGIC = b'BKIV'
+VERSION = 1
+# missing or stale snapshot is looked for again after this number of seconds
+SNAPSHOT_RETRY_SECONDS = 60
+
+
+def engine_enabled() -> bool:
+    return getattr(settings, 'BOOKING_INTERVAL_ENGINE', False)
+
+
+def snapshot_path() -> str:
+    return getattr(settings, 'BOOKING_INTERVAL_SNAPSHOT', 'booking_intervals.snapshot')
+
+
+def _poll_seconds() -> float:
+    return getattr(settings, 'BOOKING_INTERVAL_POLL_SECONDS', 1)
+
+
+def _max_lag() -> float:
+    return getattr(settings, 'BOOKING_INTERVAL_MAX_LAG_SECONDS', 10)
+
+
+def _retention() -> datetime.timedelta:
+    return datetime.timedelta(hours=getattr(settings, 'BOOKING_CHANGE_FEED_RETENTION_HOURS', 24))
+
+
+def _horizon_sql() -> str:
+    """xmin of the current snapshot and seconds the oldest committed change above it waits"""
+    return f'''
+        SELECT h.xmin, EXTRACT(EPOCH FROM now() - (
+                   SELECT min(c.created) FROM {BookingChange._meta.db_table} c WHERE c.txid >= h.xmin))
+          FROM (SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin) h
+    '''
+
+
+def _overlapping(stays: list[tuple], checkin: int, checkout: int, max_nights: int) -> list[tuple]:
+    """Stays of a list sorted by checkin which overlap [checkin, checkout)"""
+    first = bisect_left(stays, (checkin - max_nights + 1,))
+    last = bisect_left(stays, (checkout,), first)
+    return [stay for stay in stays[first:last] if stay[1] > checkin]
+
+
+def _remove(stays: list[tuple], stay: tuple) -> None:
+    position = bisect_left(stays, stay)
+    if position < len(stays) and stays[position] == stay:
+        del stays[position]
+
+
+class IntervalEngine:
+    """Sorted interval arrays of active bookings, see module docstring. Dates are kept as ordinals."""
+
+    def __init__(self, position: int, since: datetime.date, records: Iterable[tuple[int, int, int, int]] = ()):
+        # feed rows of transactions with lower ids are applied
+        self.position = position
+        self.since = since.toordinal()
+        self.polled_at: float | None = None
+        self.lag = 0.0
+        self._lock = threading.RLock()
+        self._poll_lock = threading.Lock()
+        self._bookings: dict[int, tuple[int, int, int]] = {}
+        # per room (checkin, checkout, booking id), of all rooms (checkin, checkout, room id, booking id)
+        self._rooms: dict[int, list[tuple[int, int, int]]] = defaultdict(list)
+        self._stays: list[tuple[int, int, int, int]] = []
+        self._max_nights = 0
+        for booking_id, room_id, checkin, checkout in records:
+            self._bookings[booking_id] = (room_id, checkin, checkout)
+            self._rooms[room_id].append((checkin, checkout, booking_id))
+            self._stays.append((checkin, checkout, room_id, booking_id))
+            self._max_nights = max(self._max_nights, checkout - checkin)
+        # snapshot records are sorted already, sorting them is linear
+        self._stays.sort()
+        for stays in self._rooms.values():
+            stays.sort()
+
+    def __len__(self) -> int:
+        return len(self._bookings)
+
+    def covers(self, checkin: datetime.date) -> bool:
+        return checkin.toordinal() >= self.since
+
+    def apply(self, booking_id: int, room_id: int | None, checkin: datetime.date, checkout: datetime.date,
+              active: bool) -> None:
+        """Replaces the stay of a booking with its state after a change"""
+        with self._lock:
+            self._discard(booking_id)
+            checkin, checkout = checkin.toordinal(), checkout.toordinal()
+            if not active or room_id is None or checkout <= self.since:
+                return
+            self._bookings[booking_id] = (room_id, checkin, checkout)
+            insort(self._rooms[room_id], (checkin, checkout, booking_id))
+            insort(self._stays, (checkin, checkout, room_id, booking_id))
+            self._max_nights = max(self._max_nights, checkout - checkin)
+
+    def _discard(self, booking_id: int) -> None:
+        stay = self._bookings.pop(booking_id, None)
+        if stay is None:
+            return
+        room_id, checkin, checkout = stay
+        _remove(self._rooms[room_id], (checkin, checkout, booking_id))
+        if not self._rooms[room_id]:
+            del self._rooms[room_id]
+        _remove(self._stays, (checkin, checkout, room_id, booking_id))
+
+    def intersections(self, checkin: datetime.date, checkout: datetime.date, room_id: int | None = None) -> list[int]:
+        """Ids of active bookings overlapping the stay, of one room or of all rooms"""
+        with self._lock:
+            if room_id is not None:
+                stays = self._rooms.get(room_id, [])
+                return [stay[2] for stay in _overlapping(stays, checkin.toordinal(), checkout.toordinal(),
+                                                         self._max_nights)]
+            return [stay[3] for stay in _overlapping(self._stays, checkin.toordinal(), checkout.toordinal(),
+                                                     self._max_nights)]
+
+    def booked_room_ids(self, checkin: datetime.date, checkout: datetime.date) -> set[int]:
+        """Ids of rooms occupied at least one night between checkin and checkout"""
+        with self._lock:
+            return {stay[2] for stay in _overlapping(self._stays, checkin.toordinal(), checkout.toordinal(),
+                                                     self._max_nights)}
+
+    def poll(self, using: str) -> int:
+        """Applies feed rows of finished transactions, returns their number"""
+        with connections[using].cursor() as cursor:
+            cursor.execute(_horizon_sql())
+            xmin, lag = cursor.fetchone()
+        changes = BookingChange.objects.using(using).filter(txid__gte=self.position, txid__lt=xmin).order_by(
+            'id').values_list('booking_id', 'room_id', 'checkin', 'checkout', 'active')
+        rows = list(changes)
+        with self._lock:
+            for row in rows:
+                self.apply(*row)
+            self.position = max(self.position, xmin)
+            self.lag = float(lag or 0)
+            self.polled_at = time.monotonic()
+        return len(rows)
+
+    def poll_if_due(self, using: str) -> None:
+        """Polls once per BOOKING_INTERVAL_POLL_SECONDS, other threads keep reading while one polls"""
+        if self.polled_at is not None and time.monotonic() - self.polled_at < _poll_seconds():
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self.poll(using)
+        except DatabaseError:
+            logger.warning('Booking change feed poll failed', exc_info=True)
+        finally:
+            self._poll_lock.release()
+
+    def is_fresh(self) -> bool:
+        return self.polled_at is not None and time.monotonic() - self.polled_at <= _max_lag() \
+            and self.lag <= _max_lag()
+
+
+@dataclass
+class Snapshot:
+    position: int
+    created: float
+    since: datetime.date
+    records: list[tuple[int, int, int, int]]
+
+
+def write_snapshot(path: str, since: datetime.date | None = None) -> Snapshot:
+    """
+    Writes active bookings ending after `since` (today by default) to the snapshot file.
+    Bookings and feed position are read in one repeatable read transaction, file is replaced atomically.
+    """
+    since = since or datetime.date.today()
+    using = router.db_for_write(Booking)
+    connection = connections[using]
+    isolated = not connection.in_atomic_block
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if isolated:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute(_horizon_sql())
+        position = cursor.fetchone()[0]
+        bookings = Booking.objects.using(using).filter(active=True, room__isnull=False, checkout__gt=since).order_by(
+            'checkin', 'checkout', 'room_id', 'id').values_list('id', 'room_id', 'checkin', 'checkout')
+        records = [(booking_id, room_id, checkin.toordinal(), checkout.toordinal())
+                   for booking_id, room_id, checkin, checkout in bookings.iterator()]
+
+    snapshot = Snapshot(position, time.time(), since, records)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, position, snapshot.created, since.toordinal(), len(records)))
+        for record in records:
+            output.write(RECORD.pack(*record))
+    os.replace(temporary, path)
+    return snapshot
+
+
+def read_snapshot(path: str) -> Snapshot:
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < HEADER.size:
+            raise ValueError(f'{path} is not a bookings snapshot')
+        magic, version, position, created, since, count = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION or len(mapped) != HEADER.size + count * RECORD.size:
+            raise ValueError(f'{path} is not a bookings snapshot of version {VERSION}')
+        with memoryview(mapped) as view:
+            records = list(RECORD.iter_unpack(view[HEADER.size:]))
+    return Snapshot(position, created, datetime.date.fromordinal(since), records)
+
+
+def load_engine(path: str) -> IntervalEngine | None:
+    """Engine from snapshot file, None when it is missing or too old to be caught up with the feed"""
+    try:
+        snapshot = read_snapshot(path)
+    except (OSError, ValueError) as exc:
+        logger.warning('Bookings snapshot is not loaded: %s', exc)
+        return None
+    if time.time() - snapshot.created > _retention().total_seconds() - _max_lag():
+        logger.warning('Bookings snapshot %s is older than change feed retention', path)
+        return None
+    return IntervalEngine(snapshot.position, snapshot.since, snapshot.records)
+
+
+_engine: IntervalEngine | None = None
+_retry_at = 0.0
+_load_lock = threading.Lock()
+
+
+def get_engine() -> IntervalEngine | None:
+    """Engine of this process, loaded on first use"""
+    global _engine, _retry_at
+    if _engine is None and time.monotonic() >= _retry_at:
+        with _load_lock:
+            if _engine is None and time.monotonic() >= _retry_at:
+                _engine = load_engine(snapshot_path())
+                _retry_at = time.monotonic() + SNAPSHOT_RETRY_SECONDS
+    return _engine
+
+
+def reset_engine() -> None:
+    """Drops the engine of this process, it is loaded from the snapshot again on next use"""
+    global _engine, _retry_at
+    with _load_lock:
+        _engine, _retry_at = None, 0.0
+
+
+def read_engine(checkin: datetime.date) -> IntervalEngine | None:
+    """Engine to answer a read of stays from checkin, None when the read should use SQL"""
+    if not engine_enabled() or not routers.in_replica_reads():
+        return None
+    engine = get_engine()
+    if engine is None or not engine.covers(checkin):
+        return None
+    engine.poll_if_due(router.db_for_write(BookingChange))
+    if engine.is_fresh():
+        return engine
+    if engine.polled_at is not None and time.monotonic() - engine.polled_at > _retention().total_seconds():
+        # feed rows it has not seen may be pruned already
+        reset_engine()
+    return None
+
+
+def record_changes(bookings: Iterable[tuple], deleted: bool = False) -> None:
+    """Writes (booking id, room id, checkin, checkout, active) states to the feed while the engine is enabled"""
+    if engine_enabled():
+        BookingChange.objects.bulk_create([
+            BookingChange(booking_id=booking_id, room_id=room_id, checkin=checkin, checkout=checkout,
+                          active=active and not deleted)
+            for booking_id, room_id, checkin, checkout, active in bookings
+        ])
+
+
+def changes_sql(source: str, active: str = 'active') -> str:
+    """INSERT of feed rows for bookings selected by `source` with id, room_id, checkin and checkout columns"""
+    return f'''
+        INSERT INTO {BookingChange._meta.db_table} (booking_id, room_id, checkin, checkout, active)
+        SELECT id, room_id, checkin, checkout, {active} FROM {source}
+    '''
+
+
+def prune_changes(now: datetime.datetime | None = None) -> int:
+    """Deletes feed rows older than BOOKING_CHANGE_FEED_RETENTION_HOURS, returns their number"""
+    cutoff = (now or timezone.now()) - _retention()
+    deleted, _ = BookingChange.objects.filter(created__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from booking.archive import archive_bookings, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Moves bookings which ended before the cutoff date to the archive table, meant to run on a schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive bookings with checkout more than this number of days ago, '
+                                 'BOOKING_ARCHIVE_AFTER_DAYS by default')
+        parser.add_argument('--before', type=datetime.date.fromisoformat, default=None,
+                            help='Archive bookings with checkout before this date (YYYY-MM-DD), overrides --days')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Bookings moved in one transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count bookings to archive')
+
+    def handle(self, *args, **options):
+        before = options['before'] or archive_cutoff(options['days'])
+        result = archive_bookings(before, options['batch_size'], options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{result.archived} bookings with checkout before {before} would be archived')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {result.archived} bookings with checkout before {before} in {result.batches} batches'))
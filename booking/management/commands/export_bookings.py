@@ -0,0 +1,37 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from booking.export import EXPORT_FORMATS, export_lines, export_queryset
+
+
+def active_flag(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class Command(BaseCommand):
+    help = 'Streams bookings as CSV or NDJSON to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', default=None, help='File to write to, stdout by default')
+        parser.add_argument('--start', type=datetime.date.fromisoformat, default=None,
+                            help='Only stays ending after this date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, default=None,
+                            help='Only stays starting before this date (YYYY-MM-DD)')
+        parser.add_argument('--active', type=active_flag, default=None, help='Only active (true) or inactive (false)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched from cursor at once')
+
+    def handle(self, *args, **options):
+        qs = export_queryset(options['start'], options['end'], options['active'])
+        lines = export_lines(qs, options['file_format'], options['chunk_size'])
+        if options['output'] is None:
+            for chunk in lines:
+                self.stdout.write(chunk, ending='')
+            return
+        rows = -1 if options['file_format'] == 'csv' else 0
+        with open(options['output'], 'w', newline='') as output:
+            for chunk in lines:
+                output.write(chunk)
+                rows += chunk.count('\n')
+        self.stdout.write(self.style.SUCCESS(f'Exported {rows} bookings to {options["output"]}'))
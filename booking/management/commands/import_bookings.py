@@ -0,0 +1,43 @@
+import csv
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking.importer import READERS, REPORT_FIELDS, import_bookings
+
+
+def detect_format(path: str) -> str:
+    return 'ndjson' if os.path.splitext(path)[1].lower() in ('.ndjson', '.jsonl') else 'csv'
+
+
+class Command(BaseCommand):
+    help = 'Imports bookings from CSV or NDJSON file with COPY, rejected rows are written to a report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, - for stdin')
+        parser.add_argument('--format', dest='file_format', choices=list(READERS), default=None,
+                            help='Input format, detected by file extension by default')
+        parser.add_argument('--report', default=None,
+                            help='CSV file for rejected rows, <path>.rejects.csv by default')
+        parser.add_argument('--dry-run', action='store_true', help='Check rows and write report without importing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or detect_format(path)
+        report_path = options['report'] or f'{"bookings" if path == "-" else path}.rejects.csv'
+
+        started = time.perf_counter()
+        with (sys.stdin if path == '-' else open(path, newline='')) as lines, \
+                open(report_path, 'w', newline='') as report_file:
+            report = csv.writer(report_file)
+            report.writerow(REPORT_FIELDS)
+            result = import_bookings(lines, file_format, report, dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Checked" if options["dry_run"] else "Imported"} {result.rows} rows in {elapsed:.1f}s '
+            f'({result.rows / elapsed:.0f} rows/s): {result.imported} bookings created, '
+            f'{result.rejected} rejected, see {report_path}'
+        ))
@@ -0,0 +1,18 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from booking.availability import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds monthly bitmaps of booked nights of rooms from active bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.date.fromisoformat, default=None,
+                            help='Rebuild only months starting from the month of this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_index(since=options['since'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Availability index rebuilt: {rows} room months'))
@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from booking.intervals import prune_changes, snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Writes active bookings to the snapshot of in-memory interval engine and prunes old change feed rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='Snapshot file, BOOKING_INTERVAL_SNAPSHOT by default')
+        parser.add_argument('--since', type=datetime.date.fromisoformat, default=None,
+                            help='Keep bookings ending after this date (YYYY-MM-DD), today by default')
+        parser.add_argument('--no-prune', action='store_true', help='Keep change feed rows')
+
+    def handle(self, *args, **options):
+        path = options['path'] or snapshot_path()
+        snapshot = write_snapshot(path, since=options['since'])
+        self.stdout.write(self.style.SUCCESS(f'{len(snapshot.records)} bookings written to {path}'))
+        if not options['no_prune']:
+            self.stdout.write(f'{prune_changes()} change feed rows pruned')
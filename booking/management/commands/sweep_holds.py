@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from booking.holds import sweep_holds
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired holds in batches walking the expiry index, meant to run on a schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Holds deleted in one transaction')
+
+    def handle(self, *args, **options):
+        result = sweep_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {result.deleted} expired holds in {result.batches} batches'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rooms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkin', models.DateField(db_index=True, verbose_name='Дата начала брони')),
+                ('checkout', models.DateField(db_index=True, verbose_name='Дата конца брони')),
+                ('active', models.BooleanField(default=True, verbose_name='Бронь активна')),
+                ('room', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='rooms.room', verbose_name='Забронированная комната')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Бронирующий пользователь')),
+            ],
+            options={
+                'verbose_name': 'Бронь',
+                'verbose_name_plural': 'Брони',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(check=models.Q(('checkout__gt', models.F('checkin'))), name='checkin_before_checkout'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('rooms', models.BinaryField(default=bytes, verbose_name='Занятые комнаты')),
+            ],
+            options={
+                'verbose_name': 'Занятость за день',
+                'verbose_name_plural': 'Занятость по дням',
+            },
+        ),
+    ]
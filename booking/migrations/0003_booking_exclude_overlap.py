@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+import django.contrib.postgres.constraints
+from django.conf import settings
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+import booking.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_dayoccupancy'),
+        ('rooms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # exclusion constraint compares room ids with = inside GiST index
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('active', True)), expressions=[('room', '='), (booking.models.DateRange('checkin', 'checkout'), '&&')], name='booking_exclude_overlap'),
+        ),
+    ]
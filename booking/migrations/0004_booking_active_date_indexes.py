@@ -0,0 +1,34 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_booking_exclude_overlap'),
+        ('rooms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='checkin',
+            field=models.DateField(verbose_name='Дата начала брони'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='checkout',
+            field=models.DateField(verbose_name='Дата конца брони'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('active', True)), fields=['room', 'checkout', 'checkin'], name='booking_active_room_dates'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('active', True)), fields=['checkout', 'checkin'], include=('room',), name='booking_active_dates'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# columns of booking_booking and booking_archivedbooking as of this migration, migrations altering them
+# drop the view first and create it again after with the new definition
+HISTORY_VIEW_SQL = '''
+    CREATE OR REPLACE VIEW booking_history (id, user_id, room_id, checkin, checkout, active, archived) AS
+    SELECT id, user_id, room_id, checkin, checkout, active, false FROM booking_booking
+     UNION ALL
+    SELECT id, user_id, room_id, checkin, checkout, active, true FROM booking_archivedbooking
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_booking_active_date_indexes'),
+        ('rooms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('checkin', models.DateField()),
+                ('checkout', models.DateField()),
+                ('active', models.BooleanField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'booking_history',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('checkin', models.DateField(verbose_name='Дата начала брони')),
+                ('checkout', models.DateField(db_index=True, verbose_name='Дата конца брони')),
+                ('active', models.BooleanField(default=True, verbose_name='Бронь активна')),
+                ('room', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to='rooms.room', verbose_name='Забронированная комната')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Бронирующий пользователь')),
+            ],
+            options={
+                'verbose_name': 'Архивная бронь',
+                'verbose_name_plural': 'Архивные брони',
+            },
+        ),
+        migrations.RunSQL(HISTORY_VIEW_SQL, reverse_sql='DROP VIEW IF EXISTS booking_history'),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+import booking.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_archivedbooking_bookinghistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.BigIntegerField()),
+                ('room_id', models.BigIntegerField(null=True)),
+                ('checkin', models.DateField()),
+                ('checkout', models.DateField()),
+                ('active', models.BooleanField()),
+                ('txid', models.BigIntegerField(db_default=booking.models.TransactionId(), db_index=True)),
+                ('created', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Изменение брони',
+                'verbose_name_plural': 'Изменения броней',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import booking.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_bookingchange'),
+        ('rooms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkin', models.DateField(verbose_name='Дата начала брони')),
+                ('checkout', models.DateField(verbose_name='Дата конца брони')),
+                ('expires_at', models.DateTimeField(default=booking.models.hold_expiry, verbose_name='Действует до')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='rooms.room', verbose_name='Комната')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holds', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Временная бронь',
+                'verbose_name_plural': 'Временные брони',
+                'indexes': [models.Index(fields=['room', 'checkout', 'checkin'], include=('expires_at',), name='hold_room_dates'), models.Index(fields=['checkout', 'checkin'], include=('room', 'expires_at'), name='hold_dates'), models.Index(fields=['expires_at', 'id'], name='hold_expires_at')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.CheckConstraint(check=models.Q(('checkout__gt', models.F('checkin'))), name='hold_checkin_before_checkout'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+import datetime
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_room_occupancy(apps, schema_editor):
+    """Index of active bookings, as rebuild_availability_index command builds it"""
+    Booking = apps.get_model('booking', 'Booking')
+    RoomOccupancy = apps.get_model('booking', 'RoomOccupancy')
+    db = schema_editor.connection.alias
+    rooms_nights = defaultdict(int)
+    bookings = Booking.objects.using(db).filter(active=True, room__isnull=False)
+    for room_id, checkin, checkout in bookings.values_list('room_id', 'checkin', 'checkout').iterator():
+        day = checkin
+        while day < checkout:
+            rooms_nights[room_id, day.replace(day=1)] |= 1 << (day.day - 1)
+            day += datetime.timedelta(days=1)
+    RoomOccupancy.objects.using(db).bulk_create(
+        [RoomOccupancy(room_id=room_id, month=month, nights=nights)
+         for (room_id, month), nights in rooms_nights.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_hold'),
+        ('rooms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='DayOccupancy',
+        ),
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('nights', models.IntegerField(default=0, verbose_name='Занятые ночи')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+',
+                                           to='rooms.room', verbose_name='Комната')),
+            ],
+            options={
+                'verbose_name': 'Занятость комнаты за месяц',
+                'verbose_name_plural': 'Занятость комнат по месяцам',
+                'constraints': [models.UniqueConstraint(fields=('month', 'room'), name='room_occupancy_month_room')],
+            },
+        ),
+        migrations.RunPython(fill_room_occupancy, migrations.RunPython.noop),
+    ]
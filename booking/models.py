@@ -1,12 +1,59 @@
 import datetime
+from collections.abc import Iterable
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Now
+from django.utils import timezone
 
 from rooms.models import Room
 
+BOOKING_OVERLAP_CONSTRAINT = 'booking_exclude_overlap'
+
+
+def exclusion_engine_enabled() -> bool:
+    return getattr(settings, 'BOOKING_ENGINE', 'default') == 'exclusion'
+
+
+def is_overlap_error(exc: IntegrityError) -> bool:
+    """Checks that integrity error was raised by overlapping bookings exclusion constraint"""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == BOOKING_OVERLAP_CONSTRAINT
+
+
+def lock_room(using: str, room_id: int | None) -> None:
+    """
+    Locks the room row until the end of transaction, so check and write of bookings
+    and holds of one room run one at a time, while those of other rooms do not wait
+    """
+    if room_id is not None:
+        list(Room.objects.using(using).select_for_update().filter(pk=room_id).values_list('pk', flat=True))
+
+
+class DateRange(models.Func):
+    function = 'DATERANGE'
+    output_field = DateRangeField()
+
+
+def booking_overlap_constraint() -> ExclusionConstraint:
+    """
+    EXCLUDE USING gist (room WITH =, daterange(checkin, checkout) WITH &&) WHERE active.
+    The constraint exists with either engine, so the engine can be switched without migrations
+    """
+    return ExclusionConstraint(
+        name=BOOKING_OVERLAP_CONSTRAINT,
+        expressions=[
+            ('room', RangeOperators.EQUAL),
+            (DateRange('checkin', 'checkout'), RangeOperators.OVERLAPS),
+        ],
+        condition=Q(active=True),
+    )
+
 
 class BookingQuerySet(models.QuerySet):
 
@@ -16,12 +63,12 @@ class BookingQuerySet(models.QuerySet):
             checkout: datetime.datetime,
             room: Room | None = None
     ) -> QuerySet:
-        """Method takes dates and room and checks for bookings in selected date"""
-        lookup = ((
-            Q(checkin__lt=checkout) & Q(checkout__gt=checkin)) | (
-            Q(checkin=checkin) & Q(checkout__gt=checkin)) | (
-            Q(checkin__lt=checkout) & Q(checkout=checkout))
-        )
+        """
+        Method takes dates and room and checks for bookings in selected date.
+        Stays overlap when each one starts before the other ends, a range condition
+        on both date columns of booking_active_room_dates and booking_active_dates indexes.
+        """
+        lookup = Q(checkin__lt=checkout, checkout__gt=checkin)
         qs = self
         if room:
             qs = self.filter(room=room)
@@ -40,9 +87,47 @@ class BookingManager(models.Manager):
             checkout: datetime.date,
             room: Room | None = None
     ) -> QuerySet:
+        """
+        Active bookings overlapping the stay. Reads of replica_reads() scope are answered
+        by the in-memory interval engine while it is enabled and up to date, see booking.intervals.
+        Managers bound to a database, e.g. of the conflict check in Booking.clean(), always query it.
+        Live holds are not Booking rows and are not counted, whether rooms are free is answered by get_taken().
+        """
         active_bookings = self.get_queryset().filter(active=True)
+        if self._db is None:
+            # engine module imports models of this one
+            from booking import intervals
+
+            engine = intervals.read_engine(checkin)
+            if engine is not None:
+                ids = engine.intersections(checkin, checkout, getattr(room, 'pk', room))
+                return active_bookings.filter(pk__in=ids) if ids else active_bookings.none()
         return active_bookings.get_intersections(checkin, checkout, room)
 
+    def get_taken(
+            self,
+            checkin: datetime.date,
+            checkout: datetime.date,
+            rooms: QuerySet | Iterable[int] | None = None,
+            booking_id: int | None = None,
+            hold_id: int | None = None
+    ) -> QuerySet:
+        """
+        (room_id, checkin, checkout) of active bookings and live holds of rooms overlapping the stay,
+        everything which takes the rooms, except the given booking and hold, with one UNION ALL query.
+        Checks of whether rooms are free use it, stays of bookings and holds may overlap.
+        """
+        bookings = self.get_intersections(checkin, checkout)
+        holds = Hold.objects.db_manager(self._db).get_intersections(checkin, checkout)
+        if rooms is not None:
+            bookings, holds = bookings.filter(room_id__in=rooms), holds.filter(room_id__in=rooms)
+        if booking_id is not None:
+            bookings = bookings.exclude(id=booking_id)
+        if hold_id is not None:
+            holds = holds.exclude(id=hold_id)
+        return bookings.values_list('room_id', 'checkin', 'checkout').union(
+            holds.values_list('room_id', 'checkin', 'checkout'), all=True)
+
 
 class Booking(models.Model):
     user = models.ForeignKey(
@@ -51,8 +136,8 @@ class Booking(models.Model):
     room = models.ForeignKey(
         Room, null=True, related_name='bookings', on_delete=models.SET_NULL, verbose_name='Забронированная комната'
     )
-    checkin = models.DateField(db_index=True, verbose_name='Дата начала брони')
-    checkout = models.DateField(db_index=True, verbose_name='Дата конца брони')
+    checkin = models.DateField(verbose_name='Дата начала брони')
+    checkout = models.DateField(verbose_name='Дата конца брони')
     active = models.BooleanField(default=True, verbose_name='Бронь активна')
     objects = BookingManager()
 
@@ -63,7 +148,16 @@ class Booking(models.Model):
             models.CheckConstraint(
                 check=Q(checkout__gt=F('checkin')),
                 name='checkin_before_checkout'
-            )
+            ),
+            booking_overlap_constraint(),
+        ]
+        indexes = [
+            # Intersections of a room and of all rooms, the latter index-only. Most bookings are in the past,
+            # so stays ending after checkin are the selective range, not stays starting before checkout
+            models.Index(fields=['room', 'checkout', 'checkin'], condition=Q(active=True),
+                         name='booking_active_room_dates'),
+            models.Index(fields=['checkout', 'checkin'], include=['room'], condition=Q(active=True),
+                         name='booking_active_dates'),
         ]
 
     def __str__(self):
@@ -71,12 +165,212 @@ class Booking(models.Model):
 
     def clean(self):
         super().clean()
-        existing_bookings = Booking.objects.get_intersections(
-            self.checkin, self.checkout, self.room).exclude(id=self.id)
-        if existing_bookings.all():
+        # conflicts are checked on the database the booking is written to, never on a lagging replica
+        self.check_taken(router.db_for_write(Booking, instance=self))
+
+    def check_taken(self, using: str) -> None:
+        """
+        Bookings and holds are read with one statement: a promoted hold is turned into a booking
+        in one statement as well, so the check sees it either as one or as the other
+        """
+        rooms = None if self.room is None else [self.room.pk]
+        taken = Booking.objects.db_manager(using).get_taken(self.checkin, self.checkout, rooms, booking_id=self.id)
+        if taken.exists():
+            raise ValidationError('Выбранная дата уже занята!')
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Booking, instance=self)
+        if exclusion_engine_enabled():
+            # Overlaps are rejected by the exclusion constraint in the same INSERT/UPDATE,
+            # savepoint keeps outer transaction usable after IntegrityError
+            # Holds are checked after the write: room key lock of the foreign key check waits for
+            # the transaction of a hold of the room, which then is committed and seen
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+                if self.active:
+                    self.check_taken(using)
+            return
+        # Conflict check and write run in one transaction, so behind pgbouncer in transaction
+        # pooling mode they use the same server connection and leave nothing in the session
+        with transaction.atomic(using=using):
+            if self.active:
+                self.lock_room(using)
+                self.clean()
+            super().save(*args, **kwargs)
+
+    def lock_room(self, using: str) -> None:
+        lock_room(using, self.room_id)
+
+
+def hold_expiry() -> datetime.datetime:
+    return timezone.now() + datetime.timedelta(seconds=getattr(settings, 'BOOKING_HOLD_SECONDS', 900))
+
+
+class HoldQuerySet(BookingQuerySet):
+
+    def live(self) -> QuerySet:
+        return self.filter(expires_at__gt=Now())
+
+    def expired(self) -> QuerySet:
+        return self.filter(expires_at__lte=Now())
+
+
+class HoldManager(models.Manager.from_queryset(HoldQuerySet)):
+
+    def get_intersections(
+            self,
+            checkin: datetime.date,
+            checkout: datetime.date,
+            room: Room | None = None
+    ) -> QuerySet:
+        """Live holds overlapping the stay, they take rooms as active bookings do"""
+        return self.get_queryset().live().get_intersections(checkin, checkout, room)
+
+
+class Hold(models.Model):
+    """
+    Tentative reservation of a room for the time of checkout flow. Until `expires_at` the hold
+    takes the room as an active booking does: bookings and other holds of its dates are rejected
+    and the room is not found by search. A live hold is turned into a booking by booking.holds.promote_hold,
+    expired holds are deleted by sweep_holds command.
+    """
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.SET_NULL, null=True, related_name='holds', verbose_name='Пользователь'
+    )
+    room = models.ForeignKey(Room, related_name='holds', on_delete=models.CASCADE, verbose_name='Комната')
+    checkin = models.DateField(verbose_name='Дата начала брони')
+    checkout = models.DateField(verbose_name='Дата конца брони')
+    expires_at = models.DateTimeField(default=hold_expiry, verbose_name='Действует до')
+    objects = HoldManager()
+
+    class Meta:
+        verbose_name = 'Временная бронь'
+        verbose_name_plural = 'Временные брони'
+        constraints = [
+            models.CheckConstraint(check=Q(checkout__gt=F('checkin')), name='hold_checkin_before_checkout'),
+        ]
+        indexes = [
+            # expiry can not be a partial index condition, so it is kept in the index of intersections
+            models.Index(fields=['room', 'checkout', 'checkin'], include=['expires_at'], name='hold_room_dates'),
+            models.Index(fields=['checkout', 'checkin'], include=['room', 'expires_at'], name='hold_dates'),
+            # walked in order by sweeper
+            models.Index(fields=['expires_at', 'id'], name='hold_expires_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.checkin} - {self.checkout} до {self.expires_at}'
+
+    def clean(self):
+        super().clean()
+        using = router.db_for_write(Hold, instance=self)
+        taken = Booking.objects.db_manager(using).get_taken(self.checkin, self.checkout, [self.room_id],
+                                                            hold_id=self.id)
+        if taken.exists():
             raise ValidationError('Выбранная дата уже занята!')
 
     def save(self, *args, **kwargs):
-        if self.active:
+        """Holds are checked under the room lock with either booking engine"""
+        using = kwargs.get('using') or router.db_for_write(Hold, instance=self)
+        with transaction.atomic(using=using):
+            lock_room(using, self.room_id)
             self.clean()
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+
+
+class ArchivedBooking(models.Model):
+    """
+    Bookings which ended long ago, moved out of the bookings table by archive_bookings command.
+    Availability checks never read this table, booking id is kept.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.SET_NULL, null=True, related_name='archived_bookings',
+        verbose_name='Бронирующий пользователь'
+    )
+    room = models.ForeignKey(
+        Room, null=True, related_name='archived_bookings', on_delete=models.SET_NULL,
+        verbose_name='Забронированная комната'
+    )
+    checkin = models.DateField(verbose_name='Дата начала брони')
+    checkout = models.DateField(verbose_name='Дата конца брони', db_index=True)
+    active = models.BooleanField(default=True, verbose_name='Бронь активна')
+
+    class Meta:
+        verbose_name = 'Архивная бронь'
+        verbose_name_plural = 'Архивные брони'
+
+    def __str__(self):
+        return f'{self.user}: {self.checkin} - {self.checkout}'
+
+
+class BookingHistory(models.Model):
+    """
+    Read-only union of bookings and archived bookings, backed by booking_history view
+    created by migration 0003. Migrations changing columns of either table drop the view
+    and create it again. Used where the archive is queried along with current bookings,
+    e.g. the list and the detail of user bookings.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(get_user_model(), on_delete=models.DO_NOTHING, null=True, related_name='+',
+                             db_constraint=False)
+    room = models.ForeignKey(Room, on_delete=models.DO_NOTHING, null=True, related_name='+', db_constraint=False)
+    checkin = models.DateField()
+    checkout = models.DateField()
+    active = models.BooleanField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'booking_history'
+
+    def __str__(self):
+        return f'{self.user}: {self.checkin} - {self.checkout}'
+
+
+class RoomOccupancy(models.Model):
+    """
+    Availability index: one row per room and month holding a bitmap of booked nights,
+    bit N is set when the room is booked for the night of day N + 1 of the month.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='+', verbose_name='Комната')
+    month = models.DateField(verbose_name='Месяц')
+    nights = models.IntegerField(default=0, verbose_name='Занятые ночи')
+
+    class Meta:
+        verbose_name = 'Занятость комнаты за месяц'
+        verbose_name_plural = 'Занятость комнат по месяцам'
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'room'], name='room_occupancy_month_room'),
+        ]
+
+    def __str__(self):
+        return f'{self.room_id} {self.month:%Y-%m}: {self.nights:031b}'
+
+
+class TransactionId(models.Func):
+    """Id of the current transaction, pg_current_xact_id() as bigint"""
+    template = 'pg_current_xact_id()::text::bigint'
+    output_field = models.BigIntegerField()
+
+
+class BookingChange(models.Model):
+    """
+    Change feed of the in-memory interval engine (see booking.intervals): state of a booking
+    after every change, written along with it while the engine is enabled. Deleted and archived
+    bookings are recorded as inactive. Rows are read in order of transaction ids and pruned
+    by snapshot_bookings command.
+    """
+    booking_id = models.BigIntegerField()
+    room_id = models.BigIntegerField(null=True)
+    checkin = models.DateField()
+    checkout = models.DateField()
+    active = models.BooleanField()
+    txid = models.BigIntegerField(db_default=TransactionId(), db_index=True)
+    created = models.DateTimeField(db_default=Now(), db_index=True)
+
+    class Meta:
+        verbose_name = 'Изменение брони'
+        verbose_name_plural = 'Изменения броней'
+
+    def __str__(self):
+        return f'{self.booking_id}: {self.checkin} - {self.checkout}'
@@ -0,0 +1,53 @@
+import datetime
+from bisect import bisect_left, insort
+from collections import defaultdict
+from collections.abc import Iterable
+
+from booking.models import Booking
+
+
+class OccupancyMap:
+    """
+    Active bookings and live holds of a set of rooms loaded with one query and kept as
+    per-room lists of (checkin, checkout) sorted by checkin. Bookings and holds may overlap,
+    so overlapping stays are merged and the stays of a room never overlap each other.
+    Overlap checks are answered in memory with binary search.
+    """
+
+    def __init__(self, intervals: Iterable[tuple[int, datetime.date, datetime.date]] = ()):
+        stays_by_room = defaultdict(list)
+        for room_id, checkin, checkout in intervals:
+            stays_by_room[room_id].append((checkin, checkout))
+        self._rooms: dict[int, list[tuple[datetime.date, datetime.date]]] = defaultdict(list)
+        for room_id, stays in stays_by_room.items():
+            self._rooms[room_id] = _merged(sorted(stays))
+
+    @classmethod
+    def load(cls, room_ids: Iterable[int], start: datetime.date, end: datetime.date) -> 'OccupancyMap':
+        """Loads active bookings and live holds of given rooms which intersect [start, end)"""
+        return cls(Booking.objects.get_taken(start, end, set(room_ids)))
+
+    def is_free(self, room_id: int, checkin: datetime.date, checkout: datetime.date) -> bool:
+        stays = self._rooms.get(room_id)
+        if not stays:
+            return True
+        position = bisect_left(stays, (checkin, checkin))
+        if position < len(stays) and stays[position][0] < checkout:
+            return False
+        return not (position > 0 and stays[position - 1][1] > checkin)
+
+    def add(self, room_id: int, checkin: datetime.date, checkout: datetime.date) -> None:
+        stays = self._rooms[room_id]
+        insort(stays, (checkin, checkout))
+        self._rooms[room_id] = _merged(stays)
+
+
+def _merged(stays: list[tuple[datetime.date, datetime.date]]) -> list[tuple[datetime.date, datetime.date]]:
+    """Stays sorted by checkin with overlapping ones merged"""
+    merged: list[tuple[datetime.date, datetime.date]] = []
+    for checkin, checkout in stays:
+        if merged and checkin < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], checkout))
+        else:
+            merged.append((checkin, checkout))
+    return merged
@@ -0,0 +1,7 @@
+from common.pagination import KeysetPagination
+
+
+class BookingsKeysetPagination(KeysetPagination):
+
+    page_size = 50
+    max_page_size = 500
@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.db.models import QuerySet, Value
+from rest_framework import status
+
+from booking.occupancy import OccupancyMap
+from booking.serializers import QuoteItemSerializer, RoomQuoteSerializer
+from rooms.filters import RoomCalendarFilter
+from rooms.models import Room
+
+# requested rooms are selected by union branch with this item number
+ROOMS_BRANCH = -1
+
+
+def _candidate_rooms(room_ids: set[int], filtered: dict[int, QuerySet]) -> tuple[dict, dict]:
+    """
+    Prices of requested rooms and of rooms matching every filter, selected with one
+    UNION ALL query: one branch for requested rooms and one branch per filter.
+    """
+    branches = [Room.objects.filter(id__in=room_ids).annotate(item=Value(ROOMS_BRANCH))]
+    branches += [rooms.order_by().annotate(item=Value(index)) for index, rooms in filtered.items()]
+    branches = [branch.values_list('id', 'price', 'item') for branch in branches]
+
+    prices, matches = {}, defaultdict(list)
+    for room_id, price, item in branches[0].union(*branches[1:], all=True):
+        if item == ROOMS_BRANCH:
+            prices[room_id] = price
+        else:
+            matches[item].append((room_id, price))
+    return prices, matches
+
+
+def quote_stays(items: list, max_quotes: int = 50) -> list[dict]:
+    """
+    Prices stays of requested rooms or of rooms matching a filter, returns result
+    for every item in payload order. Availability of all candidate rooms for all stays
+    is loaded with one intersection query, a stay costs price per night times nights.
+    Rooms of a filter are quoted cheapest first, at most `max_quotes` of them.
+    """
+    results: list[dict] = [{'index': index} for index in range(len(items))]
+    valid, filtered = [], {}
+    for index, item in enumerate(items):
+        serializer = QuoteItemSerializer(data=item)
+        if not serializer.is_valid():
+            results[index].update(status=status.HTTP_400_BAD_REQUEST, errors=serializer.errors)
+            continue
+        data = serializer.validated_data
+        if 'filter' in data:
+            filterset = RoomCalendarFilter(data['filter'], queryset=Room.objects.all())
+            if not filterset.is_valid():
+                results[index].update(status=status.HTTP_400_BAD_REQUEST, errors={'filter': filterset.errors})
+                continue
+            filtered[index] = filterset.qs
+        valid.append((index, data))
+    if not valid:
+        return results
+
+    prices, matches = _candidate_rooms({data['room'] for _, data in valid if 'room' in data}, filtered)
+    occupancy = OccupancyMap.load(
+        [*prices, *(room_id for rooms in matches.values() for room_id, _ in rooms)],
+        min(data['checkin'] for _, data in valid),
+        max(data['checkout'] for _, data in valid),
+    )
+
+    for index, data in valid:
+        if 'room' in data and data['room'] not in prices:
+            results[index].update(status=status.HTTP_404_NOT_FOUND, detail='room does not exist')
+            continue
+        rooms = [(data['room'], prices[data['room']])] if 'room' in data \
+            else sorted(matches[index], key=lambda room: (room[1], room[0]))
+        nights = (data['checkout'] - data['checkin']).days
+        quotes = []
+        for room_id, price in rooms:
+            if len(quotes) == max_quotes:
+                break
+            if occupancy.is_free(room_id, data['checkin'], data['checkout']):
+                quotes.append({'room': room_id, 'price': price, 'total': price * nights})
+        results[index].update(status=status.HTTP_200_OK, checkin=data['checkin'].isoformat(),
+                              checkout=data['checkout'].isoformat(), nights=nights,
+                              quotes=RoomQuoteSerializer(quotes, many=True).data)
+    return results
@@ -1,17 +1,89 @@
 from rest_framework import serializers
 
-from .models import Booking
+from common.instrumentation import InstrumentedSerializerMixin
+from rooms.models import Room
 
+from .export import EXPORT_FORMATS
+from .models import Booking, Hold
 
-class BookingSerializer(serializers.ModelSerializer):
+
+class BookingSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Booking
         read_only_fields = ('active',)
         fields = ('room', 'checkin', 'checkout', 'active',)
 
 
-class BookingSerializerUpdateStatusOnly(serializers.ModelSerializer):
+class HoldSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Hold
+        read_only_fields = ('id', 'expires_at',)
+        fields = ('id', 'room', 'checkin', 'checkout', 'expires_at',)
+
+    def validate(self, attrs):
+        if attrs['checkout'] <= attrs['checkin']:
+            raise serializers.ValidationError('checkout date must be later than checkin date')
+        return attrs
+
+
+class BookingSerializerUpdateStatusOnly(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Booking
         read_only_fields = ('room', 'checkin', 'checkout',)
         fields = ('room', 'checkin', 'checkout', 'active')
+
+
+class PreloadedRoomField(serializers.PrimaryKeyRelatedField):
+    """Resolves room from `rooms` dict in serializer context instead of a query per item"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            room = self.context['rooms'].get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if room is None:
+            self.fail('does_not_exist', pk_value=data)
+        return room
+
+
+class BookingBatchItemSerializer(BookingSerializer):
+    room = PreloadedRoomField(queryset=Room.objects.all())
+
+    def validate(self, attrs):
+        if attrs['checkout'] <= attrs['checkin']:
+            raise serializers.ValidationError('checkout date must be later than checkin date')
+        return attrs
+
+
+class QuoteItemSerializer(serializers.Serializer):
+    room = serializers.IntegerField(required=False, min_value=1)
+    filter = serializers.DictField(required=False, help_text='price_gte, price_lte, spots_gte, spots_lte of rooms')
+    checkin = serializers.DateField()
+    checkout = serializers.DateField()
+
+    def validate(self, attrs):
+        if ('room' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('either room or filter is required')
+        if attrs['checkout'] <= attrs['checkin']:
+            raise serializers.ValidationError('checkout date must be later than checkin date')
+        return attrs
+
+
+class RoomQuoteSerializer(serializers.Serializer):
+    room = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=7, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class BookingExportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, default=None)
+    end = serializers.DateField(required=False, default=None)
+    active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    output = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='csv')
+
+    def validate(self, attrs):
+        if attrs['start'] and attrs['end'] and attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError('end date must be later than start date')
+        return attrs
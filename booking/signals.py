@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from booking import availability, intervals
+from booking.models import Booking, Hold
+from rooms import cache as search_cache
+from rooms import feed
+
+# Sent for bookings written without Booking.save(), e.g. with bulk_create(), provides `bookings`
+bookings_bulk_created = Signal()
+
+
+def _stay(instance: Booking) -> tuple:
+    checkin = Booking._meta.get_field('checkin').to_python(instance.checkin)
+    checkout = Booking._meta.get_field('checkout').to_python(instance.checkout)
+    return instance.room_id, checkin, checkout
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_stay(sender, instance: Booking, raw: bool = False, **kwargs) -> None:
+    instance._previous_stay = instance._previous_active = None
+    if raw or not instance.pk:
+        return
+    if availability.index_enabled() or search_cache.get_cache() is not None or feed.feed_enabled():
+        previous = Booking.objects.filter(pk=instance.pk).values_list(
+            'room_id', 'checkin', 'checkout', 'active').first()
+        if previous:
+            instance._previous_stay, instance._previous_active = previous[:3], previous[3]
+
+
+def _state(instance: Booking) -> tuple:
+    return instance.pk, *_stay(instance), instance.active
+
+
+def _changed_stays(instance: Booking) -> list[tuple]:
+    stays = [_stay(instance)]
+    previous = getattr(instance, '_previous_stay', None)
+    if previous:
+        stays.append(previous)
+    return stays
+
+
+def stays_changed(stays: list[tuple], using: str | None = None) -> None:
+    """
+    Refreshes availability index for (room_id, checkin, checkout) stays in the current transaction
+    of `using` database and search cache once it commits
+    """
+    if availability.index_enabled():
+        days_by_room = defaultdict(list)
+        for room_id, checkin, checkout in stays:
+            if room_id is not None:
+                days_by_room[room_id] += availability.stay_days(checkin, checkout)
+        for room_id, days in days_by_room.items():
+            availability.refresh_room_days(room_id, days, using)
+    search_cache.bump_stay_versions(((checkin, checkout) for _, checkin, checkout in stays), using)
+
+
+def _availability_changes(instance: Booking) -> list[feed.Change]:
+    """Previous stay of an active booking is freed, stay of an active booking is booked"""
+    stay, previous = _stay(instance), getattr(instance, '_previous_stay', None)
+    previous_active = getattr(instance, '_previous_active', None)
+    if previous == stay and previous_active == instance.active:
+        return []
+    changes = []
+    if previous and previous_active:
+        changes.append(feed.Change(feed.FREED, *previous))
+    if instance.active:
+        changes.append(feed.Change(feed.BOOKED, *stay))
+    return changes
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance: Booking, raw: bool = False, using: str = None, **kwargs) -> None:
+    """Stay before saving is changed as well, e.g. when booking dates were edited"""
+    if not raw:
+        intervals.record_changes([_state(instance)])
+        stays_changed(_changed_stays(instance), using)
+        feed.publish(_availability_changes(instance), using)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance: Booking, using: str = None, **kwargs) -> None:
+    intervals.record_changes([_state(instance)], deleted=True)
+    stays_changed([_stay(instance)], using)
+    if instance.active:
+        feed.publish([feed.Change(feed.FREED, *_stay(instance))], using)
+
+
+@receiver(bookings_bulk_created, sender=Booking)
+def bookings_created(sender, bookings: list[Booking], **kwargs) -> None:
+    intervals.record_changes([_state(booking) for booking in bookings])
+    stays_changed([_stay(booking) for booking in bookings])
+    feed.publish([feed.Change(feed.BOOKED, *_stay(booking)) for booking in bookings if booking.active])
+
+
+@receiver(post_save, sender=Hold)
+@receiver(post_delete, sender=Hold)
+def hold_changed(sender, instance: Hold, raw: bool = False, using: str = None, **kwargs) -> None:
+    """Holds take rooms only for searches, availability index and interval engine keep bookings"""
+    if raw:
+        return
+    search_cache.bump_stay_versions([_stay(instance)[1:]], using)
+    if 'created' not in kwargs:
+        feed.publish([feed.Change(feed.FREED, *_stay(instance))], using)
+    elif kwargs['created']:
+        feed.publish([feed.Change(feed.BOOKED, *_stay(instance))], using)
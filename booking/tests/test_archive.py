@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from booking import availability
+from booking.archive import archive_bookings, archive_cutoff
+from booking.models import ArchivedBooking, Booking, BookingHistory
+from rooms.models import Room
+
+
+class ArchiveBookingsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.old1 = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 1, 1),
+                                           checkout=date(2024, 1, 5))
+        self.old2 = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 1, 10),
+                                           checkout=date(2024, 1, 12), active=False)
+        self.old3 = Booking.objects.create(room=self.room, checkin=date(2024, 1, 20), checkout=date(2024, 1, 25))
+        # ends on the cutoff date, stays in bookings table
+        self.current = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 1, 28),
+                                              checkout=date(2024, 2, 1))
+
+    def test_bookings_ended_before_cutoff_are_moved(self):
+        result = archive_bookings(date(2024, 2, 1))
+        self.assertEqual(result.archived, 3)
+        self.assertEqual(result.first_checkin, date(2024, 1, 1))
+        self.assertEqual(list(Booking.objects.values_list('id', flat=True)), [self.current.id])
+        archived = ArchivedBooking.objects.get(id=self.old2.id)
+        self.assertEqual((archived.user, archived.room, archived.checkin, archived.checkout, archived.active),
+                         (self.user, self.room, date(2024, 1, 10), date(2024, 1, 12), False))
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+
+    def test_bookings_are_moved_in_batches(self):
+        result = archive_bookings(date(2024, 2, 1), batch_size=2)
+        self.assertEqual((result.archived, result.batches), (3, 2))
+        self.assertEqual(archive_bookings(date(2024, 2, 1)).archived, 0)
+
+    def test_availability_checks_skip_archive(self):
+        archive_bookings(date(2024, 2, 1))
+        self.assertFalse(Booking.objects.get_intersections(date(2024, 1, 1), date(2024, 1, 30), self.room)
+                         .exclude(id=self.current.id).exists())
+        self.room.delete()
+        self.assertIsNone(ArchivedBooking.objects.get(id=self.old1.id).room)
+
+    @override_settings(BOOKING_AVAILABILITY_INDEX=True)
+    def test_availability_index_is_refreshed(self):
+        availability.rebuild_index()
+        archive_bookings(date(2024, 2, 1))
+        self.assertEqual(availability.booked_room_ids(date(2024, 1, 1), date(2024, 1, 26)), [])
+        self.assertEqual(availability.booked_room_ids(date(2024, 1, 20), date(2024, 1, 29)), [self.room.id])
+
+    def test_history_shows_bookings_and_archive(self):
+        archive_bookings(date(2024, 2, 1))
+        history = BookingHistory.objects.order_by('id').values_list('id', 'archived')
+        self.assertEqual(list(history), [(self.old1.id, True), (self.old2.id, True), (self.old3.id, True),
+                                         (self.current.id, False)])
+
+    def test_user_booking_list_includes_archive(self):
+        self.client.force_login(self.user)
+        before = self.client.get(reverse('booking-my')).json()
+        archive_bookings(date(2024, 2, 1))
+        self.assertEqual(sorted(self.client.get(reverse('booking-my')).json(), key=lambda item: item['checkin']),
+                         sorted(before, key=lambda item: item['checkin']))
+        response = self.client.get(reverse('booking-my') + '?pagination=cursor&limit=2')
+        self.assertEqual([item['checkin'] for item in response.json()['results']], ['2024-01-01', '2024-01-10'])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([item['checkin'] for item in response.json()['results']], ['2024-01-28'])
+
+    def test_archived_booking_is_shown_and_not_changed(self):
+        archive_bookings(date(2024, 2, 1))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking-detail', kwargs={'pk': self.old1.id}))
+        self.assertEqual((response.status_code, response.json()['checkin']), (200, '2024-01-01'))
+        response = self.client.patch(reverse('booking-update', kwargs={'pk': self.old1.id}),
+                                     data={'active': False}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(ArchivedBooking.objects.get(id=self.old1.id).active)
+        # archived booking of another user is not found
+        response = self.client.patch(reverse('booking-update', kwargs={'pk': self.old3.id}),
+                                     data={'active': False}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_booking_list_includes_archive(self):
+        await ArchivedBooking.objects.acreate(id=10000, user=self.user, room=self.room, checkin=date(2023, 1, 1),
+                                              checkout=date(2023, 1, 2))
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('booking-my-async'))
+        self.assertIn({'room': self.room.id, 'checkin': '2023-01-01', 'checkout': '2023-01-02', 'active': True},
+                      response.json())
+        self.assertEqual(len(response.json()), 4)
+
+    def test_export_includes_archive(self):
+        archive_bookings(date(2024, 2, 1))
+        stdout = StringIO()
+        call_command('export_bookings', stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 5)
+
+
+class ArchiveBookingsCommandTestCase(TestCase):
+
+    def setUp(self):
+        room = Room.objects.create(room_type=1, spots=1, price=1000)
+        today = date.today()
+        self.old = Booking.objects.create(room=room, checkin=today - timedelta(days=40),
+                                          checkout=today - timedelta(days=35))
+        self.recent = Booking.objects.create(room=room, checkin=today - timedelta(days=10),
+                                             checkout=today - timedelta(days=5))
+
+    def test_cutoff_is_days_before_today(self):
+        self.assertEqual(archive_cutoff(30, today=date(2024, 3, 31)), date(2024, 3, 1))
+        with override_settings(BOOKING_ARCHIVE_AFTER_DAYS=7):
+            self.assertEqual(archive_cutoff(today=date(2024, 3, 31)), date(2024, 3, 24))
+
+    def test_command_archives_bookings_older_than_days(self):
+        stdout = StringIO()
+        call_command('archive_bookings', '--days', '30', stdout=stdout)
+        self.assertIn('Archived 1 bookings', stdout.getvalue())
+        self.assertEqual(list(ArchivedBooking.objects.values_list('id', flat=True)), [self.old.id])
+        call_command('archive_bookings', '--before', date.today().isoformat(), stdout=stdout)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_dry_run_moves_nothing(self):
+        stdout = StringIO()
+        call_command('archive_bookings', '--days', '1', '--dry-run', stdout=stdout)
+        self.assertIn('2 bookings', stdout.getvalue())
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertFalse(ArchivedBooking.objects.exists())
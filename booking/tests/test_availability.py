@@ -0,0 +1,127 @@
+import threading
+import time
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from booking import availability
+from booking.models import Booking, RoomOccupancy
+from rooms.models import Room
+
+
+def occupied(day: date) -> list[int]:
+    """Ids of rooms which have the night of day set in the index"""
+    rows = RoomOccupancy.objects.filter(month=day.replace(day=1)).values_list('room_id', 'nights')
+    return sorted(room_id for room_id, nights in rows if nights >> (day.day - 1) & 1)
+
+
+@override_settings(BOOKING_AVAILABILITY_INDEX=True)
+class AvailabilityIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='test', email='test@email.com')
+        self.room1 = Room.objects.create(room_type=1, price=1000, spots=1)
+        self.room2 = Room.objects.create(room_type=2, price=2000, spots=2)
+        self.booking = Booking.objects.create(room=self.room1, user=self.user, checkin=date(2024, 3, 5),
+                                              checkout=date(2024, 3, 8))
+
+    def test_index_marks_booked_nights(self):
+        self.assertEqual(occupied(date(2024, 3, 5)), [self.room1.id])
+        self.assertEqual(occupied(date(2024, 3, 7)), [self.room1.id])
+
+    def test_index_does_not_mark_checkout_day(self):
+        self.assertEqual(occupied(date(2024, 3, 8)), [])
+
+    def test_index_keeps_bits_of_different_rooms(self):
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 6), checkout=date(2024, 3, 7))
+        self.assertEqual(occupied(date(2024, 3, 6)), sorted([self.room1.id, self.room2.id]))
+
+    def test_index_cleared_when_booking_deactivated(self):
+        self.booking.active = False
+        self.booking.save()
+        self.assertEqual(occupied(date(2024, 3, 5)), [])
+
+    def test_index_moved_when_booking_dates_changed(self):
+        self.booking.checkin = date(2024, 4, 5)
+        self.booking.checkout = date(2024, 4, 6)
+        self.booking.save()
+        self.assertEqual(occupied(date(2024, 3, 5)), [])
+        self.assertEqual(occupied(date(2024, 4, 5)), [self.room1.id])
+
+    def test_booked_room_ids(self):
+        self.assertEqual(availability.booked_room_ids(date(2024, 3, 7), date(2024, 3, 10)), [self.room1.id])
+        self.assertEqual(availability.booked_room_ids(date(2024, 3, 8), date(2024, 3, 10)), [])
+
+    def test_rebuild_command_restores_index(self):
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 31), checkout=date(2024, 4, 2))
+        RoomOccupancy.objects.all().delete()
+        call_command('rebuild_availability_index', stdout=StringIO())
+        self.assertEqual(occupied(date(2024, 3, 6)), [self.room1.id])
+        self.assertEqual(occupied(date(2024, 3, 31)), [self.room2.id])
+        self.assertEqual(occupied(date(2024, 4, 1)), [self.room2.id])
+        self.assertEqual(RoomOccupancy.objects.count(), 3)
+
+    def test_booked_room_ids_across_months(self):
+        Booking.objects.create(room=self.room2, checkin=date(2024, 4, 1), checkout=date(2024, 4, 2))
+        self.assertEqual(availability.booked_room_ids(date(2024, 3, 7), date(2024, 4, 2)),
+                         sorted([self.room1.id, self.room2.id]))
+        self.assertEqual(availability.booked_room_ids(date(2024, 3, 8), date(2024, 4, 1)), [])
+
+    def test_rooms_view_uses_index_for_dates_filter(self):
+        response = self.client.get(reverse('rooms') + '?checkin=2024-03-06&checkout=2024-03-09')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room2.id])
+
+
+@override_settings(BOOKING_AVAILABILITY_INDEX=True)
+class AvailabilityIndexLockTestCase(TransactionTestCase):
+
+    def waiting_for_locks(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' "
+                           "AND datname = current_database()")
+            return cursor.fetchone()[0]
+
+    def test_refresh_waiting_for_day_rows_sees_committed_booking(self):
+        room = Room.objects.create(room_type=1, price=1000, spots=1)
+
+        def refresh():
+            try:
+                availability.refresh_room_days(room.id, [date(2024, 3, 5)])
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Booking.objects.create(room=room, checkin=date(2024, 3, 5), checkout=date(2024, 3, 6))
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            deadline = time.monotonic() + 5
+            while not self.waiting_for_locks() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        thread.join(5)
+        self.assertEqual(occupied(date(2024, 3, 5)), [room.id])
+
+    def test_refreshes_of_different_rooms_do_not_wait(self):
+        room1 = Room.objects.create(room_type=1, price=1000, spots=1)
+        room2 = Room.objects.create(room_type=1, price=1000, spots=1)
+        refreshed = threading.Event()
+
+        def refresh():
+            try:
+                availability.refresh_room_days(room2.id, [date(2024, 3, 5)])
+                refreshed.set()
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Booking.objects.create(room=room1, checkin=date(2024, 3, 5), checkout=date(2024, 3, 6))
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            self.assertTrue(refreshed.wait(5))
+        thread.join(5)
+        self.assertEqual(occupied(date(2024, 3, 5)), [room1.id])
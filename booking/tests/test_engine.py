@@ -0,0 +1,87 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from booking.models import Booking, Hold, is_overlap_error
+from rooms.models import Room
+
+
+@override_settings(BOOKING_ENGINE='exclusion')
+class ExclusionEngineTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='test', email='test@email.com')
+        self.room = Room.objects.create(room_type=1, price=1000, spots=1)
+        self.booking = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 3, 5),
+                                              checkout=date(2024, 3, 8))
+
+    def test_overlapping_booking_rejected_by_constraint(self):
+        with self.assertRaises(IntegrityError) as context:
+            Booking.objects.create(room=self.room, checkin=date(2024, 3, 7), checkout=date(2024, 3, 10))
+        self.assertTrue(is_overlap_error(context.exception))
+
+    def test_booking_starting_at_checkout_allowed(self):
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 8), checkout=date(2024, 3, 10))
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_overlapping_not_active_booking_allowed(self):
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 6), checkout=date(2024, 3, 7), active=False)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_overlapping_booking_of_other_room_allowed(self):
+        other_room = Room.objects.create(room_type=1, price=1000, spots=1)
+        Booking.objects.create(room=other_room, checkin=date(2024, 3, 5), checkout=date(2024, 3, 8))
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_booking_overlapping_live_hold_rejected(self):
+        Hold.objects.create(room=self.room, checkin=date(2024, 3, 8), checkout=date(2024, 3, 10))
+        with self.assertRaises(ValidationError):
+            Booking.objects.create(room=self.room, checkin=date(2024, 3, 9), checkout=date(2024, 3, 11))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_view_maps_overlap_to_409(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('booking-create'),
+                                    data={'room': self.room.id, 'checkin': '2024-03-04', 'checkout': '2024-03-06'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_view_maps_overlap_of_reactivated_booking_to_409(self):
+        self.client.force_login(self.user)
+        booking = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 3, 6),
+                                         checkout=date(2024, 3, 7), active=False)
+        response = self.client.patch(reverse('booking-update', kwargs={'pk': booking.id}), data={'active': True},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+
+
+class DefaultEngineTestCase(TestCase):
+    """Constraint created for the exclusion engine backs the default one as well"""
+
+    def setUp(self):
+        self.room = Room.objects.create(room_type=1, price=1000, spots=1)
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 5), checkout=date(2024, 3, 8))
+
+    @override_settings(BOOKING_ENGINE='default')
+    def test_overlapping_booking_rejected_by_clean(self):
+        with self.assertRaises(ValidationError):
+            Booking.objects.create(room=self.room, checkin=date(2024, 3, 7), checkout=date(2024, 3, 10))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_overlapping_bulk_created_booking_rejected_by_constraint(self):
+        with self.assertRaises(IntegrityError) as context, transaction.atomic():
+            Booking.objects.bulk_create([Booking(room=self.room, checkin=date(2024, 3, 7), checkout=date(2024, 3, 10))])
+        self.assertTrue(is_overlap_error(context.exception))
+
+
+class IsOverlapErrorTestCase(TestCase):
+
+    def test_check_constraint_violation_is_not_overlap(self):
+        room = Room.objects.create(room_type=1, price=1000, spots=1)
+        with self.assertRaises(IntegrityError) as context, transaction.atomic():
+            Booking.objects.create(room=room, checkin=date(2024, 3, 10), checkout=date(2024, 3, 9))
+        self.assertFalse(is_overlap_error(context.exception))
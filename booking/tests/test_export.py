@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from booking.models import Booking
+from rooms.models import Room
+
+
+class BookingExportTestCaseSetupMixin(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.staff = get_user_model().objects.create_user(username='staff', email='staff@email.com', is_staff=True)
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.booking1 = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 3, 1),
+                                               checkout=date(2024, 3, 5))
+        self.booking2 = Booking.objects.create(room=self.room, user=self.user, checkin=date(2024, 4, 1),
+                                               checkout=date(2024, 4, 3), active=False)
+        self.booking3 = Booking.objects.create(room=self.room, checkin=date(2024, 5, 1), checkout=date(2024, 5, 2))
+
+
+class BookingExportAPIViewTestCase(BookingExportTestCaseSetupMixin):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def test_not_staff_user_then_403(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking-export'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_csv(self):
+        response = self.client.get(reverse('booking-export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'id,room_id,user_id,checkin,checkout,active',
+            f'{self.booking1.id},{self.room.id},{self.user.id},2024-03-01,2024-03-05,True',
+            f'{self.booking2.id},{self.room.id},{self.user.id},2024-04-01,2024-04-03,False',
+            f'{self.booking3.id},{self.room.id},,2024-05-01,2024-05-02,True',
+        ])
+
+    def test_export_ndjson(self):
+        response = self.client.get(reverse('booking-export') + '?output=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0], {'id': self.booking1.id, 'room_id': self.room.id, 'user_id': self.user.id,
+                                   'checkin': '2024-03-01', 'checkout': '2024-03-05', 'active': True})
+        self.assertEqual(rows[2]['user_id'], None)
+        self.assertEqual(len(rows), 3)
+
+    def test_export_filtered_by_dates_and_active(self):
+        response = self.client.get(reverse('booking-export') + '?output=ndjson&start=2024-03-04&end=2024-05-01')
+        ids = [json.loads(line)['id'] for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(ids, [self.booking1.id, self.booking2.id])
+        response = self.client.get(reverse('booking-export') + '?output=ndjson&active=false')
+        ids = [json.loads(line)['id'] for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(ids, [self.booking2.id])
+
+    async def test_export_is_streamed_by_async_iterator_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('booking-export') + '?output=ndjson&start=2024-03-04')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)['id'] for line in content.decode().splitlines()],
+                         [self.booking1.id, self.booking2.id, self.booking3.id])
+
+    def test_invalid_filters_then_400(self):
+        self.assertEqual(self.client.get(reverse('booking-export') + '?output=xml').status_code, 400)
+        self.assertEqual(self.client.get(reverse('booking-export') + '?start=2024-05-01&end=2024-03-01').status_code,
+                         400)
+
+
+class ExportBookingsCommandTestCase(BookingExportTestCaseSetupMixin):
+
+    def test_command_writes_csv_to_stdout(self):
+        stdout = StringIO()
+        call_command('export_bookings', '--active', 'true', stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,room_id,user_id,checkin,checkout,active')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(self.booking1.id), str(self.booking3.id)])
+
+    def test_command_writes_ndjson_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bookings.ndjson')
+            stdout = StringIO()
+            call_command('export_bookings', '--format', 'ndjson', '--output', path, '--end', '2024-04-02',
+                         '--chunk-size', '1', stdout=stdout)
+            with open(path) as exported:
+                rows = [json.loads(line) for line in exported]
+        self.assertEqual([row['id'] for row in rows], [self.booking1.id, self.booking2.id])
+        self.assertIn('Exported 2 bookings', stdout.getvalue())
+
+    def test_command_without_server_side_cursors_reads_pages(self):
+        stdout = StringIO()
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            with self.assertNumQueries(2):
+                call_command('export_bookings', '--chunk-size', '2', stdout=stdout)
+        self.assertEqual([line.split(',')[0] for line in stdout.getvalue().splitlines()[1:]],
+                         [str(self.booking1.id), str(self.booking2.id), str(self.booking3.id)])
@@ -0,0 +1,147 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.holds import promote_hold, sweep_holds
+from booking.models import Booking, Hold
+from booking.occupancy import OccupancyMap
+from rooms.filters import RoomFilter
+from rooms.models import Room
+
+
+class HoldTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=2000)
+        self.hold = Hold.objects.create(user=self.user, room=self.room1, checkin=date(2024, 3, 1),
+                                        checkout=date(2024, 3, 5))
+
+    def expire(self, hold: Hold) -> None:
+        Hold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def available(self, checkin: str, checkout: str) -> list[int]:
+        request = mock.Mock(query_params={'checkin': checkin, 'checkout': checkout})
+        rooms = RoomFilter(request.query_params, queryset=Room.objects.order_by('id'), request=request).qs
+        return list(rooms.values_list('id', flat=True))
+
+    def test_live_hold_takes_room(self):
+        with self.assertRaises(ValidationError):
+            Booking.objects.create(room=self.room1, checkin=date(2024, 3, 4), checkout=date(2024, 3, 6))
+        with self.assertRaises(ValidationError):
+            Hold.objects.create(room=self.room1, checkin=date(2024, 2, 28), checkout=date(2024, 3, 2))
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 5), checkout=date(2024, 3, 6))
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        self.assertEqual(list(Hold.objects.get_intersections(date(2024, 3, 4), date(2024, 3, 6))), [self.hold])
+        self.assertEqual(self.available('2024-03-02', '2024-03-03'), [])
+        self.assertEqual(self.available('2024-03-05', '2024-03-06'), [self.room2.id])
+
+    def test_hold_is_rejected_by_booking(self):
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        with self.assertRaises(ValidationError):
+            Hold.objects.create(room=self.room2, checkin=date(2024, 3, 4), checkout=date(2024, 3, 6))
+
+    def test_expired_hold_does_not_take_room(self):
+        self.expire(self.hold)
+        self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room1.id, self.room2.id])
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+
+    def test_occupancy_map_counts_live_holds(self):
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 10), checkout=date(2024, 3, 12))
+        occupancy = OccupancyMap.load([self.room1.id], date(2024, 3, 1), date(2024, 3, 31))
+        self.assertFalse(occupancy.is_free(self.room1.id, date(2024, 3, 4), date(2024, 3, 5)))
+        self.assertFalse(occupancy.is_free(self.room1.id, date(2024, 3, 11), date(2024, 3, 13)))
+        self.assertTrue(occupancy.is_free(self.room1.id, date(2024, 3, 5), date(2024, 3, 10)))
+
+    def test_occupancy_map_merges_nested_stays(self):
+        # a short stay nested in a longer one must not hide it from binary search
+        occupancy = OccupancyMap([(self.room2.id, date(2024, 3, 1), date(2024, 3, 10)),
+                                  (self.room2.id, date(2024, 3, 2), date(2024, 3, 3))])
+        self.assertFalse(occupancy.is_free(self.room2.id, date(2024, 3, 5), date(2024, 3, 6)))
+        self.assertTrue(occupancy.is_free(self.room2.id, date(2024, 3, 10), date(2024, 3, 11)))
+        occupancy.add(self.room2.id, date(2024, 3, 12), date(2024, 3, 20))
+        occupancy.add(self.room2.id, date(2024, 3, 13), date(2024, 3, 14))
+        self.assertFalse(occupancy.is_free(self.room2.id, date(2024, 3, 15), date(2024, 3, 16)))
+
+    def test_promote_hold(self):
+        booking = promote_hold(self.hold.id)
+        self.assertEqual((booking.user, booking.room, booking.checkin, booking.checkout, booking.active),
+                         (self.user, self.room1, date(2024, 3, 1), date(2024, 3, 5), True))
+        self.assertEqual(Booking.objects.get(), booking)
+        self.assertFalse(Hold.objects.exists())
+        self.assertIsNone(promote_hold(self.hold.id))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_expired_hold_is_not_promoted(self):
+        self.expire(self.hold)
+        self.assertIsNone(promote_hold(self.hold.id))
+        self.assertFalse(Booking.objects.exists())
+
+    def test_sweep_deletes_expired_holds_in_batches(self):
+        now = timezone.now()
+        for day in range(5):
+            Hold.objects.create(room=self.room2, checkin=date(2024, 4, 1 + day), checkout=date(2024, 4, 2 + day),
+                                expires_at=now - timedelta(minutes=day))
+        result = sweep_holds(now, batch_size=2)
+        self.assertEqual((result.deleted, result.batches), (5, 3))
+        self.assertEqual(list(Hold.objects.all()), [self.hold])
+        self.assertEqual(sweep_holds().deleted, 0)
+
+    def test_sweep_command(self):
+        self.expire(self.hold)
+        output = StringIO()
+        call_command('sweep_holds', stdout=output)
+        self.assertIn('Deleted 1 expired holds in 1 batches', output.getvalue())
+        self.assertFalse(Hold.objects.exists())
+
+
+class HoldAPITestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.other = get_user_model().objects.create_user(username='other', email='other@email.com')
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.client.force_login(self.user)
+
+    def hold(self, checkin: str = '2024-03-01', checkout: str = '2024-03-05'):
+        data = {'room': self.room.id, 'checkin': checkin, 'checkout': checkout}
+        return self.client.post(reverse('hold-create'), data=data)
+
+    def test_hold_and_promote(self):
+        response = self.hold()
+        self.assertEqual(response.status_code, 201)
+        hold = Hold.objects.get(pk=response.json()['id'])
+        self.assertEqual(hold.user, self.user)
+        self.assertEqual(self.hold('2024-03-04', '2024-03-06').status_code, 409)
+        self.assertEqual(self.client.post(reverse('booking-create'), data={
+            'room': self.room.id, 'checkin': '2024-03-04', 'checkout': '2024-03-06'}).status_code, 409)
+
+        response = self.client.post(reverse('hold-promote', kwargs={'pk': hold.pk}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-05',
+                                           'active': True})
+        self.assertEqual(Booking.objects.get().user, self.user)
+        self.assertEqual(self.client.post(reverse('hold-promote', kwargs={'pk': hold.pk})).status_code, 404)
+
+    def test_holds_of_other_users_are_not_found(self):
+        hold = Hold.objects.create(user=self.other, room=self.room, checkin=date(2024, 3, 1),
+                                   checkout=date(2024, 3, 5))
+        self.assertEqual(self.client.post(reverse('hold-promote', kwargs={'pk': hold.pk})).status_code, 404)
+        self.assertEqual(self.client.delete(reverse('hold-detail', kwargs={'pk': hold.pk})).status_code, 404)
+
+    def test_release_hold(self):
+        hold_id = self.hold().json()['id']
+        self.assertEqual(self.client.get(reverse('hold-detail', kwargs={'pk': hold_id})).status_code, 200)
+        self.assertEqual(self.client.delete(reverse('hold-detail', kwargs={'pk': hold_id})).status_code, 204)
+        self.assertEqual(self.hold().status_code, 201)
+
+    def test_invalid_dates(self):
+        self.assertEqual(self.hold('2024-03-05', '2024-03-01').status_code, 400)
@@ -0,0 +1,147 @@
+import csv
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from booking import availability
+from booking.importer import REPORT_FIELDS, import_bookings
+from booking.models import Booking, Hold
+from rooms import feed
+from rooms.models import Room
+
+
+class ImportBookingsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=1, spots=1, price=1000)
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 10), checkout=date(2024, 3, 15))
+
+    def run_import(self, text: str, file_format: str = 'csv', dry_run: bool = False):
+        report = StringIO()
+        result = import_bookings(StringIO(text), file_format, csv.writer(report), dry_run=dry_run)
+        return result, list(csv.reader(StringIO(report.getvalue())))
+
+    def test_import_clean_rows(self):
+        result, rejects = self.run_import(
+            'room_id,user_id,checkin,checkout,active\n'
+            f'{self.room1.id},{self.user.id},2024-03-01,2024-03-10,true\n'
+            f'{self.room2.id},,2024-03-01,2024-03-10,\n'
+        )
+        self.assertEqual((result.rows, result.imported, result.rejected), (2, 2, 0))
+        self.assertEqual(rejects, [])
+        self.assertTrue(Booking.objects.filter(room=self.room2, user=None, active=True,
+                                               checkin=date(2024, 3, 1)).exists())
+
+    def test_import_rejects_conflicts_and_invalid_rows(self):
+        result, rejects = self.run_import(
+            'room_id,user_id,checkin,checkout,active\n'
+            f'{self.room1.id},,2024-03-12,2024-03-20,true\n'
+            f'{self.room1.id},,2024-03-12,2024-03-20,false\n'
+            f'{self.room2.id},,2024-04-01,2024-04-05,true\n'
+            f'{self.room2.id},,2024-04-03,2024-04-06,true\n'
+            '999999,,2024-04-01,2024-04-05,true\n'
+            f'{self.room2.id},999999,2024-05-01,2024-05-05,true\n'
+            f'{self.room2.id},,2024-05-05,2024-05-01,true\n'
+            f'{self.room2.id},,tomorrow,2024-05-01,true\n'
+        )
+        self.assertEqual((result.rows, result.imported, result.rejected), (8, 2, 6))
+        reasons = {int(row[0]): row[-1] for row in rejects}
+        self.assertEqual(reasons, {
+            2: 'dates are already taken',
+            5: 'dates overlap another row',
+            6: 'room does not exist',
+            7: 'user does not exist',
+            8: 'checkout date must be later than checkin date',
+            9: 'checkin and checkout must be dates in YYYY-MM-DD format',
+        })
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_import_rejects_rows_over_live_holds(self):
+        Hold.objects.create(room=self.room2, checkin=date(2024, 4, 3), checkout=date(2024, 4, 4))
+        Hold.objects.create(room=self.room2, checkin=date(2024, 5, 1), checkout=date(2024, 5, 3),
+                            expires_at=timezone.now() - timedelta(minutes=1))
+        result, rejects = self.run_import(
+            'room_id,checkin,checkout,active\n'
+            f'{self.room2.id},2024-04-01,2024-04-05,true\n'
+            f'{self.room2.id},2024-04-01,2024-04-05,false\n'
+            f'{self.room2.id},2024-05-01,2024-05-03,true\n'
+        )
+        self.assertEqual((result.imported, result.rejected), (2, 1))
+        self.assertEqual([(row[0], row[-1]) for row in rejects], [('2', 'dates are held')])
+
+    def test_rows_rejected_for_other_reasons_do_not_reject_later_rows(self):
+        result, rejects = self.run_import(
+            'room_id,user_id,checkin,checkout,active\n'
+            f'{self.room2.id},999999,2024-04-01,2024-04-05,true\n'
+            f'{self.room1.id},,2024-03-08,2024-03-12,true\n'
+            f'{self.room2.id},,2024-04-03,2024-04-06,true\n'
+            f'{self.room1.id},,2024-03-09,2024-03-10,true\n'
+        )
+        self.assertEqual((result.imported, result.rejected), (2, 2))
+        reasons = [(row[0], row[-1]) for row in rejects]
+        self.assertEqual(reasons, [('2', 'user does not exist'), ('3', 'dates are already taken')])
+        self.assertTrue(Booking.objects.filter(room=self.room2, checkin=date(2024, 4, 3)).exists())
+        self.assertTrue(Booking.objects.filter(room=self.room1, checkin=date(2024, 3, 9)).exists())
+
+    @override_settings(ROOMS_FEED=True, ROOMS_FEED_NOTIFY=False)
+    async def test_import_publishes_imported_bookings(self):
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+
+        def run_import():
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.run_import('room_id,checkin,checkout,active\n'
+                                       f'{self.room2.id},2024-04-01,2024-04-03,true\n'
+                                       f'{self.room2.id},2024-04-05,2024-04-07,false\n'
+                                       f'{self.room1.id},2024-03-11,2024-03-12,true\n')
+
+        await sync_to_async(run_import)()
+        await feed.broker.wait_delivered()
+        messages = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        self.assertEqual(messages, [
+            f'event: booked\ndata: {{"room": {self.room2.id}, "checkin": "2024-04-01", "checkout": "2024-04-03", '
+            '"price": "1000.00", "spots": 1}\n\n'.encode()])
+
+    def test_import_ndjson(self):
+        result, rejects = self.run_import(
+            f'{{"room_id": {self.room2.id}, "checkin": "2024-03-01", "checkout": "2024-03-03"}}\n'
+            '\n'
+            'not json\n',
+            file_format='ndjson',
+        )
+        self.assertEqual((result.imported, result.rejected), (1, 1))
+        self.assertEqual(rejects[0][0], '3')
+
+    def test_dry_run_does_not_import(self):
+        result, _ = self.run_import(f'room_id,checkin,checkout\n{self.room2.id},2024-03-01,2024-03-03\n',
+                                    dry_run=True)
+        self.assertEqual((result.rows, result.rejected), (1, 0))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    @override_settings(BOOKING_AVAILABILITY_INDEX=True)
+    def test_import_refreshes_availability_index(self):
+        self.run_import(f'room_id,checkin,checkout\n{self.room2.id},2024-04-01,2024-04-03\n')
+        self.assertIn(self.room2.id, availability.booked_room_ids(date(2024, 4, 2), date(2024, 4, 3)))
+
+    def test_command_writes_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bookings.csv')
+            with open(path, 'w') as source:
+                source.write(f'room_id,checkin,checkout\n{self.room1.id},2024-03-11,2024-03-12\n'
+                             f'{self.room2.id},2024-03-11,2024-03-12\n')
+            stdout = StringIO()
+            call_command('import_bookings', path, stdout=stdout)
+            with open(f'{path}.rejects.csv') as report:
+                rows = list(csv.reader(report))
+        self.assertEqual(rows[0], list(REPORT_FIELDS))
+        self.assertEqual(rows[1][0], '2')
+        self.assertIn('1 bookings created, 1 rejected', stdout.getvalue())
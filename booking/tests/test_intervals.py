@@ -0,0 +1,214 @@
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from booking import intervals
+from booking.archive import archive_bookings
+from booking.importer import import_bookings
+from booking.models import Booking, BookingChange
+from common import routers
+from rooms.filters import RoomFilter
+from rooms.models import Room
+
+SINCE = date(2024, 1, 1)
+
+
+class IntervalEngineTestCase(SimpleTestCase):
+
+    def test_overlaps_match_brute_force(self):
+        rnd = random.Random(0)
+        engine = intervals.IntervalEngine(0, SINCE)
+        stays = {}
+        for booking_id in range(500):
+            checkin = SINCE + timedelta(days=rnd.randrange(120))
+            checkout = checkin + timedelta(days=rnd.randint(1, 14))
+            room_id, active = rnd.randrange(20), rnd.random() < 0.8
+            engine.apply(booking_id, room_id, checkin, checkout, active)
+            if active:
+                stays[booking_id] = (room_id, checkin, checkout)
+        # edited and cancelled bookings
+        for booking_id in rnd.sample(sorted(stays), 100):
+            room_id, checkin, checkout = stays.pop(booking_id)
+            if rnd.random() < 0.5:
+                checkin += timedelta(days=3)
+                engine.apply(booking_id, room_id, checkin, checkout + timedelta(days=3), True)
+                stays[booking_id] = (room_id, checkin, checkout + timedelta(days=3))
+            else:
+                engine.apply(booking_id, room_id, checkin, checkout, False)
+        self.assertEqual(len(engine), len(stays))
+
+        for _ in range(200):
+            checkin = SINCE + timedelta(days=rnd.randrange(130))
+            checkout = checkin + timedelta(days=rnd.randint(1, 10))
+            room_id = rnd.randrange(20)
+            overlapping = {booking_id: stay for booking_id, stay in stays.items()
+                           if stay[1] < checkout and stay[2] > checkin}
+            self.assertEqual(sorted(engine.intersections(checkin, checkout)), sorted(overlapping))
+            self.assertEqual(sorted(engine.intersections(checkin, checkout, room_id)),
+                             sorted(booking_id for booking_id, stay in overlapping.items() if stay[0] == room_id))
+            self.assertEqual(engine.booked_room_ids(checkin, checkout), {stay[0] for stay in overlapping.values()})
+
+    def test_stays_before_snapshot_date_are_not_kept(self):
+        engine = intervals.IntervalEngine(0, SINCE)
+        engine.apply(1, 1, date(2023, 12, 20), SINCE, True)
+        engine.apply(2, None, SINCE, date(2024, 1, 5), True)
+        self.assertEqual(len(engine), 0)
+        self.assertFalse(engine.covers(date(2023, 12, 31)))
+        self.assertTrue(engine.covers(SINCE))
+
+    def test_not_a_snapshot(self):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(b'bookings')
+            file.flush()
+            with self.assertRaises(ValueError):
+                intervals.read_snapshot(file.name)
+            with self.assertLogs('booking.intervals', 'WARNING'):
+                self.assertIsNone(intervals.load_engine(file.name))
+
+
+class SnapshotFileMixin:
+    poll_seconds = 3600
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'bookings.snapshot')
+        settings = override_settings(BOOKING_INTERVAL_ENGINE=True, BOOKING_INTERVAL_SNAPSHOT=self.path,
+                                     BOOKING_INTERVAL_POLL_SECONDS=self.poll_seconds)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        intervals.reset_engine()
+        self.addCleanup(intervals.reset_engine)
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=2000)
+
+    def available(self, checkin: str, checkout: str) -> list[int]:
+        request = mock.Mock(query_params={'checkin': checkin, 'checkout': checkout})
+        rooms = RoomFilter(request.query_params, queryset=Room.objects.order_by('id'), request=request).qs
+        return list(rooms.values_list('id', flat=True))
+
+
+class IntervalEngineSnapshotTestCase(SnapshotFileMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5), active=False)
+        Booking.objects.create(room=self.room2, checkin=date(2023, 12, 1), checkout=date(2023, 12, 5))
+
+    def test_snapshot_round_trip(self):
+        written = intervals.write_snapshot(self.path, since=SINCE)
+        snapshot = intervals.read_snapshot(self.path)
+        self.assertEqual(snapshot.records, [(self.booking.id, self.room1.id, date(2024, 3, 1).toordinal(),
+                                             date(2024, 3, 5).toordinal())])
+        self.assertEqual((snapshot.position, snapshot.since), (written.position, SINCE))
+
+    def test_reads_of_replica_scope_are_answered_without_bookings_sql(self):
+        intervals.write_snapshot(self.path, since=SINCE)
+        with routers.replica_reads():
+            self.assertIsNotNone(intervals.read_engine(date(2024, 3, 2)))
+            with self.assertNumQueries(1):
+                self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room2.id])
+            with self.assertNumQueries(0):
+                self.assertFalse(Booking.objects.get_intersections(date(2024, 3, 5), date(2024, 3, 7), self.room1))
+            self.assertEqual(list(Booking.objects.get_intersections(date(2024, 3, 4), date(2024, 3, 7))),
+                             [self.booking])
+
+    def test_other_reads_use_sql(self):
+        intervals.write_snapshot(self.path, since=SINCE)
+        self.assertIsNone(intervals.read_engine(date(2024, 3, 2)))
+        with routers.replica_reads():
+            # stays before snapshot date and managers bound to a database
+            self.assertIsNone(intervals.read_engine(date(2023, 12, 2)))
+            with self.assertNumQueries(1):
+                self.assertTrue(Booking.objects.db_manager('default').get_intersections(
+                    date(2024, 3, 4), date(2024, 3, 7), self.room1).exists())
+
+    def test_room_search_uses_engine(self):
+        intervals.write_snapshot(self.path, since=SINCE)
+        with mock.patch.object(intervals.IntervalEngine, 'booked_room_ids', autospec=True,
+                               side_effect=intervals.IntervalEngine.booked_room_ids) as booked_room_ids:
+            response = self.client.get(reverse('rooms') + '?checkin=2024-03-02&checkout=2024-03-03')
+        booked_room_ids.assert_called()
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room2.id])
+
+    def test_stale_snapshot_falls_back_to_sql(self):
+        intervals.write_snapshot(self.path, since=SINCE)
+        with mock.patch('booking.intervals.time.time', return_value=time.time() + 24 * 3600), \
+                self.assertLogs('booking.intervals', 'WARNING'):
+            self.assertIsNone(intervals.load_engine(self.path))
+        with routers.replica_reads():
+            engine = intervals.read_engine(date(2024, 3, 2))
+            engine.lag = 60
+            self.assertIsNone(intervals.read_engine(date(2024, 3, 2)))
+            self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room2.id])
+
+    def test_missing_snapshot_falls_back_to_sql(self):
+        with routers.replica_reads(), self.assertLogs('booking.intervals', 'WARNING'):
+            self.assertIsNone(intervals.read_engine(date(2024, 3, 2)))
+            self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room2.id])
+
+    def test_changes_are_recorded(self):
+        booking_id = self.booking.id
+        self.booking.checkout = date(2024, 3, 6)
+        self.booking.save()
+        self.booking.delete()
+        self.assertEqual(list(BookingChange.objects.filter(booking_id=booking_id).order_by('id').values_list(
+            'checkout', 'active')), [(date(2024, 3, 5), True), (date(2024, 3, 6), True), (date(2024, 3, 6), False)])
+
+    def test_archived_and_imported_bookings_are_recorded(self):
+        archive_bookings(date(2024, 1, 1))
+        import_bookings(StringIO(f'room_id,checkin,checkout\n{self.room2.id},2024-04-01,2024-04-03\n'), 'csv',
+                        csv.writer(StringIO()))
+        imported = Booking.objects.get(checkin=date(2024, 4, 1))
+        self.assertEqual(list(BookingChange.objects.filter(booking_id__in=[imported.id]).values_list(
+            'room_id', 'active')), [(self.room2.id, True)])
+        self.assertEqual(list(BookingChange.objects.filter(checkin=date(2023, 12, 1)).order_by('id').values_list(
+            'active', flat=True)), [True, False])
+
+    def test_snapshot_command(self):
+        BookingChange.objects.update(created=datetime(2000, 1, 1, tzinfo=timezone.utc))
+        output = StringIO()
+        call_command('snapshot_bookings', '--since', '2024-01-01', stdout=output)
+        self.assertIn('1 bookings written', output.getvalue())
+        self.assertIn('3 change feed rows pruned', output.getvalue())
+        self.assertEqual(len(intervals.read_snapshot(self.path).records), 1)
+
+
+class IntervalEngineFeedTestCase(SnapshotFileMixin, TransactionTestCase):
+    """Feed rows are read once their transactions finish, which test cases in a transaction never do"""
+    poll_seconds = 0
+
+    def test_engine_follows_committed_changes(self):
+        booking = Booking.objects.create(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        intervals.write_snapshot(self.path, since=SINCE)
+        with routers.replica_reads():
+            self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room2.id])
+
+            Booking.objects.create(room=self.room2, checkin=date(2024, 3, 2), checkout=date(2024, 3, 4))
+            booking.checkin, booking.checkout = date(2024, 3, 10), date(2024, 3, 12)
+            booking.save()
+            self.assertEqual(self.available('2024-03-02', '2024-03-03'), [self.room1.id])
+            self.assertEqual(self.available('2024-03-11', '2024-03-12'), [self.room2.id])
+
+            booking.delete()
+            self.assertEqual(self.available('2024-03-11', '2024-03-12'), [self.room1.id, self.room2.id])
+            self.assertEqual(len(intervals.get_engine()), 1)
+
+    def test_changes_made_while_snapshot_is_written_are_applied(self):
+        intervals.write_snapshot(self.path, since=SINCE)
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        with routers.replica_reads():
+            engine = intervals.read_engine(date(2024, 3, 1))
+            self.assertEqual(engine.booked_room_ids(date(2024, 3, 1), date(2024, 3, 2)), {self.room1.id})
+            self.assertEqual(engine.poll('default'), 0)
@@ -1,15 +1,26 @@
 import datetime
+import random
+import threading
 from datetime import date
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError, connection
-from django.test import TestCase
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    connection,
+    connections,
+    transaction,
+)
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from booking.models import Booking
 from rooms.models import Room
 
 
+# overlaps checked by Booking.clean(), the exclusion engine is tested in test_engine
+@override_settings(BOOKING_ENGINE='default')
 class BookingModelTestCase(TestCase):
 
     def setUp(self):
@@ -61,6 +72,12 @@ class BookingModelTestCase(TestCase):
             Booking.objects.create(room=self.room, checkin='2024-03-1041',
                                    checkout=datetime.datetime.now() + datetime.timedelta(days=3))
 
+    def test_booking_model_save_check_and_write_are_one_transaction(self):
+        with mock.patch('booking.signals.stays_changed', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Booking.objects.create(room=self.room, checkin=date(2024, 3, 9), checkout=date(2024, 3, 11))
+        self.assertFalse(Booking.objects.filter(checkin=date(2024, 3, 9)).exists())
+
     def test_booking_model_status_can_be_updated_when_checkout_time_came(self):
         self.booking.checkin = date.today() - datetime.timedelta(days=2)
         self.booking.checkout = date.today()
@@ -113,3 +130,86 @@ class BookingManagerTestCase(TestCase):
         checkout = date.today() + datetime.timedelta(days=7)
         intersections = Booking.objects.get_intersections(checkin, checkout, self.room)
         self.assertEqual(len(intersections), 1)
+
+    def test_manager_get_intersections_method_is_served_by_partial_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        room_plan = Booking.objects.get_intersections(date(2024, 3, 1), date(2024, 3, 4), self.room).explain()
+        all_rooms_plan = Booking.objects.get_intersections(date(2024, 3, 1), date(2024, 3, 4)).explain()
+        self.assertIn('booking_active_room_dates', room_plan)
+        self.assertIn('Index Scan on booking_active_', all_rooms_plan)
+
+
+@override_settings(BOOKING_ENGINE='default')
+class BookingRoomLockTestCase(TransactionTestCase):
+    """Concurrent saves in threads, each thread has its own database connection"""
+
+    def setUp(self):
+        self.rooms = [Room.objects.create(room_type=1, price=1000, spots=1) for _ in range(2)]
+
+    def run_in_threads(self, target, count: int) -> list[threading.Thread]:
+        def run(*args):
+            try:
+                target(*args)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(number,)) for number in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def test_concurrent_bookings_never_overlap(self):
+        barrier = threading.Barrier(8)
+        results = {'created': 0, 'conflicts': 0}
+        lock = threading.Lock()
+
+        def book(number: int) -> None:
+            rnd = random.Random(number)
+            barrier.wait()
+            for _ in range(15):
+                checkin = date(2024, 3, 1) + datetime.timedelta(days=rnd.randrange(10))
+                booking = Booking(room=rnd.choice(self.rooms), checkin=checkin,
+                                  checkout=checkin + datetime.timedelta(days=rnd.randint(1, 3)))
+                try:
+                    booking.save()
+                    outcome = 'created'
+                except ValidationError:
+                    outcome = 'conflicts'
+                with lock:
+                    results[outcome] += 1
+
+        for thread in self.run_in_threads(book, 8):
+            thread.join()
+
+        self.assertEqual(results['created'] + results['conflicts'], 8 * 15)
+        self.assertEqual(Booking.objects.count(), results['created'])
+        for room in self.rooms:
+            stays = sorted(Booking.objects.filter(room=room).values_list('checkin', 'checkout'))
+            for (_, checkout), (next_checkin, _) in zip(stays, stays[1:]):
+                self.assertLessEqual(checkout, next_checkin)
+
+    def test_only_bookings_of_the_same_room_wait(self):
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_room(number: int) -> None:
+            with transaction.atomic():
+                Booking.objects.create(room=self.rooms[0], checkin=date(2024, 3, 1), checkout=date(2024, 3, 3))
+                locked.set()
+                release.wait(10)
+
+        thread = self.run_in_threads(hold_room, 1)[0]
+        try:
+            self.assertTrue(locked.wait(10))
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '5s'")
+                Booking.objects.create(room=self.rooms[1], checkin=date(2024, 3, 1), checkout=date(2024, 3, 3))
+            with self.assertRaises(OperationalError), transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '100ms'")
+                Booking.objects.create(room=self.rooms[0], checkin=date(2024, 3, 5), checkout=date(2024, 3, 6))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(Booking.objects.count(), 2)
@@ -4,8 +4,10 @@ from django.contrib.auth import get_user_model
 from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
 
 from booking.models import Booking
+from common.instrumentation import track_queries
 from rooms.models import Room
 
 
@@ -101,6 +103,15 @@ class TestListCreateBookingViewGet(TestListCreateBookingViewTestCaseSetupMixin):
         self.assertEqual(response.json(),
                          [{'room': 1, 'checkin': '2024-03-20', 'checkout': '2024-03-30', 'active': True}])
 
+    def test_view_booking_list_query_budget_does_not_grow_with_bookings(self):
+        for day in range(1, 20):
+            Booking.objects.create(room=self.room, checkin=date(2024, 3, day),
+                                   checkout=date(2024, 3, day + 1), user=self.user)
+        self.client.force_login(self.user)
+        with track_queries() as metrics:
+            self.client.get(reverse('booking-my'))
+        self.assertLessEqual(metrics.queries, 3)
+
     def test_view_authenticated_user_booking_list_with_not_active_booking(self):
         Booking.objects.create(room=self.room, checkin=date(2024, 3, 20),
                                checkout=date(2024, 3, 30), user=self.user, active=False)
@@ -111,6 +122,40 @@ class TestListCreateBookingViewGet(TestListCreateBookingViewTestCaseSetupMixin):
                          [{'room': 1, 'checkin': '2024-03-20', 'checkout': '2024-03-30', 'active': False}])
 
 
+class TestBookingListAsyncView(TestListCreateBookingViewTestCaseSetupMixin):
+
+    def setUp(self):
+        super().setUp()
+        self.other = get_user_model().objects.create_user(username='other', email='other')
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 20), checkout=date(2024, 3, 30), user=self.user)
+        Booking.objects.create(room=self.room, checkin=date(2024, 4, 1), checkout=date(2024, 4, 5), user=self.other)
+
+    async def test_view_not_authenticated_user_booking_list_then_raise_403(self):
+        response = await self.async_client.get(reverse('booking-my-async'))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_view_session_user_booking_list_same_as_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        expected = await self.async_client.get(reverse('booking-my'))
+        response = await self.async_client.get(reverse('booking-my-async'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.json(),
+                         [{'room': self.room.id, 'checkin': '2024-03-20', 'checkout': '2024-03-30', 'active': True}])
+
+    async def test_view_token_user_booking_list(self):
+        token = await Token.objects.acreate(user=self.other)
+        response = await self.async_client.get(reverse('booking-my-async'),
+                                               headers={'Authorization': f'Bearer {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([booking['checkin'] for booking in response.json()], ['2024-04-01'])
+
+    async def test_view_invalid_token_then_403(self):
+        response = await self.async_client.get(reverse('booking-my-async'),
+                                               headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, 403)
+
+
 class BookingRetrieveUpdateAPIViewTestCaseSetupMixin(TestCase):
 
     def setUp(self):
@@ -148,6 +193,21 @@ class BookingRetrieveUpdateAPIViewRetrieveTestCase(BookingRetrieveUpdateAPIViewT
         response = self.client.get(reverse('booking-detail', kwargs={'pk': other_booking.id}))
         self.assertEqual(response.status_code, 404)
 
+    def test_unchanged_booking_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse('booking-detail', kwargs={'pk': self.booking.id})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.booking.active = False
+        self.booking.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['active'])
+        self.assertNotEqual(response['ETag'], etag)
+
 
 class BookingRetrieveUpdateAPIViewUpdateTestCase(BookingRetrieveUpdateAPIViewTestCaseSetupMixin):
 
@@ -192,3 +252,152 @@ class BookingRetrieveUpdateAPIViewUpdateTestCase(BookingRetrieveUpdateAPIViewTes
         self.assertEqual(response.status_code, 200)
         response = self.client.get(reverse('booking-detail', kwargs={'pk': self.booking.id}))
         self.assertEqual(response.json()['active'], False)
+
+    def test_reactivating_overlapping_booking_then_409(self):
+        self.client.force_login(self.user)
+        self.booking.active = False
+        self.booking.save()
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 25), checkout=date(2024, 3, 27))
+        response = self.client.patch(reverse('booking-update', kwargs={'pk': self.booking.id}),
+                                     data={'active': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.booking.refresh_from_db()
+        self.assertFalse(self.booking.active)
+
+
+class BookingBatchCreateAPIViewTestCase(TestListCreateBookingViewTestCaseSetupMixin):
+
+    def post_batch(self, items):
+        return self.client.post(reverse('booking-batch'), data=items, content_type='application/json')
+
+    def test_not_authenticated_user_cant_create_batch(self):
+        response = self.post_batch([{'room': self.room.id, 'checkin': '2024-03-29', 'checkout': '2024-04-03'}])
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_when_all_items_valid_then_201(self):
+        self.client.force_login(self.user)
+        response = self.post_batch([{'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-03'},
+                                    {'room': self.room.id, 'checkin': '2024-03-03', 'checkout': '2024-03-05'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.json()], [201, 201])
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_reports_conflict_with_existing_booking(self):
+        self.client.force_login(self.user)
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 28), checkout=date(2024, 3, 30))
+        response = self.post_batch([{'room': self.room.id, 'checkin': '2024-03-29', 'checkout': '2024-04-03'},
+                                    {'room': self.room.id, 'checkin': '2024-04-03', 'checkout': '2024-04-05'}])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()[0], {'index': 0, 'status': 409, 'detail': 'dates are already taken'})
+        self.assertEqual(response.json()[1]['status'], 201)
+
+    def test_batch_reports_conflict_inside_batch(self):
+        self.client.force_login(self.user)
+        response = self.post_batch([{'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-10'},
+                                    {'room': self.room.id, 'checkin': '2024-03-05', 'checkout': '2024-03-06'}])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()], [201, 409])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_batch_reports_invalid_items(self):
+        self.client.force_login(self.user)
+        response = self.post_batch([{'room': self.room.id + 3, 'checkin': '2024-03-01', 'checkout': '2024-03-10'},
+                                    {'room': self.room.id, 'checkin': '2024-03-10', 'checkout': '2024-03-06'},
+                                    {'room': self.room.id, 'checkin': 'invalid_date', 'checkout': '2024-03-06'}])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()], [400, 400, 400])
+        self.assertIn('room', response.json()[0]['errors'])
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_batch_when_payload_is_not_list_then_400(self):
+        self.client.force_login(self.user)
+        response = self.post_batch({'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-10'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_checks_conflicts_with_constant_number_of_queries(self):
+        self.client.force_login(self.user)
+        items = [{'room': self.room.id, 'checkin': f'2024-03-{day:02}', 'checkout': f'2024-03-{day + 1:02}'}
+                 for day in range(1, 21)]
+        with self.assertNumQueries(7):
+            response = self.post_batch(items)
+        self.assertEqual(response.status_code, 201)
+
+
+class BookingQuoteAPIViewTestCase(TestCase):
+
+    def setUp(self):
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=1500.50)
+        self.room3 = Room.objects.create(room_type=3, spots=3, price=3000)
+        Booking.objects.create(room=self.room1, checkin=date(2024, 3, 4), checkout=date(2024, 3, 6))
+        Booking.objects.create(room=self.room3, checkin=date(2024, 3, 1), checkout=date(2024, 3, 3), active=False)
+
+    def post_quote(self, items):
+        return self.client.post(reverse('booking-quote'), data=items, content_type='application/json')
+
+    def test_quote_of_rooms(self):
+        response = self.post_quote([{'room': self.room2.id, 'checkin': '2024-03-01', 'checkout': '2024-03-04'},
+                                    {'room': self.room1.id, 'checkin': '2024-03-01', 'checkout': '2024-03-05'},
+                                    {'room': self.room1.id, 'checkin': '2024-03-01', 'checkout': '2024-03-04'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'index': 0, 'status': 200, 'checkin': '2024-03-01', 'checkout': '2024-03-04', 'nights': 3,
+             'quotes': [{'room': self.room2.id, 'price': '1500.50', 'total': '4501.50'}]},
+            {'index': 1, 'status': 200, 'checkin': '2024-03-01', 'checkout': '2024-03-05', 'nights': 4,
+             'quotes': []},
+            {'index': 2, 'status': 200, 'checkin': '2024-03-01', 'checkout': '2024-03-04', 'nights': 3,
+             'quotes': [{'room': self.room1.id, 'price': '1000.00', 'total': '3000.00'}]},
+        ])
+
+    def test_quote_of_filter_lists_available_rooms_cheapest_first(self):
+        response = self.post_quote([{'filter': {}, 'checkin': '2024-03-05', 'checkout': '2024-03-07'},
+                                    {'filter': {'spots_gte': 2}, 'checkin': '2024-03-10', 'checkout': '2024-03-11'}])
+        first, second = response.json()
+        self.assertEqual([(quote['room'], quote['total']) for quote in first['quotes']],
+                         [(self.room2.id, '3001.00'), (self.room3.id, '6000.00')])
+        self.assertEqual([quote['room'] for quote in second['quotes']], [self.room2.id, self.room3.id])
+
+    def test_quote_reports_invalid_items(self):
+        response = self.post_quote([{'room': self.room1.id + 100, 'checkin': '2024-03-01', 'checkout': '2024-03-02'},
+                                    {'room': self.room1.id, 'checkin': '2024-03-02', 'checkout': '2024-03-01'},
+                                    {'checkin': '2024-03-01', 'checkout': '2024-03-02'},
+                                    {'filter': {'price_gte': 'cheap'}, 'checkin': '2024-03-01',
+                                     'checkout': '2024-03-02'},
+                                    {'room': self.room1.id, 'checkin': '2024-03-01', 'checkout': '2024-03-02'}])
+        self.assertEqual([result['status'] for result in response.json()], [404, 400, 400, 400, 200])
+        self.assertIn('price_gte', response.json()[3]['errors']['filter'])
+
+    def test_quote_when_payload_is_not_list_or_too_large_then_400(self):
+        self.assertEqual(self.post_quote({'room': self.room1.id}).status_code, 400)
+        item = {'room': self.room1.id, 'checkin': '2024-03-01', 'checkout': '2024-03-02'}
+        self.assertEqual(self.post_quote([item] * 101).status_code, 400)
+
+    def test_quote_uses_constant_number_of_queries(self):
+        items = [{'room': self.room1.id, 'checkin': f'2024-03-{day:02}', 'checkout': f'2024-03-{day + 2:02}'}
+                 for day in range(1, 21)]
+        items += [{'filter': {'price_lte': price}, 'checkin': '2024-03-01', 'checkout': '2024-04-01'}
+                  for price in range(1000, 4000, 500)]
+        # candidate rooms and bookings intersecting all stays
+        with self.assertNumQueries(2):
+            response = self.post_quote(items)
+        self.assertEqual(len(response.json()[-1]['quotes']), 2)
+
+
+class TestListCreateBookingViewKeysetPagination(TestListCreateBookingViewTestCaseSetupMixin):
+
+    def test_booking_list_paginated_with_cursor(self):
+        for day in range(1, 6):
+            Booking.objects.create(room=self.room, checkin=date(2024, 3, day),
+                                   checkout=date(2024, 3, day + 1), user=self.user)
+        self.client.force_login(self.user)
+        first = self.client.get(reverse('booking-my') + '?pagination=cursor&limit=3').json()
+        self.assertEqual([booking['checkin'] for booking in first['results']],
+                         ['2024-03-01', '2024-03-02', '2024-03-03'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([booking['checkin'] for booking in second['results']], ['2024-03-04', '2024-03-05'])
+        self.assertIsNone(second['next'])
+
+    def test_booking_list_without_cursor_not_paginated(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking-my'))
+        self.assertEqual(response.json(), [])
@@ -1,10 +1,27 @@
 from django.urls import path
 
-from .views import BookingListCreateAPIView, BookingRetrieveUpdateAPIView
+from .views import (
+    BookingBatchCreateAPIView,
+    BookingExportAPIView,
+    BookingListAsyncView,
+    BookingListCreateAPIView,
+    BookingQuoteAPIView,
+    BookingRetrieveUpdateAPIView,
+    HoldCreateAPIView,
+    HoldPromoteAPIView,
+    HoldRetrieveDestroyAPIView,
+)
 
 urlpatterns = [
     path('', BookingListCreateAPIView.as_view(), name='booking-create'),
     path('', BookingListCreateAPIView.as_view(), name='booking-my'),
+    path('async/', BookingListAsyncView.as_view(), name='booking-my-async'),
+    path('export/', BookingExportAPIView.as_view(), name='booking-export'),
+    path('batch/', BookingBatchCreateAPIView.as_view(), name='booking-batch'),
+    path('quote/', BookingQuoteAPIView.as_view(), name='booking-quote'),
+    path('holds/', HoldCreateAPIView.as_view(), name='hold-create'),
+    path('holds/<int:pk>', HoldRetrieveDestroyAPIView.as_view(), name='hold-detail'),
+    path('holds/<int:pk>/promote/', HoldPromoteAPIView.as_view(), name='hold-promote'),
     path('<int:pk>', BookingRetrieveUpdateAPIView.as_view(), name='booking-detail'),
     path('<int:pk>', BookingRetrieveUpdateAPIView.as_view(), name='booking-update')
 ]
@@ -1,21 +1,66 @@
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
-from drf_yasg.utils import swagger_auto_schema
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.db.models import QuerySet
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
+from drf_yasg import openapi
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.generics import (
+    CreateAPIView,
+    GenericAPIView,
+    ListCreateAPIView,
+    RetrieveDestroyAPIView,
+    RetrieveUpdateAPIView,
+)
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from booking.models import Booking
-from booking.serializers import BookingSerializer, BookingSerializerUpdateStatusOnly
-from common.mixins import UserQuerySetMixin
+from accounts.authentication import aauthenticate
+from booking.batch import create_bookings
+from booking.export import (
+    EXPORT_FORMATS,
+    aexport_lines,
+    export_lines,
+    export_queryset,
+)
+from booking.holds import promote_hold
+from booking.models import Booking, BookingHistory, Hold, is_overlap_error
+from booking.pagination import BookingsKeysetPagination
+from booking.quote import quote_stays
+from booking.serializers import (
+    BookingExportQuerySerializer,
+    BookingSerializer,
+    BookingSerializerUpdateStatusOnly,
+    HoldSerializer,
+    QuoteItemSerializer,
+)
+from common.idempotency import HEADER as IDEMPOTENCY_HEADER
+from common.mixins import (
+    ConditionalGetMixin,
+    IdempotencyMixin,
+    KeysetPaginationMixin,
+    ReplicaReadMixin,
+    UserQuerySetMixin,
+    ValuesListMixin,
+)
 
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    IDEMPOTENCY_HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING,
+    description='Retries with the same key get the response of the first request back'
+)
 
-class BookingListCreateAPIView(UserQuerySetMixin, ListCreateAPIView):
+
+class BookingListCreateAPIView(ReplicaReadMixin, ValuesListMixin, UserQuerySetMixin, KeysetPaginationMixin,
+                               IdempotencyMixin, ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BookingSerializer
-    queryset = Booking.objects.all()
+    # bookings are listed along with archived ones, new bookings are created in Booking table by serializer
+    queryset = BookingHistory.objects.all()
     allow_superuser_view = False
+    keyset_pagination_class = BookingsKeysetPagination
 
     def perform_create(self, serializer) -> None:
         serializer.save(user=self.request.user)
@@ -23,25 +68,46 @@ class BookingListCreateAPIView(UserQuerySetMixin, ListCreateAPIView):
     @swagger_auto_schema(
         operation_summary='Create booking',
         operation_description='Create a new booking',
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={403: 'not logged in',
-                   409: 'dates are already taken'}
+                   409: 'dates are already taken or request with the same Idempotency-Key is in progress',
+                   422: 'Idempotency-Key was used with another request'}
     )
-    def post(self, request, *args, **kwargs) -> JsonResponse:
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.idempotent(request, self.create_booking, *args, **kwargs)
+
+    def create_booking(self, request, *args, **kwargs) -> Response:
         try:
             return super().post(request, *args, **kwargs)
         except ValidationError:
-            return JsonResponse(status=status.HTTP_409_CONFLICT, data={'detail': 'dates are already taken'})
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
+        except IntegrityError as exc:
+            if not is_overlap_error(exc):
+                raise
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
 
     @swagger_auto_schema(
         operation_summary='List of users bookings',
-        operation_description='List of authenticated users bookings',
+        operation_description='List of authenticated users bookings. '
+                              'Pass pagination=cursor for keyset pagination with optional count=exact|estimate',
         responses={403: 'not logged in'}
     )
     def get(self, request, *args, **kwargs) -> Response:
         return super().get(request, *args, **kwargs)
 
 
-class BookingRetrieveUpdateAPIView(UserQuerySetMixin, RetrieveUpdateAPIView):
+class BookingListAsyncView(View):
+    """ASGI-native variant of bookings list of BookingListCreateAPIView, bookings are fetched with async ORM"""
+
+    async def get(self, request, *args, **kwargs) -> JsonResponse:
+        user = await aauthenticate(request)
+        if user is None:
+            return JsonResponse({'detail': NotAuthenticated.default_detail}, status=status.HTTP_403_FORBIDDEN)
+        bookings = [booking async for booking in BookingHistory.objects.filter(user=user).aiterator()]
+        return JsonResponse(BookingSerializer(bookings, many=True).data, safe=False)
+
+
+class BookingRetrieveUpdateAPIView(ConditionalGetMixin, UserQuerySetMixin, RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BookingSerializerUpdateStatusOnly
     lookup_field = 'pk'
@@ -50,12 +116,207 @@ class BookingRetrieveUpdateAPIView(UserQuerySetMixin, RetrieveUpdateAPIView):
     queryset = Booking.objects.all()
     http_method_names = ('patch', 'get',)
 
+    def get_queryset(self) -> QuerySet:
+        # archived bookings are shown as in the list of bookings, only current ones are changed
+        if self.request.method == 'GET':
+            self.queryset = BookingHistory.objects.all()
+        return super().get_queryset()
+
+    def is_archived(self, pk) -> bool:
+        self.queryset = BookingHistory.objects.filter(archived=True)
+        return self.get_queryset().filter(pk=pk).exists()
+
     @swagger_auto_schema(
         operation_summary='Change booking status',
-        operation_description='Change booking status',
-        responses={409: 'dates are already taken',
+        operation_description='Change booking status, archived bookings can not be changed',
+        responses={409: 'dates are already taken or booking is archived',
                    404: 'no booking matching given query found',
                    403: 'not logged in'}
     )
     def patch(self, request, *args, **kwargs) -> Response:
-        return super().patch(request, *args, **kwargs)
+        # reactivated booking is checked for overlaps as a new one
+        try:
+            return super().patch(request, *args, **kwargs)
+        except Http404:
+            if not self.is_archived(kwargs[self.lookup_field]):
+                raise
+            return Response({'detail': 'archived booking can not be changed'}, status=status.HTTP_409_CONFLICT)
+        except ValidationError:
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
+        except IntegrityError as exc:
+            if not is_overlap_error(exc):
+                raise
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
+
+    @swagger_auto_schema(
+        operation_summary='Booking',
+        operation_description='Booking of authenticated user, archived ones included. Response has an ETag, '
+                              'request with it in If-None-Match gets 304 while the booking is unchanged',
+        responses={304: 'booking not modified',
+                   404: 'no booking matching given query found',
+                   403: 'not logged in'}
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        return super().get(request, *args, **kwargs)
+
+
+class BookingBatchCreateAPIView(IdempotencyMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BookingSerializer
+    max_batch_size = 1000
+
+    @swagger_auto_schema(
+        operation_summary='Create bookings in batch',
+        operation_description='Create list of bookings, result is reported for every item in payload order',
+        request_body=BookingSerializer(many=True),
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        responses={201: 'all bookings created',
+                   207: 'some bookings were not created, see status of every item',
+                   400: 'payload is not a list or batch is too large',
+                   403: 'not logged in',
+                   409: 'dates are already taken or request with the same Idempotency-Key is in progress',
+                   422: 'Idempotency-Key was used with another request'}
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.idempotent(request, self.create_batch)
+
+    def create_batch(self, request) -> Response:
+        if not isinstance(request.data, list):
+            return Response({'detail': 'expected a list of bookings'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response({'detail': f'batch can not be larger than {self.max_batch_size} bookings'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = create_bookings(request.user, request.data)
+        except IntegrityError as exc:
+            if not is_overlap_error(exc):
+                raise
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
+        all_created = all(result['status'] == status.HTTP_201_CREATED for result in results)
+        return Response(results, status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS)
+
+
+class HoldCreateAPIView(IdempotencyMixin, CreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = HoldSerializer
+
+    def perform_create(self, serializer) -> None:
+        serializer.save(user=self.request.user)
+
+    @swagger_auto_schema(
+        operation_summary='Hold room',
+        operation_description='Reserve a room for the dates until expires_at (BOOKING_HOLD_SECONDS from now), '
+                              'while the hold is live nobody else can book or hold the room for these dates',
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        responses={403: 'not logged in',
+                   409: 'dates are already taken or request with the same Idempotency-Key is in progress',
+                   422: 'Idempotency-Key was used with another request'}
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.idempotent(request, self.create_hold, *args, **kwargs)
+
+    def create_hold(self, request, *args, **kwargs) -> Response:
+        try:
+            return super().post(request, *args, **kwargs)
+        except ValidationError:
+            return Response({'detail': 'dates are already taken'}, status=status.HTTP_409_CONFLICT)
+
+
+class HoldRetrieveDestroyAPIView(UserQuerySetMixin, RetrieveDestroyAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = HoldSerializer
+    queryset = Hold.objects.live()
+    allow_superuser_view = True
+
+    @swagger_auto_schema(
+        operation_summary='Hold',
+        operation_description='Live hold of authenticated user',
+        responses={404: 'no live hold matching given query found', 403: 'not logged in'}
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary='Release hold',
+        operation_description='Release the room held by authenticated user',
+        responses={404: 'no live hold matching given query found', 403: 'not logged in'}
+    )
+    def delete(self, request, *args, **kwargs) -> Response:
+        return super().delete(request, *args, **kwargs)
+
+
+class HoldPromoteAPIView(UserQuerySetMixin, IdempotencyMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BookingSerializer
+    queryset = Hold.objects.live()
+    allow_superuser_view = False
+
+    @swagger_auto_schema(
+        operation_summary='Book held room',
+        operation_description='Turn live hold of authenticated user into a booking',
+        request_body=no_body,
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        responses={201: BookingSerializer,
+                   403: 'not logged in',
+                   404: 'no live hold matching given query found',
+                   409: 'request with the same Idempotency-Key is in progress',
+                   410: 'hold has expired'}
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.idempotent(request, self.promote, *args, **kwargs)
+
+    def promote(self, request, *args, **kwargs) -> Response:
+        booking = promote_hold(self.get_object().pk)
+        if booking is None:
+            return Response({'detail': 'hold has expired'}, status=status.HTTP_410_GONE)
+        return Response(self.get_serializer(booking).data, status=status.HTTP_201_CREATED)
+
+
+class BookingQuoteAPIView(GenericAPIView):
+    permission_classes = [AllowAny]
+    serializer_class = QuoteItemSerializer
+    max_batch_size = 100
+    max_quotes = 50
+
+    @swagger_auto_schema(
+        operation_summary='Quote stays',
+        operation_description='Prices list of stays, each of a room or of rooms matching a filter '
+                              '(price_gte, price_lte, spots_gte, spots_lte). Result of every item in payload order '
+                              'lists available rooms with price per night and total for the stay, cheapest first',
+        request_body=QuoteItemSerializer(many=True),
+        responses={200: 'result of every item, see its status',
+                   400: 'payload is not a list or batch is too large'}
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        if not isinstance(request.data, list):
+            return Response({'detail': 'expected a list of stays'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response({'detail': f'batch can not be larger than {self.max_batch_size} stays'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(quote_stays(request.data, self.max_quotes))
+
+
+class BookingExportAPIView(GenericAPIView):
+    permission_classes = [IsAdminUser]
+    chunk_size = 5000
+
+    @swagger_auto_schema(
+        operation_summary='Export bookings',
+        operation_description='Streams all bookings as CSV or NDJSON, optionally only stays overlapping '
+                              'start - end dates and only active or inactive bookings. '
+                              'Streamed by both WSGI and ASGI applications',
+        query_serializer=BookingExportQuerySerializer,
+        responses={400: 'invalid filter passed', 403: 'not a staff user'}
+    )
+    def get(self, request, *args, **kwargs) -> StreamingHttpResponse:
+        query = BookingExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        output = query.validated_data['output']
+        qs = export_queryset(query.validated_data['start'], query.validated_data['end'],
+                             query.validated_data['active'])
+        lines = aexport_lines if isinstance(request._request, ASGIRequest) else export_lines
+        return StreamingHttpResponse(
+            lines(qs, output, self.chunk_size),
+            content_type=EXPORT_FORMATS[output],
+            headers={'Content-Disposition': f'attachment; filename="bookings.{output}"'},
+        )
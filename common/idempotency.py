@@ -0,0 +1,106 @@
+"""
+Idempotency keys of unsafe requests.
+
+A client sends the same `Idempotency-Key` header with every retry of a request. The first
+request runs the view and its response is stored in IDEMPOTENCY_CACHE for IDEMPOTENCY_KEY_TTL
+seconds, retries get the stored response back after one cache lookup. Concurrent duplicates are
+collapsed: the request which added the lock key runs, others get 409 at once instead of holding
+a worker while they wait, and retry after it. Responses with server errors are not stored,
+so the request can be retried.
+
+Keys are scoped by user and view. A key reused with another payload is rejected.
+Keys are honoured only when IDEMPOTENCY_CACHE names a cache shared by all workers, a retry
+reaching a worker with a cache of its own would run the request again.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+RESPONSE_KEY = 'idempotency:{}:{}:{}'
+LOCK_KEY = '{}:lock'
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'request with this Idempotency-Key is in progress'
+    default_code = 'idempotency_key_in_progress'
+    # seconds sent in Retry-After header by DRF exception handler
+    wait = 1
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was used with another request'
+    default_code = 'idempotency_key_reused'
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status: int
+    data: object
+
+
+def get_cache() -> BaseCache | None:
+    alias = getattr(settings, 'IDEMPOTENCY_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def enabled() -> bool:
+    return get_cache() is not None
+
+
+def _ttl() -> int:
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600)
+
+
+def _lock_seconds() -> int:
+    return getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 30)
+
+
+def fingerprint(method: str, path: str, data) -> str:
+    """Hash of request method, path and parsed payload"""
+    if hasattr(data, 'lists'):
+        data = sorted(data.lists())
+    payload = json.dumps([method, path, data], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def response_key(user_id, scope: str, key: str) -> str:
+    return RESPONSE_KEY.format(user_id, scope, hashlib.sha1(key.encode()).hexdigest())
+
+
+def lookup_or_lock(key: str, request_fingerprint: str) -> StoredResponse | None:
+    """
+    Stored response of the key or None when the lock is taken by this request and it should run.
+    Raises RequestInProgress while a duplicate request holds the lock.
+    """
+    cache = get_cache()
+    stored = cache.get(key)
+    if stored is None:
+        if not cache.add(LOCK_KEY.format(key), request_fingerprint, timeout=_lock_seconds()):
+            raise RequestInProgress()
+        # the duplicate holding the lock may have stored its response and released the lock since
+        stored = cache.get(key)
+        if stored is None:
+            return None
+        release(key)
+    if stored.fingerprint != request_fingerprint:
+        raise KeyReused()
+    return stored
+
+
+def store(key: str, response: StoredResponse) -> None:
+    get_cache().set(key, response, timeout=_ttl())
+
+
+def release(key: str) -> None:
+    get_cache().delete(LOCK_KEY.format(key))
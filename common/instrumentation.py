@@ -0,0 +1,114 @@
+"""
+Per-request instrumentation: number of queries, DB time, serializer time and view time.
+
+Queries are counted with connection.execute_wrapper, which works with DEBUG off.
+The wrapper is installed on every connection once and reports to metrics of
+the current context, so queries made by async ORM in worker threads are counted too.
+`track_queries()` can be used directly in tests to assert query budgets:
+
+    with track_queries() as metrics:
+        self.client.get(reverse('rooms'))
+    self.assertLessEqual(metrics.queries, 3)
+"""
+import contextlib
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current_metrics: ContextVar['RequestMetrics | None'] = ContextVar('request_metrics', default=None)
+
+
+@dataclass
+class RequestMetrics:
+    queries: int = 0
+    db_time: float = 0.0
+    serializer_time: float = 0.0
+    view_time: float = 0.0
+    total_time: float = 0.0
+    _timing_depth: int = field(default=0, repr=False)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def as_dict(self) -> dict:
+        metrics = asdict(self)
+        metrics.pop('_timing_depth')
+        return {name: round(value * 1000, 3) if name.endswith('_time') else value
+                for name, value in metrics.items()}
+
+    def server_timing(self) -> str:
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.3f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.3f}',
+            f'view;dur={self.view_time * 1000:.3f}',
+            f'total;dur={self.total_time * 1000:.3f}',
+        ])
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _current_metrics.get()
+
+
+def _dispatch_query(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_wrapper(connection, **kwargs) -> None:
+    if _dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch_query)
+
+
+connection_created.connect(install_query_wrapper)
+
+
+@contextlib.contextmanager
+def track_queries() -> Iterator[RequestMetrics]:
+    """Collects metrics of all queries executed on every database connection inside the block"""
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(connection)
+    metrics = RequestMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextlib.contextmanager
+def timed(attribute: str) -> Iterator[None]:
+    """Adds time of the block to metric of current request, nested blocks are counted once"""
+    metrics = current_metrics()
+    if metrics is None or metrics._timing_depth:
+        yield
+        return
+    metrics._timing_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._timing_depth -= 1
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started)
+
+
+class InstrumentedSerializerMixin:
+    """Counts validation and representation time of serializer into serializer time of current request"""
+
+    def run_validation(self, *args, **kwargs):
+        with timed('serializer_time'):
+            return super().run_validation(*args, **kwargs)  # type: ignore
+
+    def to_representation(self, *args, **kwargs):
+        with timed('serializer_time'):
+            return super().to_representation(*args, **kwargs)  # type: ignore
@@ -0,0 +1,122 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+from common import routers
+from common.instrumentation import track_queries
+
+logger = logging.getLogger('common.request_metrics')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records queries, DB time, serializer time and view time of sampled requests,
+    returns them in Server-Timing header and logs them as a JSON line.
+    Requests slower than REQUEST_METRICS_SLOW_MS are logged as warnings whether sampled or not.
+    Supports both WSGI and ASGI, so async views are not switched to a thread by this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0.0)
+        self.slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 1000)
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        if self.sampled():
+            with track_queries() as metrics:
+                request._metrics = metrics
+                response = self.get_response(request)
+            return self.finish_sampled(request, response, metrics, started)
+        return self.finish(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        if self.sampled():
+            with track_queries() as metrics:
+                request._metrics = metrics
+                response = await self.get_response(request)
+            return self.finish_sampled(request, response, metrics, started)
+        return self.finish(request, await self.get_response(request), started)
+
+    def sampled(self) -> bool:
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def finish_sampled(self, request, response, metrics, started: float):
+        metrics.total_time = time.perf_counter() - started
+        if getattr(request, '_view_started', None):
+            metrics.view_time = time.perf_counter() - request._view_started
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing()
+        self.log(request, response, metrics.total_time, metrics.as_dict())
+        return response
+
+    def finish(self, request, response, started: float):
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= self.slow_ms:
+            self.log(request, response, elapsed, {'total_time': round(elapsed * 1000, 3)})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
+
+    def log(self, request, response, elapsed: float, metrics: dict) -> None:
+        slow = elapsed * 1000 >= self.slow_ms
+        payload = {'method': request.method, 'path': request.path, 'status': response.status_code,
+                   'slow': slow, **metrics}
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(payload), extra={'metrics': payload})
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Pins authenticated users who sent an unsafe request to the primary database
+    for DATABASE_REPLICA_STICKY_SECONDS, so their following reads see their writes.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user_id = self.writer_id(request)
+        if user_id is not None:
+            routers.pin_to_primary(user_id, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user_id = self.writer_id(request)
+        if user_id is not None:
+            await routers.apin_to_primary(user_id, response)
+        return response
+
+    def writer_id(self, request) -> int | None:
+        # user is replaced by authentication of the view, token authenticated users included.
+        # User which nobody has loaded did not write anything, loading it here would query in async context
+        user = getattr(request, 'user', None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            return None
+        if request.method in self.safe_methods or user is None or not user.is_authenticated:
+            return None
+        return user.id
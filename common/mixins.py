@@ -1,4 +1,12 @@
 from django.db.models import QuerySet
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response, set_response_etag
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from common import idempotency, routers
+from common.representation import field_plan
 
 
 class UserQuerySetMixin:
@@ -13,3 +21,125 @@ class UserQuerySetMixin:
             return qs
         lookup_data = {self.user_field: user}
         return qs.filter(**lookup_data)
+
+
+class KeysetPaginationMixin:
+    """Switches view to keyset pagination when client asks for it with `pagination=cursor` or a cursor"""
+    keyset_pagination_class: type | None = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = self.request  # type: ignore
+            if self.keyset_pagination_class and self.keyset_pagination_class.requested(request):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator  # type: ignore
+        return self._paginator
+
+
+class ReplicaReadMixin:
+    """Safe requests read from replicas, unless the user changed data within the sticky window"""
+
+    def initial(self, request, *args, **kwargs) -> None:
+        super().initial(request, *args, **kwargs)  # type: ignore
+        user = request.user
+        if request.method not in SAFE_METHODS:
+            return
+        if not (user.is_authenticated and routers.pinned_to_primary(request, user.id)):
+            self._replica_reads = routers.start_replica_reads()
+
+    def read_primary(self) -> None:
+        """Rest of the request reads from the primary, e.g. results stored for later requests"""
+        if self._replica_reads is not None:
+            routers.end_replica_reads(self._replica_reads)
+            self._replica_reads = None
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_reads = None
+        try:
+            return super().dispatch(request, *args, **kwargs)  # type: ignore
+        finally:
+            if self._replica_reads is not None:
+                routers.end_replica_reads(self._replica_reads)
+
+
+class ValuesListMixin:
+    """
+    List is read as values_list rows and encoded with a precompiled field plan of serializer_class
+    instead of serializing model instances, the output is the same. Serializers with fields
+    which are not plain model fields keep the regular list.
+    """
+    values_fast_path = True
+
+    def list(self, request, *args, **kwargs) -> Response:
+        plan = field_plan(self.get_serializer_class()) if self.values_fast_path else None  # type: ignore
+        if plan is None:
+            return super().list(request, *args, **kwargs)  # type: ignore
+        rows = plan.rows(self.filter_queryset(self.get_queryset()))  # type: ignore
+        page = self.paginate_queryset(rows)  # type: ignore
+        if page is not None:
+            return self.get_paginated_response(plan.encode(page))  # type: ignore
+        return Response(plan.encode(rows))
+
+
+class ConditionalGetMixin:
+    """
+    Successful GET responses carry an ETag, requests with If-None-Match of the current one
+    get 304 Not Modified without body. ETag is a hash of rendered content unless the view
+    knows it beforehand: `not_modified(request, etag)` answers 304 before the view reads
+    and serializes anything, and marks the response with that ETag otherwise.
+    """
+
+    def not_modified(self, request, etag: str | None) -> HttpResponseBase | None:
+        self._etag = etag
+        if etag is None:
+            return None
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)  # type: ignore
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.streaming:
+            return response
+        etag = getattr(self, '_etag', None)
+        if etag is not None:
+            response['ETag'] = etag
+        else:
+            if hasattr(response, 'render'):
+                # handler renders DRF responses later, rendering twice is a no-op
+                response = response.render()
+            set_response_etag(response)
+        return get_conditional_response(request, etag=response.get('ETag'), response=response)
+
+
+class IdempotencyMixin:
+    """
+    `idempotent(request, handler)` runs handler once per Idempotency-Key header of the user
+    and replays its response to retries, see common.idempotency. Requests without the header
+    or of anonymous users and all requests while IDEMPOTENCY_CACHE is not set run as usual.
+    """
+    idempotency_scope: str | None = None
+
+    def idempotent(self, request, handler, *args, **kwargs) -> Response:
+        key = request.headers.get(idempotency.HEADER)
+        if key is None or not request.user.is_authenticated or not idempotency.enabled():
+            return handler(request, *args, **kwargs)
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            return Response({'detail': f'{idempotency.HEADER} must be 1 to {idempotency.MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        cache_key = idempotency.response_key(request.user.pk, self.idempotency_scope or type(self).__name__, key)
+        fingerprint = idempotency.fingerprint(request.method, request.path, request.data)
+        stored = idempotency.lookup_or_lock(cache_key, fingerprint)
+        if stored is not None:
+            return Response(stored.data, status=stored.status, headers={idempotency.REPLAYED_HEADER: 'true'})
+        try:
+            response = handler(request, *args, **kwargs)
+            if response.status_code < status.HTTP_500_INTERNAL_SERVER_ERROR:
+                idempotency.store(cache_key, idempotency.StoredResponse(fingerprint, response.status_code,
+                                                                        response.data))
+            return response
+        finally:
+            idempotency.release(cache_key)
@@ -0,0 +1,158 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """Row count estimated by Postgres planner, costs no scan of the table"""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over keys of all ordering fields and id. Next page is selected with
+    `a > last a OR (a = last a AND b > last b) OR ... (... AND id > last id)` instead of OFFSET,
+    so deep pages cost as much as the first one and stay stable when rows are added.
+    Ordering is taken from the queryset (e.g. set by `order_by` filter), `id` is a tiebreaker
+    following the direction of the first field.
+    Total count is only calculated on request: `count=exact` or `count=estimate`.
+    """
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def requested(cls, request) -> bool:
+        params = request.query_params
+        return params.get(cls.mode_query_param) == cls.mode or cls.cursor_query_param in params
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_cache_params(self, request) -> dict:
+        params = request.query_params
+        return {'pagination': self.mode, 'cursor': params.get(self.cursor_query_param),
+                'limit': self.get_page_size(request), 'count': params.get(self.count_query_param)}
+
+    def decode_cursor(self, request) -> dict | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor.get('r'))
+        except (binascii.Error, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return {'values': values, 'reverse': reverse}
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        values = [getattr(row, field) for field, _ in self.keys]
+        cursor = {'v': [None if value is None else str(value) for value in values], 'r': reverse}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+        return replace_query_param(url, self.mode_query_param, self.mode)
+
+    def get_keys(self, queryset: QuerySet) -> list[tuple[str, bool]]:
+        """(field, descending) of every ordering field, up to id which is unique and closes the key"""
+        keys = []
+        for name in queryset.query.order_by:
+            field = name.lstrip('-')
+            field = 'id' if field == 'pk' else field
+            keys.append((field, name.startswith('-')))
+            if field == 'id':
+                return keys
+        return keys + [('id', bool(keys) and keys[0][1])]
+
+    def after(self, values: list, directions: list[bool]) -> Q:
+        """Rows following key values in the order of keys"""
+        condition, equal = Q(), {}
+        for (field, _), value, descending in zip(self.keys, values, directions):
+            condition |= Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': value})
+            equal[field] = value
+        return condition
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+        cursor = self.decode_cursor(request)
+        self.count = self.get_count(queryset, request)
+
+        reverse = bool(cursor and cursor['reverse'])
+        directions = [descending != reverse for _, descending in self.keys]
+        queryset = queryset.order_by(*(f'{"-" if descending else ""}{field}'
+                                       for (field, _), descending in zip(self.keys, directions)))
+        if cursor:
+            try:
+                values = [queryset.model._meta.get_field(field).to_python(value)
+                          for (field, _), value in zip(self.keys, cursor['values'])]
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(self.after(values, directions))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next = self.previous = None
+        if rows and (has_more or reverse):
+            self.next = self.encode_cursor(rows[-1], reverse=False)
+        if rows and (cursor and not reverse or reverse and has_more):
+            self.previous = self.encode_cursor(rows[0], reverse=True)
+        if cursor and not rows:
+            first_page = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+            self.previous = replace_query_param(first_page, self.mode_query_param, self.mode)
+        return rows
+
+    def get_count(self, queryset: QuerySet, request) -> int | None:
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def get_paginated_response(self, data) -> Response:
+        response = {'next': self.next, 'previous': self.previous, 'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': 'only with count=exact or count=estimate'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
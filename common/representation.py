@@ -0,0 +1,109 @@
+"""
+Representation of list pages straight from values_list() rows.
+
+FieldPlan is compiled once per serializer class: a column and an encoder for every
+readable field, the same value conversions the serializer fields do. Rows encoded
+with it give the same data as serializer(many=True).data on model instances,
+without creating model instances and without per-row serializer field machinery.
+"""
+import decimal
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from common.instrumentation import timed
+
+# fields which represent database values as they are
+IDENTITY_FIELDS = (serializers.IntegerField, serializers.BooleanField, serializers.PrimaryKeyRelatedField)
+
+
+def _decimal_encoder(field: serializers.DecimalField) -> Callable:
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or field.normalize_output or not coerce_to_string or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def encode(value) -> str:
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+
+    return encode
+
+
+def _date_encoder(field: serializers.DateField) -> Callable:
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return lambda value: value if isinstance(value, str) else value.isoformat()
+
+
+def _encoder(field: serializers.Field) -> Callable | None:
+    """None when value is represented as it is"""
+    if isinstance(field, IDENTITY_FIELDS) and getattr(field, 'pk_field', None) is None:
+        return None
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_encoder(field)
+    if isinstance(field, serializers.DateField):
+        return _date_encoder(field)
+    return field.to_representation
+
+
+class FieldPlan:
+    """Columns and encoders of readable serializer fields, see module docstring"""
+
+    def __init__(self, fields: Iterable[tuple[str, str, Callable | None]]):
+        # (output name, model field, encoder)
+        self.fields = tuple(fields)
+        self.columns = tuple(column for _, column, _ in self.fields)
+
+    @classmethod
+    def compile(cls, serializer_class: type[serializers.ModelSerializer]) -> 'FieldPlan | None':
+        """Plan of serializer or None when some of its fields are not plain model fields"""
+        model = serializer_class.Meta.model
+        plan = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.Serializer) or getattr(field, 'many', False) \
+                    or isinstance(field, serializers.ManyRelatedField):
+                return None
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            plan.append((name, field.source, _encoder(field)))
+        return cls(plan)
+
+    def rows(self, queryset: QuerySet, key_fields: Iterable[str] = ('id',)) -> QuerySet:
+        """
+        Named values_list rows of queryset with plan columns. Key fields, e.g. keyset
+        pagination key, and ordering fields are selected as well.
+        """
+        ordering = [name.lstrip('-') for name in queryset.query.order_by]
+        extra = [name for name in (*key_fields, *ordering) if name not in self.columns and name != 'pk']
+        return queryset.values_list(*self.columns, *dict.fromkeys(extra), named=True)
+
+    def encode(self, rows: Iterable[tuple]) -> list[dict]:
+        fields = [(name, index, encoder) for index, (name, _, encoder) in enumerate(self.fields)]
+        with timed('serializer_time'):
+            return [
+                {name: row[index] if encoder is None or row[index] is None else encoder(row[index])
+                 for name, index, encoder in fields}
+                for row in rows
+            ]
+
+
+@lru_cache(maxsize=None)
+def field_plan(serializer_class: type[serializers.ModelSerializer]) -> FieldPlan | None:
+    return FieldPlan.compile(serializer_class)
@@ -0,0 +1,116 @@
+"""
+Routing of reads to read replicas.
+
+Reads go to the primary unless they run inside `replica_reads()`, which views entered
+by safe search and listing requests use (see ReplicaReadMixin). Writes and all other reads,
+e.g. the overlap check of Booking.clean() and room searches stored in the search cache, use
+the primary. Users who changed data recently are pinned to the primary for
+DATABASE_REPLICA_STICKY_SECONDS, so they read their own writes whatever the replication lag.
+Pins are kept in DATABASE_REPLICA_STICKY_CACHE, which must be shared by all workers, or in a signed
+cookie of the client when the cache is not set, so a pin set by one worker is seen by the others.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.http import HttpRequest, HttpResponse
+
+PRIMARY = 'default'
+STICKY_KEY = 'db:primary:user:{}'
+STICKY_COOKIE = 'primary_pin'
+
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases() -> list[str]:
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def in_replica_reads() -> bool:
+    return _replica_reads.get()
+
+
+def start_replica_reads() -> Token:
+    return _replica_reads.set(True)
+
+
+def end_replica_reads(token: Token) -> None:
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        end_replica_reads(token)
+
+
+def _sticky_cache() -> BaseCache | None:
+    alias = getattr(settings, 'DATABASE_REPLICA_STICKY_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _sticky_seconds() -> int:
+    return getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 0)
+
+
+def _sticky_enabled() -> bool:
+    return bool(replica_aliases()) and _sticky_seconds() > 0
+
+
+def _set_sticky_cookie(response: HttpResponse, user_id: int) -> None:
+    response.set_signed_cookie(STICKY_COOKIE, str(user_id), salt=STICKY_COOKIE, max_age=_sticky_seconds(),
+                               httponly=True, samesite='Lax')
+
+
+def pin_to_primary(user_id: int, response: HttpResponse) -> None:
+    """User reads from primary for the sticky window, only matters when replicas are configured"""
+    if not _sticky_enabled():
+        return
+    cache = _sticky_cache()
+    if cache is None:
+        _set_sticky_cookie(response, user_id)
+    else:
+        cache.set(STICKY_KEY.format(user_id), True, timeout=_sticky_seconds())
+
+
+async def apin_to_primary(user_id: int, response: HttpResponse) -> None:
+    if not _sticky_enabled():
+        return
+    cache = _sticky_cache()
+    if cache is None:
+        _set_sticky_cookie(response, user_id)
+    else:
+        await cache.aset(STICKY_KEY.format(user_id), True, timeout=_sticky_seconds())
+
+
+def pinned_to_primary(request: HttpRequest, user_id: int) -> bool:
+    if not replica_aliases():
+        return False
+    cache = _sticky_cache()
+    if cache is None:
+        # signature keeps the time the cookie was set, it is not trusted after the sticky window
+        pin = request.get_signed_cookie(STICKY_COOKIE, None, salt=STICKY_COOKIE, max_age=_sticky_seconds())
+        return pin == str(user_id)
+    return cache.get(STICKY_KEY.format(user_id), False)
+
+
+class ReplicaRouter:
+    """Reads inside replica_reads() go to a random replica, everything else to the primary"""
+
+    def db_for_read(self, model, **hints) -> str:
+        replicas = replica_aliases()
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints) -> str:
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,138 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from booking.models import Booking
+from common import idempotency
+from rooms.models import Room
+
+
+@override_settings(IDEMPOTENCY_CACHE='default')
+class IdempotencyKeyTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.token = Token.objects.create(user=self.user)
+        self.data = {'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-05'}
+
+    def post(self, name: str = 'booking-create', data=None, key: str | None = 'key-1', token: Token | None = None):
+        token = token or self.token
+        headers = {'Authorization': f'Bearer {token.key}'} if token.key else {}
+        if key is not None:
+            headers[idempotency.HEADER] = key
+        return self.client.post(reverse(name), data=data or self.data, content_type='application/json',
+                                headers=headers)
+
+    def test_retry_replays_response_without_queries(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header(idempotency.REPLAYED_HEADER))
+        # token authentication only
+        with self.assertNumQueries(1):
+            retry = self.post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), response.json())
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_requests_without_key_are_not_replayed(self):
+        self.assertEqual(self.post(key=None).status_code, 201)
+        self.assertEqual(self.post(key=None).status_code, 409)
+
+    def test_conflict_is_replayed(self):
+        Booking.objects.create(room=self.room, checkin=date(2024, 3, 2), checkout=date(2024, 3, 3))
+        self.assertEqual(self.post().status_code, 409)
+        Booking.objects.all().delete()
+        self.assertEqual(self.post().status_code, 409)
+
+    def test_key_reused_with_another_payload(self):
+        self.post()
+        response = self.post(data={**self.data, 'checkin': '2024-03-02'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_keys_are_scoped_by_user_and_view(self):
+        self.post()
+        other = get_user_model().objects.create_user(username='other', email='other@email.com')
+        data = {**self.data, 'checkin': '2024-03-10', 'checkout': '2024-03-12'}
+        self.assertEqual(self.post(data=data, token=Token.objects.create(user=other)).status_code, 201)
+        response = self.post('booking-batch', data=[{**self.data, 'checkin': '2024-04-01', 'checkout': '2024-04-02'}])
+        self.assertEqual(response.status_code, 201)
+
+    def test_batch_retry_is_replayed(self):
+        items = [self.data, {**self.data, 'checkin': '2024-03-03'}]
+        response = self.post('booking-batch', data=items)
+        self.assertEqual(response.status_code, 207)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.post('booking-batch', data=items).json(), response.json())
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_invalid_key(self):
+        self.assertEqual(self.post(key='k' * 256).status_code, 400)
+
+    def test_server_error_is_not_stored(self):
+        with mock.patch('booking.views.BookingListCreateAPIView.create_booking', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post()
+        self.assertEqual(self.post().status_code, 201)
+
+    def test_anonymous_requests_are_not_stored(self):
+        self.assertEqual(self.post(token=Token()).status_code, 403)
+        self.assertEqual(self.post().status_code, 201)
+
+    def test_duplicate_in_progress_then_409(self):
+        cache_key = idempotency.response_key(self.user.pk, 'BookingListCreateAPIView', 'key-1')
+        self.assertIsNone(idempotency.lookup_or_lock(cache_key, 'fingerprint'))
+        response = self.post()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Booking.objects.exists())
+        idempotency.release(cache_key)
+        self.assertEqual(self.post().status_code, 201)
+
+    @override_settings(IDEMPOTENCY_CACHE='')
+    def test_key_is_ignored_without_cache(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+@override_settings(IDEMPOTENCY_CACHE='default')
+class ConcurrentDuplicatesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.key = idempotency.response_key(1, 'view', 'key-1')
+
+    def test_duplicate_of_running_request_is_rejected_at_once(self):
+        self.assertIsNone(idempotency.lookup_or_lock(self.key, 'fingerprint'))
+        with self.assertRaises(idempotency.RequestInProgress):
+            idempotency.lookup_or_lock(self.key, 'fingerprint')
+        first = idempotency.StoredResponse('fingerprint', 201, {'id': 1})
+        idempotency.store(self.key, first)
+        idempotency.release(self.key)
+        self.assertEqual(idempotency.lookup_or_lock(self.key, 'fingerprint'), first)
+
+    def test_duplicate_runs_when_first_request_fails(self):
+        self.assertIsNone(idempotency.lookup_or_lock(self.key, 'fingerprint'))
+        idempotency.release(self.key)
+        self.assertIsNone(idempotency.lookup_or_lock(self.key, 'fingerprint'))
+
+    def test_response_stored_before_lock_is_taken_is_replayed(self):
+        first = idempotency.StoredResponse('fingerprint', 201, {'id': 1})
+        real_add = cache.add
+
+        def add(*args, **kwargs):
+            # first request finishes between lookup of the response and the lock
+            idempotency.store(self.key, first)
+            return real_add(*args, **kwargs)
+
+        with mock.patch.object(cache, 'add', side_effect=add):
+            self.assertEqual(idempotency.lookup_or_lock(self.key, 'fingerprint'), first)
+        self.assertIsNone(cache.get(idempotency.LOCK_KEY.format(self.key)))
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from common.instrumentation import track_queries
+from rooms.models import Room
+
+
+class TrackQueriesTestCase(TestCase):
+
+    def test_track_queries_counts_queries_and_time(self):
+        with track_queries() as metrics:
+            list(Room.objects.all())
+            Room.objects.count()
+        self.assertEqual(metrics.queries, 2)
+        self.assertGreater(metrics.db_time, 0)
+
+    def test_track_queries_collects_serializer_time(self):
+        Room.objects.create(room_type=1, spots=1, price=1000)
+        with track_queries() as metrics:
+            self.client.get(reverse('rooms'))
+        self.assertGreater(metrics.serializer_time, 0)
+
+
+class RequestMetricsMiddlewareTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+    def test_sampled_request_has_server_timing_header(self):
+        with self.assertLogs('common.request_metrics', level='INFO') as logs:
+            response = self.client.get(reverse('rooms'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('view;dur=', response['Server-Timing'])
+        self.assertIn('"path": "/api/rooms/"', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_not_sampled_request_has_no_server_timing_header(self):
+        response = self.client.get(reverse('rooms'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0, REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_logged_as_warning(self):
+        with self.assertLogs('common.request_metrics', level='WARNING') as logs:
+            self.client.get(reverse('rooms'))
+        self.assertIn('"slow": true', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+    async def test_sampled_async_request_counts_queries_of_async_orm(self):
+        await Room.objects.acreate(room_type=1, spots=1, price=1000)
+        with self.assertLogs('common.request_metrics', level='INFO'):
+            response = await self.async_client.get(reverse('rooms-async'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
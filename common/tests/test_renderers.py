@@ -0,0 +1,47 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from common import renderers
+from common.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    data = {
+        'id': 1, 'price': '1000.00', 'active': True, 'missing': None, 'ratio': 0.5,
+        'decimal': Decimal('12.50'), 'date': datetime.date(2024, 3, 1),
+        'datetime': datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        'time': datetime.time(9, 15), 'uuid': uuid.UUID(int=1), 'lazy': gettext_lazy('dates are already taken'),
+        'text': 'номер ', 'list': [{'room': 1}, (2, 3)], 4: 'int key', 'big': 2 ** 70,
+    }
+
+    def assertSameAsJSONRenderer(self, data, accepted_media_type=None, renderer_context=None):
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type, renderer_context),
+                         JSONRenderer().render(data, accepted_media_type, renderer_context))
+
+    def test_output_is_the_same_as_of_json_renderer(self):
+        self.assertSameAsJSONRenderer(self.data)
+        self.assertSameAsJSONRenderer([])
+        self.assertSameAsJSONRenderer(None)
+
+    def test_indented_output(self):
+        self.assertSameAsJSONRenderer(self.data, 'application/json; indent=4')
+        self.assertSameAsJSONRenderer(self.data, renderer_context={'indent': 2})
+
+    def test_encodes_with_orjson(self):
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps:
+            FastJSONRenderer().render({'id': 1})
+        dumps.assert_called_once()
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameAsJSONRenderer(self.data)
+
+    def test_unsupported_type_error(self):
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'value': object()})
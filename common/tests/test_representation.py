@@ -0,0 +1,105 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import serializers
+
+from booking.models import Booking, BookingHistory
+from booking.serializers import BookingSerializer
+from booking.views import BookingListCreateAPIView
+from common.representation import FieldPlan, field_plan
+from rooms.models import Room
+from rooms.serializers import RoomSerializer
+from rooms.views import RoomListAPIView
+
+
+class FieldPlanTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        prices = ['0.5', '1', '999.99', '1000', '12345.60', '99999.99']
+        self.rooms = [Room.objects.create(room_type=index % 4 + 1, spots=index, price=Decimal(price))
+                      for index, price in enumerate(prices)]
+        Booking.objects.create(room=self.rooms[0], user=self.user, checkin=date(2024, 2, 28),
+                               checkout=date(2024, 3, 1))
+        Booking.objects.create(room=self.rooms[1], checkin=date(1999, 12, 31), checkout=date(2000, 1, 1), active=False)
+        Booking.objects.create(room=None, user=self.user, checkin=date(2024, 3, 1), checkout=date(2024, 3, 2))
+
+    def test_rooms_encoded_as_serializer(self):
+        plan = field_plan(RoomSerializer)
+        rows = plan.rows(Room.objects.order_by('id'))
+        self.assertEqual(plan.encode(rows), RoomSerializer(Room.objects.order_by('id'), many=True).data)
+
+    def test_bookings_with_nulls_encoded_as_serializer(self):
+        plan = field_plan(BookingSerializer)
+        for queryset in (Booking.objects.order_by('id'), BookingHistory.objects.order_by('id')):
+            self.assertEqual(plan.encode(plan.rows(queryset)), BookingSerializer(queryset, many=True).data)
+
+    def test_decimal_values_are_quantized_as_serializer_field(self):
+        field = serializers.DecimalField(max_digits=7, decimal_places=2)
+        encoder = {name: encoder for name, _, encoder in field_plan(RoomSerializer).fields}['price']
+        for value in (Decimal('1'), Decimal('1.005'), Decimal('1.015'), 3, '2.5', Decimal('-0.001')):
+            self.assertEqual(encoder(value), field.to_representation(value))
+
+    def test_serializer_with_computed_field_has_no_plan(self):
+        class ComputedSerializer(serializers.ModelSerializer):
+            nights = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Booking
+                fields = ('id', 'nights')
+
+        self.assertIsNone(FieldPlan.compile(ComputedSerializer))
+
+
+class ValuesListViewsTestCase(TestCase):
+    """Fast path responses are byte-identical to serialized model instances"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        for index in range(30):
+            room = Room.objects.create(room_type=index % 4 + 1, spots=index % 5 + 1,
+                                       price=Decimal(1000 + index % 7 * 250) + Decimal('0.5') * (index % 2))
+            Booking.objects.create(room=room, user=self.user if index % 3 else None,
+                                   checkin=date(2024, 3, index % 28 + 1), checkout=date(2024, 4, 1),
+                                   active=bool(index % 4))
+        self.client.force_login(self.user)
+
+    def assertSameContent(self, view_class, urls: list[str]):
+        for url in urls:
+            fast = self.client.get(url)
+            with mock.patch.object(view_class, 'values_fast_path', False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content, url)
+
+    def test_room_list_content(self):
+        rooms = reverse('rooms')
+        self.assertSameContent(RoomListAPIView, [
+            rooms, rooms + '?limit=7&offset=5', rooms + '?order_by=-price&price_gte=1250.5',
+            rooms + '?checkin=2024-03-10&checkout=2024-03-12&spots_lte=3', rooms + '?price_gte=100000',
+            rooms + '?pagination=cursor&limit=5&order_by=price&count=exact',
+        ])
+
+    def test_room_list_cursor_pages_content(self):
+        url = reverse('rooms') + '?pagination=cursor&limit=4&order_by=-price'
+        urls = []
+        while url and len(urls) < 10:
+            urls.append(url)
+            url = self.client.get(url).json()['next']
+        self.assertEqual(len(urls), 8)
+        self.assertSameContent(RoomListAPIView, urls)
+
+    def test_booking_list_content(self):
+        bookings = reverse('booking-my')
+        first = self.client.get(bookings + '?pagination=cursor&limit=6').json()
+        self.assertSameContent(BookingListCreateAPIView, [
+            bookings, bookings + '?pagination=cursor&limit=6', first['next'],
+        ])
+
+    def test_room_list_does_not_create_instances(self):
+        with mock.patch.object(Room, '__init__', side_effect=AssertionError):
+            self.assertEqual(self.client.get(reverse('rooms')).status_code, 200)
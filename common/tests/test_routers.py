@@ -0,0 +1,157 @@
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from booking.models import Booking
+from common import routers
+from rooms.models import Room
+
+
+def separate_replica() -> str | None:
+    """First replica with its own test database, see POSTGRES_REPLICA_TEST_MIRROR setting"""
+    for alias in getattr(settings, 'DATABASE_REPLICAS', []):
+        if not settings.DATABASES[alias].get('TEST', {}).get('MIRROR'):
+            return alias
+    return None
+
+
+@override_settings(DATABASE_REPLICAS=['default'], DATABASE_REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTestCase(TestCase):
+    """Replica alias points to the primary, replica reads are seen as calls choosing a replica"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        patcher = mock.patch('common.routers.random.choice', side_effect=lambda aliases: aliases[0])
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_primary_outside_replica_scope(self):
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            self.assertEqual(Room.objects.all().db, 'default')
+            with routers.replica_reads():
+                self.assertEqual(Room.objects.all().db, 'replica')
+                self.assertEqual(routers.ReplicaRouter().db_for_write(Room), 'default')
+            self.assertEqual(Room.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        with routers.replica_reads():
+            self.assertEqual(Room.objects.all().db, 'default')
+        response = HttpResponse()
+        routers.pin_to_primary(self.user.id, response)
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_booking_conflict_check_uses_primary(self):
+        booking = Booking(room=self.room, checkin=date(2024, 3, 1), checkout=date(2024, 3, 2))
+        with routers.replica_reads():
+            booking.clean()
+        self.choose_replica.assert_not_called()
+
+    def test_room_search_reads_from_replica(self):
+        self.assertEqual(self.client.get(reverse('rooms')).status_code, 200)
+        self.choose_replica.assert_called()
+
+    @override_settings(ROOMS_SEARCH_CACHE='default')
+    def test_cached_room_search_reads_from_primary(self):
+        query = '?checkin=2024-03-01&checkout=2024-03-05'
+        self.assertEqual(self.client.get(reverse('rooms') + query).status_code, 200)
+        self.assertEqual(self.client.get(reverse('rooms') + query + '&facets=true').status_code, 200)
+        self.choose_replica.assert_not_called()
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('booking-my'))
+        self.assertTrue(self.choose_replica.called)
+        self.choose_replica.reset_mock()
+
+        response = self.client.post(reverse('booking-create'),
+                                    data={'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-02'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.client.get(reverse('booking-my')).json()), 1)
+        self.client.get(reverse('rooms'))
+        self.choose_replica.assert_not_called()
+
+        self.client.cookies.pop(routers.STICKY_COOKIE)
+        self.client.get(reverse('booking-my'))
+        self.choose_replica.assert_called()
+
+    def test_pin_cookie_is_signed_for_the_user(self):
+        response = HttpResponse()
+        routers.pin_to_primary(self.user.id, response)
+        request = HttpRequest()
+        request.COOKIES[routers.STICKY_COOKIE] = response.cookies[routers.STICKY_COOKIE].value
+        self.assertTrue(routers.pinned_to_primary(request, self.user.id))
+        self.assertFalse(routers.pinned_to_primary(request, self.user.id + 1))
+        request.COOKIES[routers.STICKY_COOKIE] = str(self.user.id)
+        self.assertFalse(routers.pinned_to_primary(request, self.user.id))
+        self.assertEqual(response.cookies[routers.STICKY_COOKIE]['max-age'], 10)
+
+    @override_settings(DATABASE_REPLICA_STICKY_CACHE='default')
+    def test_pins_kept_in_shared_cache(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('booking-create'),
+                                    data={'room': self.room.id, 'checkin': '2024-03-01', 'checkout': '2024-03-02'})
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertTrue(routers.pinned_to_primary(HttpRequest(), self.user.id))
+        self.client.get(reverse('booking-my'))
+        self.choose_replica.assert_not_called()
+
+    def test_token_authenticated_write_pins_user(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.patch(reverse('booking-update', kwargs={'pk': 0}), data={'active': False},
+                                     content_type='application/json', headers={'Authorization': f'Bearer {token.key}'})
+        self.assertEqual(response.cookies[routers.STICKY_COOKIE]['max-age'], 10)
+
+    def test_anonymous_write_pins_nobody(self):
+        response = self.client.post(reverse('booking-create'), data={})
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+@skipUnless(separate_replica(), 'needs a replica with a separate test database')
+class SeparateReplicaDatabaseTestCase(TestCase):
+    """
+    Runs with two databases of a local Postgres server, other test cases do not expect a separate replica:
+    POSTGRES_REPLICA_HOSTS=localhost POSTGRES_REPLICA_DB=replica POSTGRES_REPLICA_TEST_MIRROR=False \
+        python manage.py test common.tests.test_routers
+    """
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.replica = separate_replica()
+        self.user = get_user_model().objects.create_user(username='user', email='user@email.com')
+        get_user_model().objects.using(self.replica).create(id=self.user.id, username='user', email='user@email.com')
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+        Room.objects.using(self.replica).create(id=self.room.id, room_type=1, spots=1, price=1000)
+        # only known to the replica
+        self.replica_room = Room.objects.using(self.replica).create(id=self.room.id + 1000, room_type=2, spots=2,
+                                                                    price=2000)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_primary_only(self):
+        self.assertEqual(self.client.get(reverse('rooms')).json()['count'], 1)
+
+    def test_search_reads_replica(self):
+        response = self.client.get(reverse('rooms'))
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room.id, self.replica_room.id])
+
+    def test_write_and_conflict_check_use_primary_then_reads_stick_to_it(self):
+        Booking.objects.using(self.replica).create(room_id=self.room.id, checkin=date(2024, 3, 1),
+                                                   checkout=date(2024, 3, 5))
+        self.client.force_login(self.user)
+        self.assertEqual(len(self.client.get(reverse('booking-my')).json()), 0)
+        response = self.client.post(reverse('booking-create'),
+                                    data={'room': self.room.id, 'checkin': '2024-03-02', 'checkout': '2024-03-03'})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Booking.objects.using(self.replica).filter(user=self.user).exists())
+        self.assertEqual(len(self.client.get(reverse('booking-my')).json()), 1)
+        self.assertEqual(self.client.get(reverse('rooms')).json()['count'], 1)
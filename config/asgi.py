@@ -2,6 +2,10 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Async views (rooms/async/, bookings/async/) and the availability feed (rooms/stream/, Server-Sent Events)
+run natively on the event loop when served with it:
+
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
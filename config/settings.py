@@ -7,7 +7,7 @@ SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 
 DEBUG = os.getenv('DJANGO_DEBUG', 'False') == 'True'
 
-ALLOWED_HOSTS: list = []
+ALLOWED_HOSTS: list = [host for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 if DEBUG:
     INTERNAL_IPS = type('c', (), {'__contains__': lambda *a: True})()
@@ -19,9 +19,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'drf_yasg',
-    'debug_toolbar',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -41,9 +41,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly'
     ],
+
+    # orjson based renderer falls back to rest_framework.renderers.JSONRenderer without orjson installed
+    'DEFAULT_RENDERER_CLASSES': [
+        os.getenv('DJANGO_JSON_RENDERER', 'common.renderers.FastJSONRenderer'),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 MIDDLEWARE = [
+    'common.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,9 +58,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'common.middleware.PrimaryStickinessMiddleware',
 ]
 
+# toolbar middleware is sync only, under ASGI it would move every request to a thread
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -81,6 +93,57 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
+        'PORT': os.getenv('POSTGRES_PORT', ''),
+        # Connections are kept for CONN_MAX_AGE seconds (0 closes them after every request) and checked
+        # before reuse. Django 5.0 has no connection pool, put pgbouncer in front of Postgres instead.
+        # Under ASGI every request runs in a thread context of its own and persistent connections pile up,
+        # so they are kept only by the WSGI entrypoint (config.wsgi sets 60 seconds unless the variable is set)
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': os.getenv('POSTGRES_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # pgbouncer in transaction pooling mode: cursors outside of a transaction can not outlive it
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('POSTGRES_PGBOUNCER', 'False') == 'True',
+    }
+}
+
+# Read replicas as comma separated host[:port] list, all with POSTGRES_REPLICA_DB database (POSTGRES_DB by default).
+# Tests run replicas as mirrors of default database unless POSTGRES_REPLICA_TEST_MIRROR=False,
+# which creates separate test databases, e.g. two databases of a local server
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('POSTGRES_REPLICA_DB', DATABASES['default']['NAME']),
+        'HOST': host,
+        'PORT': port,
+        'TEST': {'MIRROR': 'default'} if os.getenv('POSTGRES_REPLICA_TEST_MIRROR', 'True') == 'True' else {},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['common.routers.ReplicaRouter']
+
+# Users who changed data read from the primary for this number of seconds. Pins are kept in the cache alias,
+# which must be shared by all workers (Redis, Memcached), or in a signed cookie of the client when it is empty
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', 10))
+DATABASE_REPLICA_STICKY_CACHE = os.getenv('DATABASE_REPLICA_STICKY_CACHE', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'common.request_metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'booking.intervals': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'rooms.feed': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
     }
 }
 
@@ -112,3 +175,62 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# default: overlaps checked by Booking.clean() before saving,
+# exclusion: overlaps rejected by GiST exclusion constraint (requires btree_gist extension). The constraint is created
+# by migrations with either engine, the setting only chooses how bookings are saved
+BOOKING_ENGINE = os.getenv('BOOKING_ENGINE', 'default')
+
+# Monthly bitmaps of booked nights of every room for availability search, rebuilt by rebuild_availability_index
+# command. Rows belong to one room, so writes of bookings of different rooms do not wait for each other
+BOOKING_AVAILABILITY_INDEX = os.getenv('BOOKING_AVAILABILITY_INDEX', 'False') == 'True'
+
+# In-memory interval engine of every worker: loaded from the snapshot file written by snapshot_bookings command
+# and kept up to date from the booking change feed, searches use SQL while it is behind for more than MAX_LAG seconds.
+# Feed rows are kept for RETENTION hours, older snapshots are not loaded
+BOOKING_INTERVAL_ENGINE = os.getenv('BOOKING_INTERVAL_ENGINE', 'False') == 'True'
+BOOKING_INTERVAL_SNAPSHOT = os.getenv('BOOKING_INTERVAL_SNAPSHOT', str(BASE_DIR / 'booking_intervals.snapshot'))
+BOOKING_INTERVAL_POLL_SECONDS = float(os.getenv('BOOKING_INTERVAL_POLL_SECONDS', 1))
+BOOKING_INTERVAL_MAX_LAG_SECONDS = float(os.getenv('BOOKING_INTERVAL_MAX_LAG_SECONDS', 10))
+BOOKING_CHANGE_FEED_RETENTION_HOURS = int(os.getenv('BOOKING_CHANGE_FEED_RETENTION_HOURS', 24))
+
+# Holds take rooms for this number of seconds, expired holds are deleted by sweep_holds command
+BOOKING_HOLD_SECONDS = int(os.getenv('BOOKING_HOLD_SECONDS', 900))
+
+# Bookings with checkout more than this number of days ago are moved to archive by archive_bookings command
+BOOKING_ARCHIVE_AFTER_DAYS = int(os.getenv('BOOKING_ARCHIVE_AFTER_DAYS', 30))
+
+# Cache alias for room search results, empty value disables the cache. The alias must be shared by all workers
+# (Redis, Memcached): versions bumped in a per-process cache such as LocMemCache leave other workers stale results
+ROOMS_SEARCH_CACHE = os.getenv('ROOMS_SEARCH_CACHE', '')
+ROOMS_SEARCH_CACHE_TIMEOUT = int(os.getenv('ROOMS_SEARCH_CACHE_TIMEOUT', 300))
+
+# Availability change feed (/api/rooms/stream/, ASGI only), off by default: writes of bookings, holds and rooms
+# publish changes only when it is on. Changes are sent with Postgres NOTIFY to every process
+# (LISTEN connection must bypass pgbouncer in transaction pooling mode), ROOMS_FEED_NOTIFY=False keeps them to
+# subscribers of the process which made them, for a single process only. Subscriber falling QUEUE_SIZE events behind
+# is sent a reset event
+ROOMS_FEED = os.getenv('ROOMS_FEED', 'False') == 'True'
+ROOMS_FEED_NOTIFY = os.getenv('ROOMS_FEED_NOTIFY', 'True') == 'True'
+ROOMS_FEED_QUEUE_SIZE = int(os.getenv('ROOMS_FEED_QUEUE_SIZE', 1000))
+ROOMS_FEED_HEARTBEAT_SECONDS = float(os.getenv('ROOMS_FEED_HEARTBEAT_SECONDS', 15))
+
+# Share of requests instrumented with query counts and Server-Timing header, from 0 to 1
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SAMPLE_RATE', 0))
+REQUEST_METRICS_SLOW_MS = float(os.getenv('REQUEST_METRICS_SLOW_MS', 1000))
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True') == 'True'
+
+# Responses of requests with Idempotency-Key header are replayed to retries for TTL seconds, duplicates arriving
+# while the first request runs get 409. Cache alias must be shared by all workers (Redis, Memcached), a per-process
+# cache such as LocMemCache lets retries reaching another worker run again. Empty value ignores the header
+IDEMPOTENCY_CACHE = os.getenv('IDEMPOTENCY_CACHE', '')
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 30))
+
+# In-process LRU of authenticated tokens, 0 (default) disables the cache, entries live for TTL seconds. Logout,
+# token deletion and user changes drop entries of the current process only, other workers keep accepting
+# a revoked token for up to TTL seconds. Cache alias for tokens shared between processes, empty value keeps
+# the cache in process only
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 0))
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_CACHE = os.getenv('TOKEN_AUTH_CACHE', '')
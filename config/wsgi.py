@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# sync workers reuse database connections between requests, ASGI (config.asgi) closes them after every request
+os.environ.setdefault('POSTGRES_CONN_MAX_AGE', '60')
 
 application = get_wsgi_application()
@@ -0,0 +1,140 @@
+"""
+Versioned cache of room search results.
+
+Cache key consists of normalized RoomFilter and pagination params and of
+version counters the result depends on: rooms version, bumped by any Room
+change, and one version per month of the requested stay, bumped by Booking
+changes in that month. Writes therefore invalidate only searches they can affect.
+
+Versions are bumped after the write commits: a search running before that reads the rows
+of the previous version and must not cache them under the new one. Live holds stop taking
+rooms when they expire, without a write, so results of a stay are cached no longer than
+until the first hold of the stay expires. That expiry is kept with the result and is a part
+of its ETag, so a result computed after the hold expired never gets the ETag of the one before.
+
+The cache alias must be shared by all processes serving searches, e.g. Redis or Memcached:
+versions bumped in a per-process cache do not invalidate results cached by other processes.
+"""
+import datetime
+import hashlib
+import json
+import math
+import time
+from collections.abc import Iterable
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from booking.models import Hold
+
+ROOMS_VERSION_KEY = 'rooms:search:v:rooms'
+MONTH_VERSION_KEY = 'rooms:search:v:{:%Y-%m}'
+RESULT_KEY = 'rooms:search:{}'
+
+
+def get_cache() -> BaseCache | None:
+    alias = getattr(settings, 'ROOMS_SEARCH_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def stay_months(checkin: datetime.date, checkout: datetime.date) -> list[datetime.date]:
+    """First days of months which contain nights between checkin and checkout"""
+    months = []
+    month = checkin.replace(day=1)
+    while month < checkout:
+        months.append(month)
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _new_version() -> int:
+    # Time based initial value never repeats a version which was evicted from cache
+    return time.time_ns()
+
+
+def _bump(cache: BaseCache, keys: Iterable[str]) -> None:
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def _bump_on_commit(cache: BaseCache, keys: list[str], using: str | None) -> None:
+    """Bumps versions once the current transaction of `using` database commits, at once outside of it"""
+    transaction.on_commit(lambda: _bump(cache, keys), using=using)
+
+
+def bump_rooms_version(using: str | None = None) -> None:
+    cache = get_cache()
+    if cache is not None:
+        _bump_on_commit(cache, [ROOMS_VERSION_KEY], using)
+
+
+def bump_stay_versions(stays: Iterable[tuple[datetime.date, datetime.date]], using: str | None = None) -> None:
+    cache = get_cache()
+    if cache is None:
+        return
+    months = {month for checkin, checkout in stays for month in stay_months(checkin, checkout)}
+    if months:
+        _bump_on_commit(cache, [MONTH_VERSION_KEY.format(month) for month in sorted(months)], using)
+
+
+def get_versions(cache: BaseCache, keys: list[str]) -> list[int]:
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    for key, version in missing.items():
+        if not cache.add(key, version, timeout=None):
+            missing[key] = cache.get(key, version)
+    versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _normalize(value) -> str:
+    # 1000 and 1000.00 are the same price filter
+    return str(value.normalize()) if isinstance(value, Decimal) else str(value)
+
+
+def search_key(params: dict, stay: tuple[datetime.date, datetime.date] | None) -> str | None:
+    """Result cache key for normalized search params or None when cache is disabled"""
+    cache = get_cache()
+    if cache is None:
+        return None
+    version_keys = [ROOMS_VERSION_KEY]
+    if stay:
+        version_keys += [MONTH_VERSION_KEY.format(month) for month in stay_months(*stay)]
+    payload = json.dumps([sorted(params.items()), get_versions(cache, version_keys)], default=_normalize)
+    return RESULT_KEY.format(hashlib.sha1(payload.encode()).hexdigest())
+
+
+def get_result(key: str) -> tuple | None:
+    """(data, expiry) of a cached result, see set_result()"""
+    return get_cache().get(key)
+
+
+def result_expiry(stay: tuple[datetime.date, datetime.date] | None) -> datetime.datetime | None:
+    """Expiry of the first live hold of the stay, the result of the stay changes with it"""
+    if not stay:
+        return None
+    return Hold.objects.get_intersections(*stay).aggregate(first=Min('expires_at'))['first']
+
+
+def result_timeout(expiry: datetime.datetime | None) -> int:
+    """Cache timeout of a result, stay results expire along with the first live hold of the stay"""
+    timeout = getattr(settings, 'ROOMS_SEARCH_CACHE_TIMEOUT', 300)
+    if expiry is not None:
+        timeout = min(timeout, max(math.ceil((expiry - timezone.now()).total_seconds()), 1))
+    return timeout
+
+
+def set_result(key: str, data, expiry: datetime.datetime | None) -> None:
+    get_cache().set(key, (data, expiry), timeout=result_timeout(expiry))
+
+
+def result_etag(key: str, expiry: datetime.datetime | None, media_type: str) -> str:
+    """ETag of the result of key, valid until expiry, rendered as media_type"""
+    return '"{}"'.format(hashlib.sha1(f'{key} {expiry and expiry.isoformat()} {media_type}'.encode()).hexdigest())
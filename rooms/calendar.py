@@ -0,0 +1,58 @@
+import datetime
+from itertools import groupby
+
+from django.db.models import QuerySet
+
+from booking.models import Booking
+
+
+def _merged_stays(bookings) -> list[tuple[int, datetime.date, datetime.date]]:
+    """Merges overlapping bookings and holds of the same room, so every taken night is counted once"""
+    merged = []
+    for room_id, stays in groupby(sorted(bookings), key=lambda booking: booking[0]):
+        current = None
+        for _, checkin, checkout in stays:
+            if current and checkin <= current[2]:
+                current[2] = max(current[2], checkout)
+                continue
+            if current:
+                merged.append(tuple(current))
+            current = [room_id, checkin, checkout]
+        merged.append(tuple(current))
+    return merged
+
+
+def availability_calendar(
+        rooms: QuerySet,
+        start: datetime.date,
+        end: datetime.date,
+        with_ids: bool = False
+) -> list[dict]:
+    """
+    Per-day count of free rooms (and optionally their ids) for nights between start and end.
+    Bookings and live holds intersecting the window are fetched with one query and swept in memory:
+    every stay adds +1 at its first night and -1 after the last one.
+    """
+    room_ids = list(rooms.values_list('id', flat=True))
+    bookings = Booking.objects.get_taken(start, end, rooms.values('id'))
+
+    days = (end - start).days
+    delta = [0] * (days + 1)
+    booked_ids: list[set[int]] = [set() for _ in range(days)] if with_ids else []
+    for room_id, checkin, checkout in _merged_stays(bookings):
+        first = max((checkin - start).days, 0)
+        last = min((checkout - start).days, days)
+        delta[first] += 1
+        delta[last] -= 1
+        for day in range(first, last) if with_ids else ():
+            booked_ids[day].add(room_id)
+
+    calendar = []
+    booked = 0
+    for day in range(days):
+        booked += delta[day]
+        entry = {'date': start + datetime.timedelta(days=day), 'free': len(room_ids) - booked}
+        if with_ids:
+            entry['rooms'] = [room_id for room_id in room_ids if room_id not in booked_ids[day]]
+        calendar.append(entry)
+    return calendar
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import QuerySet
+
+# GROUPING(room_type, spots, bucket) of each grouping set, bit is set for columns not grouped by
+FACET_SETS = {
+    0b011: 'room_type',
+    0b101: 'spots',
+    0b110: 'price',
+    0b111: 'count',
+}
+
+
+def room_facets(rooms: QuerySet, price_bucket: Decimal) -> dict:
+    """
+    Number of rooms by room type, by spots and by price bucket of `price_bucket` width, and their total.
+    All facets come from one aggregate query over filtered rooms with GROUPING SETS.
+    """
+    sql, params = rooms.order_by().values('room_type', 'spots', 'price').query.sql_with_params()
+    facets_sql = f'''
+        SELECT GROUPING(room_type, spots, bucket), room_type, spots, bucket, count(*)
+          FROM (SELECT room_type, spots, floor(price / %s)::integer AS bucket FROM ({sql}) filtered) rooms
+         GROUP BY GROUPING SETS ((room_type), (spots), (bucket), ())
+    '''
+    with connections[rooms.db].cursor() as cursor:
+        cursor.execute(facets_sql, (price_bucket, *params))
+        rows = cursor.fetchall()
+
+    facets: dict = {'count': 0, 'room_type': [], 'spots': [], 'price': []}
+    for grouping, room_type, spots, bucket, count in rows:
+        facet = FACET_SETS[grouping]
+        if facet == 'count':
+            facets['count'] = count
+        elif facet == 'price':
+            facets['price'].append({'min': bucket * price_bucket, 'max': (bucket + 1) * price_bucket,
+                                    'count': count})
+        else:
+            facets[facet].append({'value': room_type if facet == 'room_type' else spots, 'count': count})
+    for facet in ('room_type', 'spots'):
+        facets[facet].sort(key=lambda entry: entry['value'])
+    facets['price'].sort(key=lambda entry: entry['min'])
+    return facets
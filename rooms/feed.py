@@ -0,0 +1,341 @@
+"""
+Availability change feed of room search clients, served as Server-Sent Events by
+RoomAvailabilityStreamView under ASGI.
+
+Writes of bookings, holds and rooms publish changes: a room booked or freed for a stay,
+a room created or changed (price, spots) and a room deleted. Changes are sent with Postgres
+NOTIFY, which is delivered on commit, and a thread of every process serving subscribers
+LISTENs for them on a connection of its own, so subscribers see writes of every process,
+the hold sweeper command included. Subscribers get a `reset` event when the listener
+reconnects, as notifications sent meanwhile are lost.
+
+The broker of the process hands changes to event loops of its subscriptions. Every loop loads
+price and spots of the changed rooms with one query and fans them out to subscriptions whose
+date window and price/spots filters they match, so neither the listener nor a writer waits
+for the matching. Every subscription is a bounded asyncio queue, so an idle subscriber costs
+a waiting coroutine, not a thread or a database connection. A subscriber which falls
+ROOMS_FEED_QUEUE_SIZE events behind gets a `reset` event instead of the missed ones and should
+search again.
+
+The feed is off unless ROOMS_FEED is set, writes publish nothing then and the stream view
+answers 501, so deployments without ASGI subscribers pay nothing for it.
+
+With ROOMS_FEED_NOTIFY=False changes are dispatched after commit to the broker of the writing
+process only, which fits a single process serving both writes and subscribers.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from rooms.models import Room
+
+logger = logging.getLogger(__name__)
+
+BOOKED, FREED, CHANGED, DELETED = 'booked', 'freed', 'changed', 'deleted'
+# changes of rooms themselves are sent to every subscriber, client applies its filters to them
+ROOM_EVENTS = (CHANGED, DELETED)
+RESET = b'event: reset\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+CHANNEL = 'rooms_availability'
+# NOTIFY payload is limited to 8000 bytes
+NOTIFY_BATCH = 100
+
+
+def feed_enabled() -> bool:
+    return getattr(settings, 'ROOMS_FEED', False)
+
+
+def _notify_enabled() -> bool:
+    return getattr(settings, 'ROOMS_FEED_NOTIFY', True)
+
+
+def _queue_size() -> int:
+    return getattr(settings, 'ROOMS_FEED_QUEUE_SIZE', 1000)
+
+
+def heartbeat_seconds() -> float:
+    return getattr(settings, 'ROOMS_FEED_HEARTBEAT_SECONDS', 15)
+
+
+@dataclass(frozen=True)
+class Change:
+    event: str
+    room: int
+    checkin: datetime.date | None = None
+    checkout: datetime.date | None = None
+
+
+@dataclass
+class Event:
+    """Change with price and spots of its room, None when the room is gone"""
+    change: Change
+    price: Decimal | None
+    spots: int | None
+
+    @cached_property
+    def message(self) -> bytes:
+        """Encoded once, the same bytes are queued for every subscriber"""
+        data = {'room': self.change.room}
+        if self.change.checkin is not None:
+            data.update(checkin=self.change.checkin.isoformat(), checkout=self.change.checkout.isoformat())
+        if self.price is not None:
+            data.update(price=str(self.price), spots=self.spots)
+        return f'event: {self.change.event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+@dataclass(eq=False)
+class Subscription:
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue
+    checkin: datetime.date | None = None
+    checkout: datetime.date | None = None
+    price_gte: Decimal | None = None
+    price_lte: Decimal | None = None
+    spots_gte: int | None = None
+    spots_lte: int | None = None
+
+    def matches(self, event: Event) -> bool:
+        change = event.change
+        if change.event in ROOM_EVENTS:
+            return True
+        if self.checkin is not None and change.checkout <= self.checkin:
+            return False
+        if self.checkout is not None and change.checkin >= self.checkout:
+            return False
+        if event.price is None:
+            # room was deleted, its own event follows
+            return False
+        return (self.price_gte is None or event.price >= self.price_gte) \
+            and (self.price_lte is None or event.price <= self.price_lte) \
+            and (self.spots_gte is None or event.spots >= self.spots_gte) \
+            and (self.spots_lte is None or event.spots <= self.spots_lte)
+
+    def put(self, messages: list[bytes]) -> None:
+        """Runs on the loop of subscription, missed messages of an overflowing queue are replaced by reset"""
+        for message in messages:
+            try:
+                self.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(RESET)
+                return
+
+
+class Broker:
+    """Subscriptions of the process, see module docstring"""
+
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+        # deliveries running on event loops, referenced until done
+        self._deliveries: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, **filters) -> Subscription:
+        """Subscription of the running event loop, filters are Subscription fields"""
+        subscription = Subscription(asyncio.get_running_loop(), asyncio.Queue(max(_queue_size(), 1)), **filters)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        if _notify_enabled():
+            start_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _loop_subscriptions(self) -> dict[asyncio.AbstractEventLoop, list[Subscription]]:
+        by_loop = defaultdict(list)
+        with self._lock:
+            for subscription in self._subscriptions:
+                by_loop[subscription.loop].append(subscription)
+        return by_loop
+
+    def dispatch(self, changes: Iterable[Change]) -> None:
+        """
+        Hands changes to every event loop with subscriptions, which delivers them to its subscribers.
+        Runs in sync code of any thread, e.g. after commit of a write, at the cost of one call per loop.
+        """
+        changes = list(changes)
+        if not changes:
+            return
+        for loop, subscriptions in self._loop_subscriptions().items():
+            try:
+                loop.call_soon_threadsafe(self._start_delivery, changes)
+            except RuntimeError:
+                # loop is closed, its subscribers are gone
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+    def reset(self) -> None:
+        """Sends reset to every subscriber, e.g. when changes may have been lost"""
+        for loop, subscriptions in self._loop_subscriptions().items():
+            try:
+                loop.call_soon_threadsafe(_reset, subscriptions)
+            except RuntimeError:
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+    def _start_delivery(self, changes: list[Change]) -> None:
+        task = asyncio.get_running_loop().create_task(self.deliver(changes))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def deliver(self, changes: list[Change]) -> int:
+        """
+        Queues changes to matching subscriptions of the running loop, returns number of queued messages.
+        Subscribers are reset when the rooms of the changes can not be loaded.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.loop is loop]
+        if not subscriptions:
+            return 0
+        try:
+            attributes = await sync_to_async(_room_attributes)({change.room for change in changes})
+        except Exception:
+            logger.exception('availability feed could not load rooms, subscribers are reset')
+            await sync_to_async(connections.close_all)()
+            _reset(subscriptions)
+            return 0
+        events = [Event(change, *attributes.get(change.room, (None, None))) for change in changes]
+        queued = 0
+        for subscription in subscriptions:
+            messages = [event.message for event in events if subscription.matches(event)]
+            if messages:
+                subscription.put(messages)
+                queued += len(messages)
+        return queued
+
+    async def wait_delivered(self) -> None:
+        """Waits for deliveries handed to the running loop by now"""
+        # deliveries handed over by other threads start with the next iteration of the loop
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[task for task in self._deliveries if task.get_loop() is loop])
+
+
+def _room_attributes(room_ids: set[int]) -> dict[int, tuple[Decimal, int]]:
+    rooms = Room.objects.filter(id__in=room_ids).values_list('id', 'price', 'spots')
+    return {room_id: (price, spots) for room_id, price, spots in rooms}
+
+
+def _reset(subscriptions: list[Subscription]) -> None:
+    for subscription in subscriptions:
+        subscription.put([RESET])
+
+
+broker = Broker()
+
+
+def publish(changes: Iterable[Change], using: str | None = None) -> None:
+    """Publishes changes of the current transaction of `using` database once it commits"""
+    using = using or DEFAULT_DB_ALIAS
+    if not feed_enabled():
+        return
+    changes = [change for change in changes if change.room is not None]
+    if not changes:
+        return
+    if _notify_enabled():
+        payloads = [_encode(changes[start:start + NOTIFY_BATCH]) for start in range(0, len(changes), NOTIFY_BATCH)]
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) payload', [CHANNEL, payloads])
+    elif len(broker):
+        transaction.on_commit(lambda: broker.dispatch(changes), using=using)
+
+
+def _encode(changes: list[Change]) -> str:
+    return json.dumps([
+        [change.event, change.room, change.checkin and change.checkin.isoformat(),
+         change.checkout and change.checkout.isoformat()]
+        for change in changes
+    ])
+
+
+def _decode(payload: str) -> list[Change]:
+    return [
+        Change(event, room, checkin and datetime.date.fromisoformat(checkin),
+               checkout and datetime.date.fromisoformat(checkout))
+        for event, room, checkin, checkout in json.loads(payload)
+    ]
+
+
+_listener: threading.Thread | None = None
+_listener_lock = threading.Lock()
+_stopping = threading.Event()
+# set while the listener connection LISTENs
+listening = threading.Event()
+# seconds the listener waits for notifications before checking whether it is stopped
+LISTEN_TIMEOUT = 1
+
+
+def start_listener() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _stopping.clear()
+            _listener = threading.Thread(target=_listen, name='rooms-feed-listener', daemon=True)
+            _listener.start()
+
+
+def stop_listener(timeout: float = 5) -> None:
+    """Stops listener thread of the process and closes its connections"""
+    global _listener
+    with _listener_lock:
+        thread, _listener = _listener, None
+    if thread is not None:
+        _stopping.set()
+        thread.join(timeout)
+
+
+def _listen() -> None:
+    """Listens until stopped, reconnects after errors"""
+    reconnecting = False
+    while not _stopping.is_set():
+        try:
+            _listen_connection(reconnecting)
+        except Exception:
+            logger.exception('availability feed listener failed, reconnecting')
+            _stopping.wait(1)
+        reconnecting = True
+
+
+def _listen_connection(reconnecting: bool) -> None:
+    database = connections[DEFAULT_DB_ALIAS]
+    # a connection of its own, not one of the thread, stays out of transactions and connection pooling
+    listener = database.get_new_connection(database.get_connection_params())
+    try:
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        listening.set()
+        if reconnecting:
+            # notifications sent while the listener was away are lost
+            broker.reset()
+        while not _stopping.is_set():
+            if not select.select([listener], [], [], LISTEN_TIMEOUT)[0]:
+                continue
+            listener.poll()
+            changes = []
+            while listener.notifies:
+                changes += _decode(listener.notifies.pop(0).payload)
+            if changes:
+                broker.dispatch(changes)
+    finally:
+        listening.clear()
+        listener.close()
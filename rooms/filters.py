@@ -4,7 +4,8 @@ import django_filters
 from django.db.models import QuerySet
 from rest_framework.exceptions import ValidationError
 
-from booking.models import Booking
+from booking import availability, intervals
+from booking.models import Booking, Hold
 from rooms.models import Room
 
 
@@ -17,9 +18,8 @@ class RoomFilter(django_filters.FilterSet):
     checkin = django_filters.DateFilter(method='get_available_rooms', field_name='available_rooms', )
     checkout = django_filters.DateFilter(method='get_available_rooms', field_name='available_rooms', )
 
-    def get_available_rooms(self, qs, *args) -> QuerySet:
+    def get_stay_dates(self) -> tuple[date, date]:
         """
-        A method to filter available rooms based on check-in and check-out query params.
         Firstly we check if check-in param is in the request. If it is convert
         string to a datetime object - otherwise, set today's date as the check-in date.
         Then try to parse check-out date, but if it is not found, set check-in + 1 day as the default value.
@@ -36,11 +36,25 @@ class RoomFilter(django_filters.FilterSet):
             raise ValidationError('checkout date can not be equal to checkin date')
         elif checkin > checkout:
             raise ValidationError('checkin date cant be lower than checkout date')
+        return checkin, checkout
+
+    def get_available_rooms(self, qs, *args) -> QuerySet:
+        """
+        A method to filter available rooms based on check-in and check-out query params.
+        Rooms of live holds are taken as well, holds are few and short-lived, so they are always read from SQL.
+        """
+        checkin, checkout = self.get_stay_dates()
+        qs = qs.exclude(id__in=Hold.objects.get_intersections(checkin, checkout).values('room'))
+
+        engine = intervals.read_engine(checkin)
+        if engine is not None:
+            return qs.exclude(id__in=engine.booked_room_ids(checkin, checkout))
+
+        if availability.index_enabled():
+            return qs.exclude(id__in=availability.booked_room_ids(checkin, checkout))
 
         booked_rooms_ids = Booking.objects.get_intersections(checkin, checkout).values('room')
-        if booked_rooms_ids:
-            qs = qs.exclude(id__in=booked_rooms_ids)
-        return qs
+        return qs.exclude(id__in=booked_rooms_ids)
 
     order_by = django_filters.OrderingFilter(
         fields=(
@@ -56,3 +70,10 @@ class RoomFilter(django_filters.FilterSet):
     class Meta:
         model = Room
         fields = ['price_gte', 'price_lte', 'spots_gte', 'spots_lte']
+
+
+class RoomCalendarFilter(RoomFilter):
+    """Price and spots filters of RoomFilter, dates are given by calendar window"""
+    checkin = None
+    checkout = None
+    order_by = None
@@ -1,7 +1,7 @@
 import datetime
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, router
 
 
 class Room(models.Model):
@@ -19,8 +19,12 @@ class Room(models.Model):
         return f'Номер {self.room_type} класса на {self.spots} мест'
 
     def delete(self, using=None, keep_parents=False):
-        active_bookings = self.bookings.filter(active=True, checkout__gt=datetime.date.today())
-        if active_bookings.exists():
+        # booking models import this one
+        from booking.models import Booking
+
+        taken = Booking.objects.db_manager(using or router.db_for_write(Room, instance=self)).get_taken(
+            datetime.date.today(), datetime.date.max, [self.pk])
+        if taken.exists():
             raise ValidationError('Нельзя удалить комнаты брони которых активны и дата выезда больше текущей!')
         super().delete(using, keep_parents)
 
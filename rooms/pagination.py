@@ -1,7 +1,28 @@
 from rest_framework.pagination import LimitOffsetPagination
 
+from common.pagination import KeysetPagination
+
 
 class RoomsPagination(LimitOffsetPagination):
 
     default_limit = 20
     max_limit = 100
+
+    def get_cache_params(self, request) -> dict:
+        return {'limit': self.get_limit(request), 'offset': self.get_offset(request)}
+
+    async def apaginate_queryset(self, queryset, request) -> list:
+        """paginate_queryset for ASGI views, count and page are fetched with async ORM"""
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = await queryset.acount()
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [obj async for obj in queryset[self.offset:self.offset + self.limit].aiterator()]
+
+
+class RoomsKeysetPagination(KeysetPagination):
+
+    page_size = 20
+    max_page_size = 100
@@ -1,9 +1,75 @@
+import datetime
+from decimal import Decimal
+
 from rest_framework import serializers
 
+from common.instrumentation import InstrumentedSerializerMixin
 from rooms.models import Room
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Room
-        fields = '__all__'
+        fields = ('id', 'room_type', 'spots', 'price')
+
+
+class CalendarQuerySerializer(serializers.Serializer):
+    max_days = 92
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    ids = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('start', datetime.date.today())
+        attrs.setdefault('end', attrs['start'] + datetime.timedelta(days=30))
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError('end date must be later than start date')
+        if (attrs['end'] - attrs['start']).days > self.max_days:
+            raise serializers.ValidationError(f'calendar window can not be longer than {self.max_days} days')
+        return attrs
+
+
+class CalendarDaySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    free = serializers.IntegerField()
+    rooms = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class FacetsQuerySerializer(serializers.Serializer):
+    facets = serializers.BooleanField(required=False, default=False)
+    price_bucket = serializers.DecimalField(max_digits=7, decimal_places=2, min_value=Decimal(1),
+                                            required=False, default=Decimal(1000))
+
+
+class FacetCountSerializer(serializers.Serializer):
+    value = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    min = serializers.DecimalField(max_digits=9, decimal_places=2)
+    max = serializers.DecimalField(max_digits=9, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class RoomFacetsSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    room_type = FacetCountSerializer(many=True)
+    spots = FacetCountSerializer(many=True)
+    price = PriceBucketSerializer(many=True)
+
+
+class AvailabilityStreamQuerySerializer(serializers.Serializer):
+    """Date window and RoomFilter price and spots filters of availability feed subscription"""
+    checkin = serializers.DateField(required=False, default=None)
+    checkout = serializers.DateField(required=False, default=None)
+    price_gte = serializers.DecimalField(max_digits=9, decimal_places=2, required=False, default=None)
+    price_lte = serializers.DecimalField(max_digits=9, decimal_places=2, required=False, default=None)
+    spots_gte = serializers.IntegerField(required=False, default=None)
+    spots_lte = serializers.IntegerField(required=False, default=None)
+
+    def validate(self, attrs):
+        if attrs['checkin'] and attrs['checkout'] and attrs['checkout'] <= attrs['checkin']:
+            raise serializers.ValidationError('checkout date must be later than checkin date')
+        return attrs
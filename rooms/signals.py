@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rooms import cache as search_cache
+from rooms import feed
+from rooms.models import Room
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_search_cache(sender, using: str = None, **kwargs) -> None:
+    search_cache.bump_rooms_version(using)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance: Room, raw: bool = False, using: str = None, **kwargs) -> None:
+    if not raw:
+        feed.publish([feed.Change(feed.CHANGED, instance.pk)], using)
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance: Room, using: str = None, **kwargs) -> None:
+    feed.publish([feed.Change(feed.DELETED, instance.pk)], using)
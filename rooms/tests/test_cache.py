@@ -0,0 +1,174 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.models import Booking, Hold
+from rooms import cache as search_cache
+from rooms.models import Room
+
+
+class SearchCacheMixin:
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def write(self, action, *args, **kwargs):
+        """Versions are bumped after commit of the write"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+
+@override_settings(ROOMS_SEARCH_CACHE='default')
+class RoomsSearchCacheTestCase(SearchCacheMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=2000)
+
+    def room_ids(self, query: str = '') -> list[int]:
+        response = self.client.get(reverse('rooms') + query)
+        self.assertEqual(response.status_code, 200)
+        return [room['id'] for room in response.json()['results']]
+
+    def test_repeated_search_served_from_cache(self):
+        self.room_ids('?price_gte=1000')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.room_ids('?price_gte=1000'), [self.room1.id, self.room2.id])
+
+    def test_equal_params_share_cache_entry(self):
+        self.room_ids('?price_gte=1000&order_by=price')
+        with self.assertNumQueries(0):
+            self.room_ids('?order_by=price&price_gte=1000.00&unknown=1')
+
+    def test_different_pagination_not_shared(self):
+        self.room_ids('?limit=1')
+        self.assertEqual(self.room_ids('?limit=1&offset=1'), [self.room2.id])
+
+    def test_room_change_invalidates_search(self):
+        self.room_ids()
+        room3 = self.write(Room.objects.create, room_type=3, spots=3, price=3000)
+        self.assertEqual(self.room_ids(), [self.room1.id, self.room2.id, room3.id])
+
+    def test_booking_invalidates_searches_for_its_dates(self):
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        self.assertEqual(self.room_ids(query), [self.room1.id, self.room2.id])
+        self.write(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8))
+        self.assertEqual(self.room_ids(query), [self.room2.id])
+
+    def test_versions_are_bumped_after_commit(self):
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        self.room_ids(query)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(room=self.room1, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8))
+            # search running before the commit reads rows of the previous version, its result is kept
+            with self.assertNumQueries(0):
+                self.room_ids(query)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.room_ids(query), [self.room2.id])
+
+    def test_results_expire_with_first_hold_of_stay(self):
+        now = timezone.now()
+        Hold.objects.create(room=self.room1, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8),
+                            expires_at=now + timedelta(seconds=30))
+        Hold.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 3),
+                            expires_at=now + timedelta(seconds=10))
+        for stay, timeout in [((date(2024, 3, 5), date(2024, 3, 7)), 30), ((date(2024, 3, 1), date(2024, 3, 7)), 10),
+                              ((date(2024, 4, 1), date(2024, 4, 7)), 300), (None, 300)]:
+            self.assertEqual(search_cache.result_timeout(search_cache.result_expiry(stay)), timeout)
+
+    def test_booking_keeps_searches_for_other_months(self):
+        query = '?checkin=2024-05-05&checkout=2024-05-07'
+        self.room_ids(query)
+        self.write(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8))
+        with self.assertNumQueries(0):
+            self.room_ids(query)
+
+    def test_booking_deactivation_invalidates_search(self):
+        booking = Booking.objects.create(room=self.room1, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8))
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        self.assertEqual(self.room_ids(query), [self.room2.id])
+        booking.active = False
+        self.write(booking.save)
+        self.assertEqual(self.room_ids(query), [self.room1.id, self.room2.id])
+
+    def test_invalid_dates_not_cached(self):
+        response = self.client.get(reverse('rooms') + '?checkin=2024-03-05&checkout=2024-03-05')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stay_months(self):
+        self.assertEqual(search_cache.stay_months(date(2024, 1, 30), date(2024, 3, 1)),
+                         [date(2024, 1, 1), date(2024, 2, 1)])
+
+
+@override_settings(ROOMS_SEARCH_CACHE='default')
+class RoomsSearchETagTestCase(SearchCacheMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(room_type=1, spots=1, price=1000)
+
+    def test_unchanged_search_not_modified_without_queries(self):
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        response = self.client.get(reverse('rooms') + query)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rooms') + query, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_result(self):
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        etag = self.client.get(reverse('rooms') + query)['ETag']
+        self.write(Booking.objects.create, room=self.room, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8))
+        response = self.client.get(reverse('rooms') + query, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_hold_expires(self):
+        query = '?checkin=2024-03-05&checkout=2024-03-07'
+        hold = Hold.objects.create(room=self.room, checkin=date(2024, 3, 6), checkout=date(2024, 3, 8),
+                                   expires_at=timezone.now() + timedelta(minutes=5))
+        response = self.client.get(reverse('rooms') + query)
+        self.assertEqual(response.json()['count'], 0)
+        etag = response['ETag']
+        Hold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        # cached result times out along with the hold, versions are not bumped
+        with mock.patch.object(search_cache, 'get_result', return_value=None):
+            response = self.client.get(reverse('rooms') + query, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_params_and_media_type(self):
+        etag = self.client.get(reverse('rooms'))['ETag']
+        self.assertNotEqual(self.client.get(reverse('rooms') + '?limit=1')['ETag'], etag)
+        self.assertNotEqual(self.client.get(reverse('rooms'), headers={'Accept': 'application/json; indent=4'})['ETag'],
+                            etag)
+
+    def test_facets_not_modified(self):
+        etag = self.client.get(reverse('rooms') + '?facets=true')['ETag']
+        response = self.client.get(reverse('rooms') + '?facets=true', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(ROOMS_SEARCH_CACHE='')
+    def test_content_etag_without_cache(self):
+        response = self.client.get(reverse('rooms'))
+        response = self.client.get(reverse('rooms'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        Room.objects.create(room_type=2, spots=2, price=2000)
+        response = self.client.get(reverse('rooms'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_search_has_no_etag(self):
+        response = self.client.get(reverse('rooms') + '?checkin=2024-03-05&checkout=2024-03-05')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
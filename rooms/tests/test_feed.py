@@ -0,0 +1,222 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.models import Booking, Hold
+from rooms import feed
+from rooms.models import Room
+
+
+def parse(message: bytes) -> tuple[str, dict]:
+    event, data = message.decode().strip().split('\n')
+    return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+class FeedMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=3, price=3000)
+
+    async def receive(self, subscription: feed.Subscription) -> list[tuple[str, dict]]:
+        """Messages queued to subscription by now"""
+        await feed.broker.wait_delivered()
+        messages = []
+        while not subscription.queue.empty():
+            messages.append(parse(subscription.queue.get_nowait()))
+        return messages
+
+    def write(self, action, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+
+@override_settings(ROOMS_FEED=True, ROOMS_FEED_NOTIFY=False)
+class BrokerTestCase(FeedMixin, TestCase):
+
+    def deliver(self, *changes: feed.Change):
+        return feed.broker.deliver(list(changes))
+
+    async def test_changes_are_filtered_by_window_price_and_spots(self):
+        everything = feed.broker.subscribe()
+        window = feed.broker.subscribe(checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+        cheap = feed.broker.subscribe(price_lte=Decimal(2000))
+        large = feed.broker.subscribe(spots_gte=2, spots_lte=4)
+        for subscription in (everything, window, cheap, large):
+            self.addCleanup(feed.broker.unsubscribe, subscription)
+
+        queued = await self.deliver(
+            feed.Change(feed.BOOKED, self.room1.id, date(2024, 3, 4), date(2024, 3, 6)),
+            feed.Change(feed.FREED, self.room2.id, date(2024, 3, 5), date(2024, 3, 7)),
+            feed.Change(feed.CHANGED, self.room2.id),
+        )
+        self.assertEqual(queued, 3 + 2 + 2 + 2)
+        booked = ('booked', {'room': self.room1.id, 'checkin': '2024-03-04', 'checkout': '2024-03-06',
+                             'price': '1000.00', 'spots': 1})
+        freed = ('freed', {'room': self.room2.id, 'checkin': '2024-03-05', 'checkout': '2024-03-07',
+                           'price': '3000.00', 'spots': 3})
+        changed = ('changed', {'room': self.room2.id, 'price': '3000.00', 'spots': 3})
+        self.assertEqual(await self.receive(everything), [booked, freed, changed])
+        self.assertEqual(await self.receive(window), [booked, changed])
+        self.assertEqual(await self.receive(cheap), [booked, changed])
+        self.assertEqual(await self.receive(large), [freed, changed])
+
+    @override_settings(ROOMS_FEED_QUEUE_SIZE=2)
+    async def test_subscriber_falling_behind_is_reset(self):
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+        await self.deliver(*(feed.Change(feed.CHANGED, self.room1.id) for _ in range(3)))
+        self.assertEqual([subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())], [feed.RESET])
+
+    async def test_dispatch_hands_changes_to_loop_of_subscriptions(self):
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+
+        def dispatch():
+            # writer does not load rooms nor match subscriptions
+            with self.assertNumQueries(0):
+                feed.broker.dispatch([feed.Change(feed.CHANGED, self.room1.id)])
+
+        await sync_to_async(dispatch, thread_sensitive=False)()
+        self.assertTrue(subscription.queue.empty())
+        self.assertEqual(await self.receive(subscription),
+                         [('changed', {'room': self.room1.id, 'price': '1000.00', 'spots': 1})])
+
+    async def test_reset(self):
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+        await sync_to_async(feed.broker.reset, thread_sensitive=False)()
+        await asyncio.sleep(0)
+        self.assertEqual(subscription.queue.get_nowait(), feed.RESET)
+
+    async def test_writes_are_published_after_commit(self):
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+
+        booking = await sync_to_async(self.write)(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 1),
+                                                  checkout=date(2024, 3, 3))
+        booking.checkout = date(2024, 3, 4)
+        await sync_to_async(self.write)(booking.save)
+        booking.active = False
+        await sync_to_async(self.write)(booking.save)
+        await sync_to_async(self.write)(booking.save)
+        self.assertEqual([(event, data['checkin'], data['checkout']) for event, data in await self.receive(
+            subscription)], [('booked', '2024-03-01', '2024-03-03'), ('freed', '2024-03-01', '2024-03-03'),
+                             ('booked', '2024-03-01', '2024-03-04'), ('freed', '2024-03-01', '2024-03-04')])
+
+        hold = await sync_to_async(self.write)(Hold.objects.create, room=self.room2, checkin=date(2024, 3, 1),
+                                               checkout=date(2024, 3, 3))
+        await sync_to_async(self.write)(hold.delete)
+        self.room2.price = 2500
+        await sync_to_async(self.write)(self.room2.save)
+        self.assertEqual([(event, data['room']) for event, data in await self.receive(subscription)],
+                         [('booked', self.room2.id), ('freed', self.room2.id), ('changed', self.room2.id)])
+
+    def test_nothing_is_published_without_subscribers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 3))
+        self.assertEqual(callbacks, [])
+
+
+@override_settings(ROOMS_FEED=True, ROOMS_FEED_NOTIFY=False)
+class AvailabilityStreamViewTestCase(FeedMixin, TestCase):
+
+    async def disconnect(self, stream) -> None:
+        """ASGI handler cancels the response task when the client disconnects"""
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+    async def test_stream(self):
+        response = await self.async_client.get(reverse('rooms-stream'), {'checkin': '2024-03-01',
+                                                                         'checkout': '2024-03-05', 'spots_gte': 1})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(len(feed.broker), 1)
+
+        await sync_to_async(self.write)(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 10),
+                                        checkout=date(2024, 3, 12))
+        await sync_to_async(self.write)(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 2),
+                                        checkout=date(2024, 3, 3))
+        event, data = parse(await asyncio.wait_for(anext(stream), 1))
+        self.assertEqual((event, data['checkin']), ('booked', '2024-03-02'))
+
+        await self.disconnect(stream)
+        self.assertEqual(len(feed.broker), 0)
+
+    @override_settings(ROOMS_FEED_HEARTBEAT_SECONDS=0.01)
+    async def test_keepalive(self):
+        stream = aiter((await self.async_client.get(reverse('rooms-stream'))).streaming_content)
+        await anext(stream)
+        self.assertEqual(await asyncio.wait_for(anext(stream), 1), feed.KEEPALIVE)
+        await self.disconnect(stream)
+
+    async def test_invalid_window(self):
+        response = await self.async_client.get(reverse('rooms-stream'), {'checkin': '2024-03-05',
+                                                                         'checkout': '2024-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_is_not_served_by_wsgi(self):
+        self.assertEqual(self.client.get(reverse('rooms-stream')).status_code, 501)
+
+    @override_settings(ROOMS_FEED=False)
+    async def test_disabled_feed_is_not_served_nor_published(self):
+        self.assertEqual((await self.async_client.get(reverse('rooms-stream'))).status_code, 501)
+        subscription = feed.broker.subscribe()
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+        await sync_to_async(self.write)(Booking.objects.create, room=self.room1, checkin=date(2024, 3, 2),
+                                        checkout=date(2024, 3, 3))
+        self.assertEqual(await self.receive(subscription), [])
+
+
+@override_settings(ROOMS_FEED=True)
+class NotifyFeedTestCase(FeedMixin, TransactionTestCase):
+    """Changes committed by other processes reach the broker through NOTIFY"""
+
+    async def subscribe(self, **filters) -> feed.Subscription:
+        self.addCleanup(feed.stop_listener)
+        subscription = feed.broker.subscribe(**filters)
+        self.addCleanup(feed.broker.unsubscribe, subscription)
+        self.assertTrue(await sync_to_async(feed.listening.wait)(5))
+        return subscription
+
+    async def test_committed_changes_are_notified(self):
+        subscription = await self.subscribe(checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+
+        await Booking.objects.acreate(room=self.room1, checkin=date(2024, 3, 10), checkout=date(2024, 3, 12))
+        await Booking.objects.acreate(room=self.room2, checkin=date(2024, 3, 2), checkout=date(2024, 3, 4))
+        event, data = parse(await asyncio.wait_for(subscription.queue.get(), 5))
+        self.assertEqual((event, data['room'], data['spots']), ('booked', self.room2.id, 3))
+
+    async def test_holds_freed_by_sweeper_are_notified(self):
+        subscription = await self.subscribe()
+        await Hold.objects.acreate(room=self.room1, checkin=date(2024, 3, 1), checkout=date(2024, 3, 3),
+                                   expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(parse(await asyncio.wait_for(subscription.queue.get(), 5))[0], 'booked')
+        await sync_to_async(call_command)('sweep_holds', stdout=StringIO())
+        event, data = parse(await asyncio.wait_for(subscription.queue.get(), 5))
+        self.assertEqual((event, data['room'], data['checkin']), ('freed', self.room1.id, '2024-03-01'))
+
+    async def test_subscribers_are_reset_when_listener_reconnects(self):
+        subscription = await self.subscribe()
+
+        def terminate_listener():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query = %s',
+                               [f'LISTEN {feed.CHANNEL}'])
+
+        await sync_to_async(terminate_listener)()
+        self.assertEqual(await asyncio.wait_for(subscription.queue.get(), 5), feed.RESET)
@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from booking.models import Booking
+from booking.models import Booking, Hold
 from rooms.models import Room
 
 
@@ -43,6 +43,12 @@ class TestRoomModelDeleteTestCase(TestCase):
         with self.assertRaises(ValidationError):
             self.room.delete()
 
+    def test_room_manager_delete_room_when_live_hold_in_future_then_raise_error(self):
+        Hold.objects.create(room=self.room, checkin=datetime.date.today(),
+                            checkout=datetime.date.today() + datetime.timedelta(days=3))
+        with self.assertRaises(ValidationError):
+            self.room.delete()
+
     def test_room_manager_delete_room_when_active_booking_in_past_then_ok(self):
         # TODO: REMAKE THIS
         Booking.objects.create(room=self.room,
@@ -1,9 +1,18 @@
+import json
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import connection
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
+from booking import availability
+from booking.models import Booking, Hold
+from common.instrumentation import track_queries
 from rooms.models import Room
 
 
@@ -111,9 +120,228 @@ class RoomsListAPIViewTestCase(TestCase):
         expected = (list(self.expected_data['results'][2::]))
         self.assertEqual(response.json()['results'], expected)
 
+    def test_view_query_budget(self):
+        with track_queries() as metrics:
+            self.client.get(reverse('rooms') + '?checkin=2024-03-05&checkout=2024-03-07&order_by=price')
+        self.assertLessEqual(metrics.queries, 4)
+
     def test_view_filter_by_price_and_sort_by_spots_desc(self):
         response = self.client.get(reverse('rooms') + '?price_gte=3000&order_by=-spots')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         expected = (list(self.expected_data['results'][2::]))
         expected.reverse()
         self.assertEqual(response.json()['results'], expected)
+
+
+class RoomsListAPIViewKeysetPaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.rooms = [Room.objects.create(room_type=1, spots=spots, price=price)
+                      for spots, price in ((1, 3000), (2, 1000), (3, 2000), (4, 1000), (5, 2000))]
+
+    def collect(self, query: str) -> list[int]:
+        ids = []
+        url = reverse('rooms') + query
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [room['id'] for room in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_first_page_without_count(self):
+        response = self.client.get(reverse('rooms') + '?pagination=cursor&limit=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.json())
+        self.assertIsNone(response.json()['previous'])
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_pages_cover_rooms_in_id_order(self):
+        self.assertEqual(self.collect('?pagination=cursor&limit=2'), [room.id for room in self.rooms])
+
+    def test_pages_stable_under_price_ordering_with_duplicates(self):
+        expected = [self.rooms[i].id for i in (1, 3, 2, 4, 0)]
+        self.assertEqual(self.collect('?pagination=cursor&limit=2&order_by=price'), expected)
+
+    def test_pages_stable_under_desc_price_ordering(self):
+        expected = [self.rooms[i].id for i in (0, 4, 2, 3, 1)]
+        self.assertEqual(self.collect('?pagination=cursor&limit=2&order_by=-price'), expected)
+
+    def test_pages_keyed_by_every_ordering_field(self):
+        expected = [self.rooms[i].id for i in (3, 1, 4, 2, 0)]
+        self.assertEqual(self.collect('?pagination=cursor&limit=1&order_by=price,-spots'), expected)
+        first = self.client.get(reverse('rooms') + '?pagination=cursor&limit=2&order_by=price,-spots').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([room['id'] for room in second['results']], expected[2:4])
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_previous_page_returns_same_rooms(self):
+        first = self.client.get(reverse('rooms') + '?pagination=cursor&limit=2&order_by=price').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_exact_count(self):
+        response = self.client.get(reverse('rooms') + '?pagination=cursor&count=exact&price_gte=2000')
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_estimated_count(self):
+        response = self.client.get(reverse('rooms') + '?pagination=cursor&count=estimate')
+        self.assertIsInstance(response.json()['count'], int)
+
+    def test_invalid_cursor_then_404(self):
+        response = self.client.get(reverse('rooms') + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RoomListAsyncViewTestCase(TestCase):
+
+    def setUp(self):
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=2000)
+        self.room3 = Room.objects.create(room_type=3, spots=3, price=3000)
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 10))
+
+    async def assert_same_as_sync_view(self, query: str):
+        expected = await self.async_client.get(reverse('rooms') + query)
+        response = await self.async_client.get(reverse('rooms-async') + query)
+        self.assertEqual(response.status_code, expected.status_code)
+        # pagination links point to the view they were returned by
+        self.assertEqual(json.loads(response.content.decode().replace(reverse('rooms-async'), reverse('rooms'))),
+                         expected.json())
+
+    async def test_view_returns_same_page_as_sync_view(self):
+        await self.assert_same_as_sync_view('')
+        await self.assert_same_as_sync_view('?limit=1&offset=1')
+        await self.assert_same_as_sync_view('?offset=10')
+
+    async def test_view_filters_same_as_sync_view(self):
+        await self.assert_same_as_sync_view('?checkin=2024-03-05&checkout=2024-03-07&order_by=-price')
+        await self.assert_same_as_sync_view('?price_gte=2000&spots_lte=2')
+
+    @override_settings(BOOKING_AVAILABILITY_INDEX=True)
+    async def test_view_filters_with_availability_index(self):
+        await sync_to_async(availability.rebuild_index)()
+        response = await self.async_client.get(reverse('rooms-async') + '?checkin=2024-03-05&checkout=2024-03-07')
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room1.id, self.room3.id])
+
+    async def test_view_invalid_dates_then_400(self):
+        response = await self.async_client.get(reverse('rooms-async') + '?checkin=2024-03-07&checkout=2024-03-05')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'detail': 'checkin date cant be lower than checkout date'})
+        response = await self.async_client.get(reverse('rooms-async') + '?price_gte=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ROOMS_SEARCH_CACHE='default')
+class RoomFacetsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=900)
+        self.room2 = Room.objects.create(room_type=1, spots=2, price=1500)
+        self.room3 = Room.objects.create(room_type=2, spots=2, price=1999.99)
+        self.room4 = Room.objects.create(room_type=4, spots=4, price=4000)
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 1), checkout=date(2024, 3, 5))
+
+    def get_facets(self, query: str = '') -> dict:
+        response = self.client.get(reverse('rooms') + '?facets=true' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_facets_of_all_rooms(self):
+        self.assertEqual(self.get_facets(), {
+            'count': 4,
+            'room_type': [{'value': 1, 'count': 2}, {'value': 2, 'count': 1}, {'value': 4, 'count': 1}],
+            'spots': [{'value': 1, 'count': 1}, {'value': 2, 'count': 2}, {'value': 4, 'count': 1}],
+            'price': [{'min': '0.00', 'max': '1000.00', 'count': 1},
+                      {'min': '1000.00', 'max': '2000.00', 'count': 2},
+                      {'min': '4000.00', 'max': '5000.00', 'count': 1}],
+        })
+
+    def test_facets_of_filtered_available_rooms(self):
+        facets = self.get_facets('&spots_gte=2&checkin=2024-03-04&checkout=2024-03-06&price_bucket=500')
+        self.assertEqual(facets['count'], 2)
+        self.assertEqual(facets['spots'], [{'value': 2, 'count': 1}, {'value': 4, 'count': 1}])
+        self.assertEqual(facets['price'], [{'min': '1500.00', 'max': '2000.00', 'count': 1},
+                                           {'min': '4000.00', 'max': '4500.00', 'count': 1}])
+
+    def test_facets_of_empty_result(self):
+        self.assertEqual(self.get_facets('&price_gte=10000'), {'count': 0, 'room_type': [], 'spots': [], 'price': []})
+
+    def test_facets_in_one_query_then_from_cache(self):
+        with self.assertNumQueries(1):
+            self.get_facets('&price_lte=2000')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_facets('&price_lte=2000.00')['count'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(room_type=3, spots=3, price=100)
+        self.assertEqual(self.get_facets('&price_lte=2000')['count'], 4)
+
+    def test_facets_cache_is_invalidated_by_booking_on_searched_dates(self):
+        query = '&checkin=2024-03-10&checkout=2024-03-12'
+        self.assertEqual(self.get_facets(query)['count'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(room=self.room1, checkin=date(2024, 3, 11), checkout=date(2024, 3, 13))
+        self.assertEqual(self.get_facets(query)['count'], 3)
+
+    def test_facets_false_returns_list(self):
+        response = self.client.get(reverse('rooms') + '?facets=false')
+        self.assertEqual(response.json()['count'], 4)
+
+    def test_invalid_price_bucket_then_400(self):
+        response = self.client.get(reverse('rooms') + '?facets=true&price_bucket=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RoomCalendarAPIViewTestCase(TestCase):
+
+    def setUp(self):
+        self.room1 = Room.objects.create(room_type=1, spots=1, price=1000)
+        self.room2 = Room.objects.create(room_type=2, spots=2, price=2000)
+        self.room3 = Room.objects.create(room_type=3, spots=3, price=3000)
+        Booking.objects.create(room=self.room1, checkin=date(2024, 2, 28), checkout=date(2024, 3, 2))
+        Booking.objects.create(room=self.room2, checkin=date(2024, 3, 2), checkout=date(2024, 3, 4))
+        Booking.objects.create(room=self.room3, checkin=date(2024, 3, 3), checkout=date(2024, 3, 10), active=False)
+
+    def test_calendar_free_rooms_per_day(self):
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-03-01&end=2024-03-05')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{'date': '2024-03-01', 'free': 2},
+                                           {'date': '2024-03-02', 'free': 2},
+                                           {'date': '2024-03-03', 'free': 2},
+                                           {'date': '2024-03-04', 'free': 3}])
+
+    def test_calendar_with_room_ids(self):
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-03-01&end=2024-03-03&ids=true')
+        self.assertEqual(response.json(), [
+            {'date': '2024-03-01', 'free': 2, 'rooms': [self.room2.id, self.room3.id]},
+            {'date': '2024-03-02', 'free': 2, 'rooms': [self.room1.id, self.room3.id]},
+        ])
+
+    def test_calendar_counts_live_holds(self):
+        Hold.objects.create(room=self.room3, checkin=date(2024, 3, 2), checkout=date(2024, 3, 3))
+        Hold.objects.create(room=self.room1, checkin=date(2024, 3, 3), checkout=date(2024, 3, 4),
+                            expires_at=timezone.now() - timedelta(minutes=1))
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-03-01&end=2024-03-05&ids=true')
+        self.assertEqual([(day['free'], day['rooms']) for day in response.json()], [
+            (2, [self.room2.id, self.room3.id]),
+            (1, [self.room1.id]),
+            (2, [self.room1.id, self.room3.id]),
+            (3, [self.room1.id, self.room2.id, self.room3.id]),
+        ])
+
+    def test_calendar_with_room_filters(self):
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-03-01&end=2024-03-03&price_gte=2000')
+        self.assertEqual([day['free'] for day in response.json()], [2, 1])
+
+    def test_calendar_uses_constant_number_of_queries(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('rooms-calendar') + '?start=2024-03-01&end=2024-05-01&ids=true')
+
+    def test_calendar_when_end_before_start_then_400(self):
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-03-05&end=2024-03-01')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_when_window_too_long_then_400(self):
+        response = self.client.get(reverse('rooms-calendar') + '?start=2024-01-01&end=2024-12-31')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,15 @@
 from django.urls import path
 
-from .views import RoomListAPIView
+from .views import (
+    RoomAvailabilityStreamView,
+    RoomCalendarAPIView,
+    RoomListAPIView,
+    RoomListAsyncView,
+)
 
 urlpatterns = [
-    path('', RoomListAPIView.as_view(), name='rooms')
+    path('', RoomListAPIView.as_view(), name='rooms'),
+    path('async/', RoomListAsyncView.as_view(), name='rooms-async'),
+    path('calendar/', RoomCalendarAPIView.as_view(), name='rooms-calendar'),
+    path('stream/', RoomAvailabilityStreamView.as_view(), name='rooms-stream'),
 ]
@@ -1,30 +1,217 @@
+import asyncio
+
 import django_filters
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
 from rest_framework.exceptions import ValidationError
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.request import Request
+from rest_framework.response import Response
 
+from booking import availability
+from common.mixins import (
+    ConditionalGetMixin,
+    KeysetPaginationMixin,
+    ReplicaReadMixin,
+    ValuesListMixin,
+)
+from rooms import cache as search_cache
+from rooms import feed
+from rooms.calendar import availability_calendar
+from rooms.facets import room_facets
 from rooms.models import Room
-from rooms.serializers import RoomSerializer
+from rooms.serializers import (
+    AvailabilityStreamQuerySerializer,
+    CalendarDaySerializer,
+    CalendarQuerySerializer,
+    FacetsQuerySerializer,
+    RoomFacetsSerializer,
+    RoomSerializer,
+)
 
-from .filters import RoomFilter
-from .pagination import RoomsPagination
+from .filters import RoomCalendarFilter, RoomFilter
+from .pagination import RoomsKeysetPagination, RoomsPagination
 
 
-class RoomListAPIView(ListAPIView):
+class RoomListAPIView(ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, KeysetPaginationMixin, ListAPIView):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = RoomFilter
     pagination_class = RoomsPagination
+    keyset_pagination_class = RoomsKeysetPagination
+
+    def get_cache_key(self, result_params: dict | None = None) -> str | None:
+        """
+        Search cache key built from normalized filter and pagination (or other result) params,
+        the stay of the search is kept as `cache_stay` for the timeout of its result
+        """
+        filterset = self.filterset_class(self.request.query_params, queryset=self.get_queryset(), request=self.request)
+        if not filterset.is_valid():
+            return None
+        params = {name: value for name, value in filterset.form.cleaned_data.items()
+                  if name not in ('checkin', 'checkout') and value not in (None, '', [])}
+        stay = None
+        if filterset.form.cleaned_data.get('checkin') or filterset.form.cleaned_data.get('checkout'):
+            stay = filterset.get_stay_dates()
+            params['stay'] = stay
+        params.update(self.paginator.get_cache_params(self.request) if result_params is None else result_params)
+        self.cache_stay = stay
+        return search_cache.search_key(params, stay)
+
+    def cached_response(self, request, key: str | None) -> Response | None:
+        """
+        Cached result of key, 304 when it has the ETag of the request. Search cache key changes with
+        any write the result depends on and ETag with the expiry of the result, so clients polling
+        an unchanged search get 304 without the search being run
+        """
+        cached = search_cache.get_result(key) if key else None
+        if cached is None:
+            if key:
+                # versions are bumped when the primary commits, a result read from a lagging replica
+                # would be stored under the new version
+                self.read_primary()
+            return None
+        data, expiry = cached
+        return self.not_modified(request, self.get_etag(key, expiry)) or Response(data)
+
+    def cache_response(self, request, key: str | None, data) -> Response | None:
+        """Caches the result of key, 304 when the fresh result has the ETag of the request"""
+        if not key:
+            return None
+        expiry = search_cache.result_expiry(self.cache_stay)
+        search_cache.set_result(key, data, expiry)
+        return self.not_modified(request, self.get_etag(key, expiry))
+
+    def get_etag(self, key: str, expiry) -> str:
+        return search_cache.result_etag(key, expiry, self.request.accepted_media_type)
+
+    def facets(self, request, price_bucket) -> Response:
+        """
+        Counts of filtered rooms by type, spots and price bucket. Without dates result depends
+        only on rooms, so it is served from search cache until any room changes.
+        """
+        key = self.get_cache_key({'facets': True, 'price_bucket': price_bucket})
+        cached = self.cached_response(request, key)
+        if cached is not None:
+            return cached
+        rooms = self.filter_queryset(self.get_queryset())
+        data = RoomFacetsSerializer(room_facets(rooms, price_bucket)).data
+        return self.cache_response(request, key, data) or Response(data)
+
+    def list(self, request, *args, **kwargs) -> Response:
+        if 'facets' in request.query_params:
+            query = FacetsQuerySerializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+            if query.validated_data['facets']:
+                return self.facets(request, query.validated_data['price_bucket'])
+        key = self.get_cache_key()
+        cached = self.cached_response(request, key)
+        if cached is not None:
+            return cached
+        response = super().list(request, *args, **kwargs)
+        return self.cache_response(request, key, response.data) or response
 
     @swagger_auto_schema(
         operation_summary='Room list',
-        operation_description='Room list view with different filters',
-        responses={400: 'invalid filter field passed'}
+        operation_description='Room list view with different filters. '
+                              'Pass pagination=cursor for keyset pagination with optional count=exact|estimate. '
+                              'Pass facets=true for counts of filtered rooms by room_type, spots and price bucket '
+                              'of price_bucket width (1000 by default) instead of the list. '
+                              'Response has an ETag, request with it in If-None-Match gets 304 while the result '
+                              'is unchanged',
+        responses={304: 'result not modified', 400: 'invalid filter field passed'}
     )
-    def get(self, request, *args, **kwargs) -> JsonResponse:
+    def get(self, request, *args, **kwargs) -> Response:
         try:
             return super().get(request, *args, **kwargs)
+        except ValidationError as exc:
+            return Response({'detail': '{}'.format(*exc.args)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RoomListAsyncView(View):
+    """
+    ASGI-native variant of RoomListAPIView with the same filters and limit/offset pagination.
+    Queries are awaited with async ORM, so a worker serves other requests while they run.
+    """
+
+    async def get(self, request, *args, **kwargs) -> JsonResponse:
+        request = Request(request)
+        filterset = RoomFilter(request.query_params, queryset=Room.objects.all(), request=request)
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        try:
+            if availability.index_enabled():
+                # booked rooms are read from the index while filters are applied
+                queryset = await sync_to_async(lambda: filterset.qs)()
+            else:
+                queryset = filterset.qs
         except ValidationError as exc:
             return JsonResponse({'detail': '{}'.format(*exc.args)}, status=400)
+        paginator = RoomsPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        return JsonResponse(paginator.get_paginated_response(RoomSerializer(page, many=True).data).data)
+
+
+class RoomAvailabilityStreamView(View):
+    """
+    Availability changes of rooms as Server-Sent Events (see rooms.feed), so search clients
+    update results instead of polling RoomListAPIView. Served only under ASGI, where a waiting
+    subscriber holds neither a thread nor a database connection.
+    """
+
+    async def get(self, request, *args, **kwargs) -> StreamingHttpResponse | JsonResponse:
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': 'availability feed is served only by ASGI application'},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+        if not feed.feed_enabled():
+            return JsonResponse({'detail': 'availability feed is disabled'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        query = AvailabilityStreamQuerySerializer(data=request.GET)
+        if not query.is_valid():
+            return JsonResponse(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(self.stream(query.validated_data), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx passes events through as they come
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    async def stream(filters: dict):
+        subscription = feed.broker.subscribe(**filters)
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), feed.heartbeat_seconds())
+                except asyncio.TimeoutError:
+                    yield feed.KEEPALIVE
+        finally:
+            feed.broker.unsubscribe(subscription)
+
+
+class RoomCalendarAPIView(GenericAPIView):
+    queryset = Room.objects.all()
+    serializer_class = CalendarDaySerializer
+    filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
+    filterset_class = RoomCalendarFilter
+    pagination_class = None
+
+    @swagger_auto_schema(
+        operation_summary='Availability calendar',
+        operation_description='Number of free rooms for every day between start and end, '
+                              'room ids are included when ids=true',
+        query_serializer=CalendarQuerySerializer,
+        responses={400: 'invalid window or filter field passed'}
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        query = CalendarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rooms = self.filter_queryset(self.get_queryset())
+        calendar = availability_calendar(rooms, query.validated_data['start'], query.validated_data['end'],
+                                         with_ids=query.validated_data['ids'])
+        return Response(self.get_serializer(calendar, many=True).data, status=status.HTTP_200_OK)